@@ -1,5 +1,6 @@
 import modal
 from pathlib import Path
+from typing import Optional, Tuple
 import os
 
 app = modal.App("mindmap-pipeline")
@@ -75,6 +76,15 @@ ml_image = _add_local_files(
         "torch",
         "pandas",
         "numpy",
+        "faiss-cpu",
+    )
+)
+
+# ANN image (FAISS only) for serving neighbor lookups without the torch stack
+ann_image = _add_local_files(
+    base_image.pip_install(
+        "numpy",
+        "faiss-cpu",
     )
 )
 
@@ -120,6 +130,49 @@ rag_image = _add_local_files(
     )
 )
 
+# Rows per MERGE ... FROM VALUES statement; a 384-d JSON vector is ~8KB of SQL text,
+# so this keeps each statement well under Snowflake's 1MB statement limit.
+MERGE_CHUNK_SIZE = 50
+
+# Persistent volume holding the paper-neighbor ANN index built by the embedding worker
+ANN_INDEX_DIR = "/ann_index"
+ANN_INDEX_FILE = "{database}_silver_papers_hnsw_sq8.faiss"
+ANN_IDS_FILE = "{database}_silver_papers_hnsw_ids.npy"
+ann_index_volume = modal.Volume.from_name("mindmap-ann-index", create_if_missing=True)
+
+
+def ann_index_paths(database: str = DATABASE) -> Tuple[str, str]:
+    """
+    (index, ids) file paths of database's paper ANN index on the ANN volume.
+    Each database gets its own pair so their corpora never overwrite each other.
+    """
+    return (
+        os.path.join(ANN_INDEX_DIR, ANN_INDEX_FILE.format(database=database)),
+        os.path.join(ANN_INDEX_DIR, ANN_IDS_FILE.format(database=database)),
+    )
+
+# Persistent volume caching downloaded arXiv PDFs across the PDF-parsing workers
+ARXIV_PDF_CACHE_DIR = "/arxiv_pdfs"
+arxiv_pdf_volume = modal.Volume.from_name("mindmap-arxiv-pdfs", create_if_missing=True)
+
+
+def arxiv_pdf_cache_path(arxiv_id: str) -> Optional[str]:
+    """
+    Where arxiv_id's PDF lives on the PDF volume, or None when the volume isn't
+    mounted in this container.
+    """
+    if not os.path.isdir(ARXIV_PDF_CACHE_DIR):
+        return None
+    return os.path.join(ARXIV_PDF_CACHE_DIR, f"{arxiv_id.replace('/', '_')}.pdf")
+
+
+def looks_like_complete_pdf(head: bytes, tail: bytes) -> bool:
+    """
+    True when a PDF's first bytes carry the %PDF header and its last KiB the %%EOF
+    marker; a download cut off mid-write is missing the latter.
+    """
+    return head.startswith(b"%PDF") and b"%%EOF" in tail
+
 # Shared secrets
 snowflake_secret = modal.Secret.from_name("snowflake-creds")
 semantic_scholar_secret = modal.Secret.from_name("semantic-scholar-api")
@@ -11,7 +11,7 @@ from typing import Any, Dict
 
 from app.config import DATABASE, app
 from app.workers.chunking_worker import chunk_papers
-from app.workers.embedding_worker import backfill_similar_ids, run_chunk_embedding_batch, run_embedding_batch
+from app.workers.embedding_worker import Embedder, backfill_similar_ids
 from app.workers.graph_worker import build_knowledge_graph
 from app.workers.ingestion import ingest_from_arxiv, ingest_from_openalex, ingest_from_semantic_scholar
 from app.workers.transformation import main as transform_main
@@ -51,6 +51,9 @@ def pipeline(
         "max_results": max_results,
     }
 
+    # Paper and chunk embeddings share one Embedder so the model loads once per container
+    embedder = Embedder(model_name=embedding_model_name)
+
     print("[pipeline] starting full cache-population run", flush=True)
     print(f"[pipeline] database={database} source={source} query={query}", flush=True)
 
@@ -89,9 +92,8 @@ def pipeline(
 
     if not skip_paper_embeddings:
         print("[pipeline] step 3/8: paper embeddings", flush=True)
-        results["paper_embeddings"] = run_embedding_batch.remote(
+        results["paper_embeddings"] = embedder.run_embedding_batch.remote(
             limit=embed_limit,
-            model_name=embedding_model_name,
             populate_similar=True,
             k=k,
             database=database,
@@ -117,9 +119,8 @@ def pipeline(
 
     if not skip_chunk_embeddings:
         print("[pipeline] step 6/8: chunk embeddings", flush=True)
-        results["chunk_embeddings"] = run_chunk_embedding_batch.remote(
+        results["chunk_embeddings"] = embedder.run_chunk_embedding_batch.remote(
             limit=chunk_limit,
-            model_name=embedding_model_name,
             database=database,
         )
     else:
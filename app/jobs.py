@@ -10,7 +10,7 @@ def run_single_ingestion_job(arxiv_id: str, database: str = DATABASE) -> Dict[st
     """
     from app.workers.ingestion import ingest_single_paper
     from app.workers.transformation import process_single_silver
-    from app.workers.embedding_worker import process_single_embedding
+    from app.workers.embedding_worker import Embedder
     from app.workers.graph_worker import build_knowledge_graph
 
     print(f"[job] start arxiv_id={arxiv_id} database={database}", flush=True)
@@ -20,7 +20,7 @@ def run_single_ingestion_job(arxiv_id: str, database: str = DATABASE) -> Dict[st
     silver_result = process_single_silver.remote(arxiv_id=arxiv_id, database=database)
     print(f"[job] silver done: {silver_result}", flush=True)
 
-    embedding_result = process_single_embedding.remote(arxiv_id=arxiv_id, database=database)
+    embedding_result = Embedder().process_single_embedding.remote(arxiv_id=arxiv_id, database=database)
     print(f"[job] embedding done: {embedding_result}", flush=True)
 
     graph_result = build_knowledge_graph.remote(database=database)
@@ -43,7 +43,7 @@ def run_post_bronze_job(arxiv_id: str, database: str = DATABASE) -> Dict[str, An
     Intended to run after Bronze has already succeeded.
     """
     from app.workers.transformation import process_single_silver
-    from app.workers.embedding_worker import process_single_embedding
+    from app.workers.embedding_worker import Embedder
     from app.workers.graph_worker import build_knowledge_graph
 
     print(f"[post-bronze-job] start arxiv_id={arxiv_id} database={database}", flush=True)
@@ -51,7 +51,7 @@ def run_post_bronze_job(arxiv_id: str, database: str = DATABASE) -> Dict[str, An
     silver_result = process_single_silver.remote(arxiv_id=arxiv_id, database=database)
     print(f"[post-bronze-job] silver done: {silver_result}", flush=True)
 
-    embedding_result = process_single_embedding.remote(arxiv_id=arxiv_id, database=database)
+    embedding_result = Embedder().process_single_embedding.remote(arxiv_id=arxiv_id, database=database)
     print(f"[post-bronze-job] embedding done: {embedding_result}", flush=True)
 
     paper_id = None
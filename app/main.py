@@ -54,7 +54,7 @@ def run_full_pipeline():
     """Run steps 1-5 via main.py (same app context), then summarization and graph separately."""
     from app.workers.ingestion import ingest_from_semantic_scholar
     from app.workers.transformation import main as transform_main
-    from app.workers.embedding_worker import run_embedding_batch, run_chunk_embedding_batch
+    from app.workers.embedding_worker import Embedder
     from app.workers.chunking_worker import chunk_papers
     from app.workers.graph_worker import build_knowledge_graph
 
@@ -64,16 +64,19 @@ def run_full_pipeline():
     print("=== Step 2: Transform to Silver ===")
     print(transform_main.remote())
 
-    print("=== Step 3: Embed papers ===")
-    print(run_embedding_batch.remote(limit=200))
+    # One Embedder instance so both embedding steps share a warm container/model
+    embedder = Embedder()
 
-    print("=== Step 4: Chunk papers ===")
-    print(chunk_papers.remote(limit=200))
+    # Chunking only reads Silver, so it runs alongside paper embedding
+    print("=== Steps 3-4: Embed papers / chunk papers (concurrent) ===")
+    chunk_call = chunk_papers.spawn(limit=200)
+    print(embedder.run_embedding_batch.remote(limit=200))
+    print(chunk_call.get())
 
-    print("=== Step 5: Embed chunks ===")
-    print(run_chunk_embedding_batch.remote(limit=500))
-
-    print("=== Step 6: Build knowledge graph ===")
+    # The graph only needs paper-level neighbors, so chunk embedding overlaps with it
+    print("=== Steps 5-6: Embed chunks / build knowledge graph (concurrent) ===")
+    chunk_embed_call = embedder.run_chunk_embedding_batch.spawn(limit=500)
     print(build_knowledge_graph.remote())
+    print(chunk_embed_call.get())
 
     print("=== Steps 1-6 complete. Run: modal run app/main.py::run_summarization ===")
@@ -1,10 +1,24 @@
 import os
+import random
+import threading
+import time
 
 import snowflake.connector
 from app.config import DATABASE, WAREHOUSE
 
+# Connection attempts before a transient network/handshake failure is raised
+_CONNECT_MAX_ATTEMPTS = 4
+# (schema, database, warehouse) -> connection kept open across warm invocations
+_shared_connections: dict = {}
+_shared_connections_lock = threading.Lock()
 
-def connect_to_snowflake(schema: str, database: str = DATABASE, warehouse: str = WAREHOUSE):
+
+def connect_to_snowflake(
+    schema: str,
+    database: str = DATABASE,
+    warehouse: str = WAREHOUSE,
+    keep_alive: bool = False,
+):
     connection_args = {
         "account": os.environ["SNOWFLAKE_ACCOUNT"],
         "user": os.environ["SNOWFLAKE_USER"],
@@ -12,5 +26,36 @@ def connect_to_snowflake(schema: str, database: str = DATABASE, warehouse: str =
         "database": database,
         "warehouse": warehouse,
         "schema": schema,
+        "login_timeout": 30,
+        "network_timeout": 60,
     }
-    return snowflake.connector.connect(**connection_args)
+    if keep_alive:
+        # Heartbeats stop a long-lived session's token from expiring between calls
+        connection_args["client_session_keep_alive"] = True
+    for attempt in range(_CONNECT_MAX_ATTEMPTS):
+        try:
+            return snowflake.connector.connect(**connection_args)
+        except snowflake.connector.errors.OperationalError as exc:
+            # Bad credentials surface as DatabaseError and are not retried
+            if attempt == _CONNECT_MAX_ATTEMPTS - 1:
+                raise
+            delay = min(20.0, 2.0 * (2 ** attempt) + random.uniform(0.0, 0.5))
+            print(f"Snowflake connect failed ({exc}); retrying in {delay:.2f}s...")
+            time.sleep(delay)
+
+
+def get_shared_snowflake_connection(schema: str, database: str = DATABASE, warehouse: str = WAREHOUSE):
+    """
+    Connection opened once per container and handed to every caller with the same
+    schema/database/warehouse, reconnecting if it has been closed. Callers must not
+    close it.
+    """
+    key = (schema, database, warehouse)
+    with _shared_connections_lock:
+        conn = _shared_connections.get(key)
+        if conn is None or conn.is_closed():
+            conn = connect_to_snowflake(
+                schema=schema, database=database, warehouse=warehouse, keep_alive=True
+            )
+            _shared_connections[key] = conn
+    return conn
@@ -1,18 +1,13 @@
 from typing import List, Dict, Any, Optional, Tuple
-import math
+import json
 import re
 
-from app.config import app, DATABASE, image_citation_aware, snowflake_secret
+from app.config import app, DATABASE, MERGE_CHUNK_SIZE, image_citation_aware, snowflake_secret
 from app.utils import connect_to_snowflake
 from .citation_worker import get_citations  # your Modal function
 # NOTE: importing Modal functions across files is okay if both are in the same app name
 
 
-def _l2_normalize(vec: List[float]) -> List[float]:
-    norm = math.sqrt(sum(x * x for x in vec)) or 1.0
-    return [x / norm for x in vec]
-
-
 def _ensure_tables(cur):
         cur.execute(
                 """
@@ -39,11 +34,27 @@ def _ensure_tables(cur):
         )
 
 
-def _upsert_ca_embedding(cur, paper_id: str, model_name: str, alpha: float, emb: List[float]):
+def _upsert_ca_embeddings(cur, model_name: str, alpha: float, rows: List[Tuple[str, List[float]]]):
+    """
+    MERGE (paper_id, embedding) rows into PAPER_EMBEDDINGS_CA, MERGE_CHUNK_SIZE rows per statement.
+    """
+    for start in range(0, len(rows), MERGE_CHUNK_SIZE):
+        chunk = rows[start:start + MERGE_CHUNK_SIZE]
+        values_sql = ", ".join(["(%s, %s)"] * len(chunk))
+        params: List[Any] = [model_name, float(alpha)]
+        for paper_id, emb in chunk:
+            params.extend([paper_id, json.dumps(emb)])
         cur.execute(
-                """
+                f"""
                 MERGE INTO PAPER_EMBEDDINGS_CA t
-                USING (SELECT %s AS "paper_id", %s AS "model_name", %s AS "embedding", %s AS "alpha") s
+                USING (
+                    SELECT
+                        column1 AS "paper_id",
+                        %s AS "model_name",
+                        PARSE_JSON(column2)::VECTOR(FLOAT, 384) AS "embedding",
+                        %s AS "alpha"
+                    FROM VALUES {values_sql}
+                ) s
                 ON t."paper_id" = s."paper_id"
                 WHEN MATCHED THEN UPDATE SET
                     t."model_name" = s."model_name",
@@ -53,7 +64,7 @@ def _upsert_ca_embedding(cur, paper_id: str, model_name: str, alpha: float, emb:
                 WHEN NOT MATCHED THEN INSERT ("paper_id", "model_name", "embedding", "alpha")
                 VALUES (s."paper_id", s."model_name", s."embedding", s."alpha")
                 """,
-                (paper_id, model_name, emb, float(alpha)),
+                params,
         )
 
 
@@ -73,58 +84,47 @@ def _extract_ref_text(ref) -> str:
 
 
 def _insert_references(cur, paper_id: str, arxiv_id: str, refs: List[Any]):
+    if not refs:
+        return
+    # One multi-row INSERT per paper instead of one round trip per reference
+    values_sql = ", ".join(["(%s, %s, %s, %s, %s)"] * len(refs))
+    params: List[Any] = []
     for i, ref in enumerate(refs):
-        cur.execute(
-            """
-            INSERT INTO GOLD_REFERENCES("paper_id", "arxiv_id", "ref_index", "ref_text", "ref_arxiv_id")
-            VALUES (%s, %s, %s, %s, %s)
-            """,
-            (paper_id, arxiv_id, int(i), _extract_ref_text(ref), _extract_ref_arxiv_id(ref)),
-        )
+        params.extend((paper_id, arxiv_id, int(i), _extract_ref_text(ref), _extract_ref_arxiv_id(ref)))
+    cur.execute(
+        f"""
+        INSERT INTO GOLD_REFERENCES("paper_id", "arxiv_id", "ref_index", "ref_text", "ref_arxiv_id")
+        VALUES {values_sql}
+        """,
+        params,
+    )
 
 
-def _resolve_ref_paper_ids(cur, ref_arxiv_ids: List[str]) -> List[str]:
+def _fetch_ref_embeddings(cur, ref_arxiv_ids: List[str]) -> Dict[str, List[float]]:
     """
-    Map referenced arXiv IDs → our own paper_id strings (UUIDs) using SILVER_PAPERS.arxiv_id.
-    Returns list of paper_id strings we can fetch embeddings for.
+    Map referenced arXiv IDs → baseline embeddings of the matching SILVER_PAPERS rows.
+    Refs that are not in SILVER (or not embedded yet) are simply absent from the result.
     """
-    if not ref_arxiv_ids:
-        return []
     # Dedup and keep only non-empty
     ref_arxiv_ids = sorted({x for x in ref_arxiv_ids if x})
+    if not ref_arxiv_ids:
+        return {}
     # Build VALUES list for join
     values_sql = ", ".join(["(%s)"] * len(ref_arxiv_ids))
     cur.execute(
             f"""
             WITH refs("arxiv_id") AS (SELECT column1 FROM VALUES {values_sql})
-            SELECT TO_VARCHAR(s."id") AS "paper_id"
+            SELECT r."arxiv_id", s."embedding"
             FROM refs r
             JOIN SILVER_PAPERS s
                 ON s."arxiv_id" = r."arxiv_id"
-            """,
-            ref_arxiv_ids,
-    )
-    return [r[0] for r in cur.fetchall()]
-
-
-def _fetch_embeddings(cur, paper_ids: List[str]) -> List[List[float]]:
-    if not paper_ids:
-        return []
-    values_sql = ", ".join(["(%s)"] * len(paper_ids))
-    cur.execute(
-            f"""
-            WITH ids("paper_id") AS (SELECT column1 FROM VALUES {values_sql})
-            SELECT s."embedding"
-            FROM ids i
-            JOIN SILVER_PAPERS s
-                ON TO_VARCHAR(s."id") = i."paper_id"
             WHERE s."embedding" IS NOT NULL
             """,
-            paper_ids,
+            ref_arxiv_ids,
     )
     rows = cur.fetchall()
-    # Each row[0] is a vector; connector returns it as a Python list-like
-    return [list(r[0]) for r in rows]
+    # Each row[1] is a vector; connector returns it as a Python list-like
+    return {r[0]: list(r[1]) for r in rows}
 
 
 @app.function(image=image_citation_aware, secrets=[snowflake_secret], timeout=60 * 30)
@@ -178,59 +178,79 @@ def run_citation_aware_embedding_batch(
         updated = 0
         skipped_no_refs = 0
         skipped_no_ref_embs = 0
+        skipped_citation_errors = 0
 
-        for paper_id, arxiv_id, title, abstract in rows:
+        texts = []
+        for _, _, title, abstract in rows:
             title = (title or "").strip()
             abstract = (abstract or "").strip()
-            text = f"{title}\n\n{abstract}" if title else abstract
-
-            # e_self
-            e_self = model.encode([text], normalize_embeddings=True)[0].tolist()
+            texts.append(f"{title}\n\n{abstract}" if title else abstract)
+
+        # e_self for every paper in one batched encode
+        self_embs = model.encode(texts, normalize_embeddings=True, batch_size=32)
+
+        # parse references (fan out across get_citations containers); one paper whose
+        # lookup fails is treated as having no references instead of failing the batch
+        arxiv_ids = [row[1] for row in rows]
+        citations = get_citations.map(arxiv_ids, kwargs={"max_refs": max_refs}, return_exceptions=True)
+        refs_by_paper = []
+        for arxiv_id, cit in zip(arxiv_ids, citations):
+            if isinstance(cit, BaseException):
+                print(f"get_citations failed for {arxiv_id}: {cit}")
+                skipped_citation_errors += 1
+                refs_by_paper.append([])
+            else:
+                refs_by_paper.append(cit.get("references", []))
+        ref_ids_by_paper = [
+            [ref_id for ref_id in (_extract_ref_arxiv_id(ref) for ref in refs) if ref_id]
+            for refs in refs_by_paper
+        ]
+
+        # resolve refs to known papers in SILVER and fetch their baseline embeddings
+        # in one join for the whole batch
+        ref_emb_map = {
+            ref_id: np.asarray(vec, dtype=np.float32)
+            for ref_id, vec in _fetch_ref_embeddings(cur, [ref_id for ids in ref_ids_by_paper for ref_id in ids]).items()
+        }
 
-            # parse references (Modal function call)
-            cit = get_citations.remote(arxiv_id=arxiv_id, max_refs=max_refs)
-            refs = cit.get("references", [])
+        ca_rows: List[Tuple[str, List[float]]] = []
+        for (paper_id, arxiv_id, _, _), emb, refs, ref_arxiv_ids in zip(rows, self_embs, refs_by_paper, ref_ids_by_paper):
+            e_self = np.asarray(emb, dtype=np.float32)
 
             # store refs for A2 evidence
             _insert_references(cur, paper_id, arxiv_id, refs)
 
-            ref_arxiv_ids = [ref_id for ref_id in (_extract_ref_arxiv_id(ref) for ref in refs) if ref_id]
             if not ref_arxiv_ids:
                 skipped_no_refs += 1
                 # still store a CA embedding identical to self (optional), or skip
-                _upsert_ca_embedding(cur, paper_id, base_model + f"+cite_a{alpha}", alpha, e_self)
+                ca_rows.append((paper_id, e_self.tolist()))
                 updated += 1
                 continue
 
-            # resolve to known papers we have in SILVER
-            ref_paper_ids = _resolve_ref_paper_ids(cur, ref_arxiv_ids)
-
-            # get their baseline embeddings (must exist in PAPER_EMBEDDINGS)
-            ref_embs = _fetch_embeddings(cur, ref_paper_ids)
+            ref_embs = [ref_emb_map[ref_id] for ref_id in dict.fromkeys(ref_arxiv_ids) if ref_id in ref_emb_map]
             if not ref_embs:
                 skipped_no_ref_embs += 1
-                _upsert_ca_embedding(cur, paper_id, base_model + f"+cite_a{alpha}", alpha, e_self)
+                ca_rows.append((paper_id, e_self.tolist()))
                 updated += 1
                 continue
 
-            e_refs_mean = np.mean(np.array(ref_embs, dtype=np.float32), axis=0).tolist()
+            e_refs_mean = np.stack(ref_embs).mean(axis=0)
 
             # blend + normalize
-            e_final = [
-                float(alpha) * a + (1.0 - float(alpha)) * b
-                for a, b in zip(e_self, e_refs_mean)
-            ]
-            e_final = _l2_normalize(e_final)
+            e_final = float(alpha) * e_self + (1.0 - float(alpha)) * e_refs_mean
+            e_final /= np.linalg.norm(e_final) or 1.0
 
-            _upsert_ca_embedding(cur, paper_id, base_model + f"+cite_a{alpha}", alpha, e_final)
+            ca_rows.append((paper_id, e_final.tolist()))
             updated += 1
 
+        _upsert_ca_embeddings(cur, base_model + f"+cite_a{alpha}", alpha, ca_rows)
         conn.commit()
         return {
             "status": "ok",
             "updated": updated,
             "skipped_no_refs": skipped_no_refs,
             "skipped_no_ref_embs": skipped_no_ref_embs,
+            "skipped_citation_errors": skipped_citation_errors,
             "alpha": float(alpha),
         }
     finally:
@@ -1,24 +1,169 @@
-from typing import Dict, Any
-from app.config import app, image_citation, snowflake_secret
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Optional
+from app.config import (
+    app,
+    image_citation,
+    snowflake_secret,
+    ARXIV_PDF_CACHE_DIR,
+    arxiv_pdf_volume,
+    arxiv_pdf_cache_path,
+    looks_like_complete_pdf,
+)
 
-@app.function(image=image_citation, secrets=[snowflake_secret], timeout=60 * 10)
+_REFS_HEADING_RE = re.compile(r"\n\s*(references|bibliography)\s*\n", re.IGNORECASE)
+_REFS_STOP_RE = re.compile(r"\n\s*(appendix|acknowledg(e)?ments?)\s*\n", re.IGNORECASE)
+_REF_ENTRY_SPLIT_RE = re.compile(r"\n\s*(?:\[\d+\]|\d+\.\s|\d+\s)\s*")
+
+_session_lock = threading.Lock()
+_session = None
+# arXiv allows one request every 3 seconds. Each container spaces its own requests
+# (feed query and PDF download alike) 3s * _ARXIV_MAX_CONTAINERS apart, so a .map()
+# fan-out over every container together stays within that rate.
+_ARXIV_MAX_CONTAINERS = 2
+_ARXIV_MIN_INTERVAL_SECONDS = 3.0 * _ARXIV_MAX_CONTAINERS
+_arxiv_lock = threading.Lock()
+_arxiv_last_request_ts = 0.0
+
+
+def _get_session():
+    """
+    Keep-alive requests.Session shared by every get_citations call in this container,
+    retrying 429/5xx responses with exponential backoff.
+    """
+    global _session
+    import requests
+    from urllib3.util.retry import Retry
+
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=3,
+                backoff_factor=1.0,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET",),
+            )
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(max_retries=retry)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def _throttle_arxiv() -> None:
+    """
+    Block until this container may send its next request to arXiv.
+    """
+    global _arxiv_last_request_ts
+    with _arxiv_lock:
+        wait = _ARXIV_MIN_INTERVAL_SECONDS - (time.time() - _arxiv_last_request_ts)
+        if wait > 0:
+            time.sleep(wait)
+        _arxiv_last_request_ts = time.time()
+
+
+def _cached_pdf_is_complete(path: str) -> bool:
+    with open(path, "rb") as f:
+        head = f.read(8)
+        f.seek(max(0, os.path.getsize(path) - 1024))
+        return looks_like_complete_pdf(head, f.read())
+
+
+def _split_reference_block(text: str) -> List[str]:
+    """
+    Cut the References/Bibliography section out of `text` and split it into entries.
+    """
+    m = _REFS_HEADING_RE.search(text)
+    if not m:
+        return []
+
+    refs_block = text[m.end():]
+    stop = _REFS_STOP_RE.search(refs_block)
+    if stop:
+        refs_block = refs_block[:stop.start()]
+
+    refs = (" ".join(c.split()) for c in _REF_ENTRY_SPLIT_RE.split(refs_block))
+    return [c for c in refs if len(c) >= 30]
+
+
+@app.function(
+    image=image_citation,
+    secrets=[snowflake_secret],
+    volumes={ARXIV_PDF_CACHE_DIR: arxiv_pdf_volume},
+    # Together with _throttle_arxiv, keeps .map() fan-outs within arXiv's rate limit
+    max_containers=_ARXIV_MAX_CONTAINERS,
+    timeout=60 * 10,
+)
 def get_citations(arxiv_id: str, max_refs: int = 200) -> Dict[str, Any]:
     """
     arXiv-based reference parsing:
       1) Query arXiv API to get metadata + PDF link
-      2) Download PDF
+      2) Download PDF (concurrently with 1) unless the PDF volume already has it
       3) Extract text (prefer last pages)
       4) Find References/Bibliography section and split into entries
     """
-    import re
-    import requests
+    from concurrent.futures import ThreadPoolExecutor
     import feedparser
     import fitz  # PyMuPDF
 
+    session = _get_session()
+
+    def _fetch(url: str, timeout: float) -> bytes:
+        _throttle_arxiv()
+        r = session.get(url, timeout=timeout)
+        r.raise_for_status()
+        return r.content
+
+    def _fetch_pdf_to(url: str, path: str) -> Optional[bytes]:
+        # Stream straight to the PDF volume rather than holding the whole body in memory.
+        # A unique temp name plus rename means a killed container or a concurrent
+        # writer never leaves a partial file at the cache path.
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        _throttle_arxiv()
+        try:
+            with session.get(url, timeout=60, stream=True) as r:
+                r.raise_for_status()
+                with open(tmp_path, "wb") as f:
+                    for block in r.iter_content(chunk_size=1 << 16):
+                        f.write(block)
+            if not _cached_pdf_is_complete(tmp_path):
+                # Parse what arrived, but don't cache it
+                with open(tmp_path, "rb") as f:
+                    return f.read()
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        arxiv_pdf_volume.commit()
+        return None
+
     feed_url = f"http://export.arxiv.org/api/query?id_list={arxiv_id}"
-    feed = feedparser.parse(feed_url)
-    if not feed.entries:
-        raise ValueError(f"No arXiv entry found for arxiv_id={arxiv_id}")
+    default_pdf_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
+    cache_path = arxiv_pdf_cache_path(arxiv_id)
+    pdf_cached = bool(cache_path) and os.path.exists(cache_path)
+    if pdf_cached and not _cached_pdf_is_complete(cache_path):
+        print(f"Warning: discarding truncated cached PDF for {arxiv_id}")
+        os.remove(cache_path)
+        pdf_cached = False
+
+    # The PDF lives at a predictable URL, so download it while the metadata query runs
+    pdf_bytes = None
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        if pdf_cached:
+            pdf_future = None
+        elif cache_path:
+            pdf_future = pool.submit(_fetch_pdf_to, default_pdf_url, cache_path)
+        else:
+            pdf_future = pool.submit(_fetch, default_pdf_url, 60)
+        feed = feedparser.parse(_fetch(feed_url, 30))
+        if not feed.entries:
+            raise ValueError(f"No arXiv entry found for arxiv_id={arxiv_id}")
+        if pdf_future is not None:
+            pdf_bytes = pdf_future.result()
 
     entry = feed.entries[0]
     title = (entry.get("title") or "").strip().replace("\n", " ")
@@ -31,15 +176,14 @@ def get_citations(arxiv_id: str, max_refs: int = 200) -> Dict[str, Any]:
             pdf_url = link.href
             break
     if not pdf_url:
-        pdf_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
+        pdf_url = default_pdf_url
 
     meta = {"arxiv_id": arxiv_id, "title": title, "abstract": summary, "authors": authors, "pdf_url": pdf_url}
 
-    r = requests.get(pdf_url, timeout=60)
-    r.raise_for_status()
-    pdf_bytes = r.content
-
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    if pdf_bytes is None:
+        doc = fitz.open(cache_path)
+    else:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
 
     # Prefer last pages (references are near the end)
     n_pages = len(doc)
@@ -49,20 +193,5 @@ def get_citations(arxiv_id: str, max_refs: int = 200) -> Dict[str, Any]:
         full_text.append(doc.load_page(i).get_text("text"))
     text = "\n".join(full_text)
 
-    m = re.search(r"\n\s*(references|bibliography)\s*\n", text, flags=re.IGNORECASE)
-    if not m:
-        return {"arxiv_metadata": meta, "references": []}
-
-    refs_block = text[m.end():]
-    stop = re.search(r"\n\s*(appendix|acknowledg(e)?ments?)\s*\n", refs_block, flags=re.IGNORECASE)
-    if stop:
-        refs_block = refs_block[:stop.start()]
-
-    chunks = re.split(r"\n\s*(?:\[\d+\]|\d+\.\s|\d+\s)\s*", refs_block)
-    refs = []
-    for c in chunks:
-        c = re.sub(r"\s+", " ", c).strip()
-        if len(c) >= 30:
-            refs.append(c)
-
+    refs = _split_reference_block(text)
     return {"arxiv_metadata": meta, "references": refs[: int(max_refs)]}
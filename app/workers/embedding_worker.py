@@ -1,10 +1,174 @@
 # Offline worker to compute and backfill embeddings for papers in SILVER_PAPERS.
 # Also computes and caches top-k similar paper ids based on embedding similarity.
-from typing import List, Dict, Any, Tuple, Optional
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 import json
+import os
+
+import modal
 
 from app.utils import connect_to_snowflake
-from app.config import app, ml_image, snowflake_secret, DATABASE, qualify_table
+from app.config import (
+    app,
+    ml_image,
+    snowflake_secret,
+    DATABASE,
+    qualify_table,
+    ANN_INDEX_DIR,
+    ann_index_paths,
+    ann_index_volume,
+    MERGE_CHUNK_SIZE,
+)
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L12-v2"
+
+# sentence-transformers sorts inputs by length inside encode(), so larger batches
+# pad less per batch and keep the GPU busy.
+_ENCODE_BATCH_SIZE = 128
+# CPU-only containers spread large encodes over this many worker processes
+# (one model copy each); smaller lists aren't worth the pool start-up.
+_ENCODE_CPU_WORKERS = 4
+_MULTI_PROCESS_MIN_TEXTS = 256
+
+# Batches up to this size get neighbors from one in-warehouse query rather than
+# transferring every embedded paper to rank locally.
+_SQL_TOPK_MAX_BATCH = 8
+# Below this corpus size an exact (B, N) matmul is cheaper than building an HNSW index.
+_EXACT_TOPK_MAX_CORPUS = 50_000
+# Abstract characters fetched for embedding; comfortably past MiniLM's 256-token window,
+# so truncation happens in Snowflake instead of after shipping the full text
+_ABSTRACT_FETCH_MAX_CHARS = 2000
+# Lowest probe cosine vs. FP32 at which the int8-quantized CPU model is kept
+# (drift < 1e-3), since its vectors share the embedding column with FP32/FP16 ones
+_INT8_MIN_PROBE_COSINE = 0.999
+# model_name -> whether the int8 probe passed, so warm containers probe only once
+_int8_probe_passed: Dict[str, bool] = {}
+_INT8_PROBE_TEXTS = [
+    "Title: Attention Is All You Need\n\nAbstract: We propose the Transformer, based solely on attention.",
+    "Graph neural networks learn node representations by aggregating neighbor features.",
+    "We study convergence of stochastic gradient descent under heavy-tailed noise.",
+]
+
+def _load_sentence_transformer(model_name: str, device: Optional[str] = None):
+    import importlib
+    sentence_transformers = importlib.import_module("sentence_transformers")
+    if device is None:
+        return sentence_transformers.SentenceTransformer(model_name)
+    return sentence_transformers.SentenceTransformer(model_name, device=device)
+
+
+def _enable_fp16(model):
+    """
+    Switch the model to FP16, reverting to FP32 if half precision breaks
+    the unit-norm outputs that cosine search relies on.
+    """
+    import numpy as np
+
+    model.half()
+    probe = np.asarray(
+        model.encode(["fp16 normalization probe"], normalize_embeddings=True), dtype=np.float32
+    )
+    norms = np.linalg.norm(probe, axis=1)
+    if not np.all(np.isfinite(probe)) or not np.allclose(norms, 1.0, atol=1e-2):
+        print("FP16 embeddings are not unit-norm; keeping the model in FP32.")
+        model.float()
+    return model
+
+
+def _enable_int8_dynamic(model, model_name: str):
+    """
+    Dynamically quantize the transformer's Linear layers to int8 for CPU inference,
+    keeping FP32 if the quantized embeddings drift from the FP32 ones. The probe runs
+    once per model per container; later loads reuse its decision.
+    """
+    if not str(getattr(model, "device", "")).startswith("cpu"):
+        return model
+    passed = _int8_probe_passed.get(model_name)
+    if passed is False:
+        return model
+
+    import importlib
+    import numpy as np
+    torch = importlib.import_module("torch")
+
+    transformer = model._first_module()
+    fp32_module = transformer.auto_model
+    reference = None
+    if passed is None:
+        reference = np.asarray(model.encode(_INT8_PROBE_TEXTS, normalize_embeddings=True), dtype=np.float32)
+    transformer.auto_model = torch.quantization.quantize_dynamic(
+        fp32_module, {torch.nn.Linear}, dtype=torch.qint8
+    )
+    if passed:
+        return model
+
+    probe = np.asarray(model.encode(_INT8_PROBE_TEXTS, normalize_embeddings=True), dtype=np.float32)
+    min_cosine = float(np.min(np.sum(reference * probe, axis=1)))
+    passed = bool(np.all(np.isfinite(probe))) and min_cosine >= _INT8_MIN_PROBE_COSINE
+    print(
+        f"int8 probe for {model_name}: min cosine vs FP32 = {min_cosine:.6f}; "
+        f"{'using int8' if passed else 'keeping the model in FP32'}."
+    )
+    if not passed:
+        transformer.auto_model = fp32_module
+    _int8_probe_passed[model_name] = passed
+    return model
+
+
+def _encode_normalized(model, texts: List[str]):
+    """
+    L2-normalized embeddings for texts. On a multi-core CPU container, large lists go
+    through sentence-transformers' multi-process pool instead of one PyTorch process.
+
+    Duplicate texts (e.g. re-ingested arXiv versions with the same title and abstract)
+    are encoded once and their vector reused for every occurrence.
+    """
+    import numpy as np
+
+    unique_texts = list(dict.fromkeys(texts))
+    if len(unique_texts) < len(texts):
+        row_of = {text: row for row, text in enumerate(unique_texts)}
+        unique_vectors = np.asarray(_encode_normalized(model, unique_texts))
+        return unique_vectors[[row_of[text] for text in texts]]
+
+    workers = min(_ENCODE_CPU_WORKERS, os.cpu_count() or 1)
+    on_cpu = str(getattr(model, "device", "")).startswith("cpu")
+    if not on_cpu or workers < 2 or len(texts) < _MULTI_PROCESS_MIN_TEXTS:
+        return model.encode(
+            texts,
+            batch_size=_ENCODE_BATCH_SIZE,
+            show_progress_bar=False,
+            normalize_embeddings=True,
+        )
+
+    # Workers are spawned fresh; one intra-op thread each keeps N processes
+    # from oversubscribing the cores.
+    previous_threads = os.environ.get("OMP_NUM_THREADS")
+    os.environ["OMP_NUM_THREADS"] = "1"
+    try:
+        pool = model.start_multi_process_pool(["cpu"] * workers)
+    finally:
+        if previous_threads is None:
+            os.environ.pop("OMP_NUM_THREADS", None)
+        else:
+            os.environ["OMP_NUM_THREADS"] = previous_threads
+    try:
+        vectors = np.asarray(
+            model.encode_multi_process(texts, pool, batch_size=_ENCODE_BATCH_SIZE), dtype=np.float32
+        )
+    finally:
+        model.stop_multi_process_pool(pool)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def _download_default_model():
+    # Runs at image build time so containers start with the weights already on disk.
+    _load_sentence_transformer(DEFAULT_MODEL_NAME)
+
+
+embedding_image = ml_image.run_function(_download_default_model)
+
 
 def _silver_table(database: str = DATABASE) -> str:
     return qualify_table("SILVER_PAPERS", database=database)
@@ -46,13 +210,14 @@ def _fetch_unembedded_from_silver(cur, database: str = DATABASE, limit: int = 20
         ["id", "title", "conclusion", "abstract", "embedding"],
         silver,
     )
+    # conclusion only gates eligibility; _build_embedding_text doesn't use it, so the
+    # (often long) text isn't pulled over the wire
     cur.execute(
         f"""
         SELECT
             {cols["id"]} AS id,
             {cols["title"]} AS title,
-            {cols["conclusion"]} AS conclusion,
-            {cols["abstract"]} AS abstract
+            SUBSTR({cols["abstract"]}, 1, {_ABSTRACT_FETCH_MAX_CHARS}) AS abstract
         FROM {silver}
         WHERE {cols["embedding"]} IS NULL
             AND ({cols["abstract"]} IS NOT NULL OR {cols["conclusion"]} IS NOT NULL)
@@ -65,30 +230,103 @@ def _fetch_unembedded_from_silver(cur, database: str = DATABASE, limit: int = 20
 
     return result
 
-def _update_embeddings(cur, database: str, rows: List[Tuple[int, List[float]]], dim: int = 384):
+def _quantize_int8(vec) -> Tuple[bytes, float]:
+    """
+    Symmetric per-vector int8 quantization: returns (int8 bytes, scale).
+    """
+    import numpy as np
+
+    arr = np.asarray(vec, dtype=np.float32)
+    scale = float(np.max(np.abs(arr))) / 127.0 if arr.size else 0.0
+    if scale == 0.0:
+        return np.zeros(arr.shape, dtype=np.int8).tobytes(), 0.0
+    q = np.clip(np.round(arr / scale), -127, 127).astype(np.int8)
+    return q.tobytes(), scale
+
+
+def _dequantize_int8(raw: bytes, scale: float):
+    import numpy as np
+
+    return np.frombuffer(bytes(raw), dtype=np.int8).astype(np.float32) * np.float32(scale)
+
+
+def _vector_json(vec) -> str:
+    # JSON array text for a PARSE_JSON(...)::VECTOR bind; accepts lists or ndarray rows
+    return json.dumps(vec.tolist() if hasattr(vec, "tolist") else vec)
+
+
+def _has_quantized_columns(column_map: dict[str, str]) -> bool:
+    return "embedding_i8" in column_map and "embedding_scale" in column_map
+
+
+def _update_embeddings(cur, database: str, rows: List[Tuple[int, Any]], dim: int = 384):
     if not rows:
         return
 
     silver = _silver_table(database=database)
-    cols = _require_columns(
-        _resolve_table_columns(cur, silver),
-        ["id", "embedding"],
-        silver,
-    )
-    sql = f"""
-    UPDATE {silver}
-    SET {cols["embedding"]} = PARSE_JSON(%s)::VECTOR(FLOAT, {dim})
-    WHERE {cols["id"]} = %s
-    """
-
-    binds = [(json.dumps(emb), int(pid)) for pid, emb in rows]
-    cur.executemany(sql, binds)
+    column_map = _resolve_table_columns(cur, silver)
+    cols = _require_columns(column_map, ["id", "embedding"], silver)
+
+    # The FP32 vector is still written for readers that have not moved to the
+    # int8 columns; the quantized copy is only written once the columns exist.
+    quantized = _has_quantized_columns(column_map)
+
+    # One MERGE per chunk instead of executemany, which the connector sends as
+    # one UPDATE round-trip per row.
+    for start in range(0, len(rows), MERGE_CHUNK_SIZE):
+        chunk = rows[start:start + MERGE_CHUNK_SIZE]
+        params: List[Any] = []
+        if quantized:
+            values_sql = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
+            for pid, emb in chunk:
+                params.extend([int(pid), _vector_json(emb), *_quantize_int8(emb)])
+            cur.execute(
+                f"""
+                MERGE INTO {silver} AS target
+                USING (
+                    SELECT
+                        column1 AS id,
+                        PARSE_JSON(column2)::VECTOR(FLOAT, {dim}) AS embedding,
+                        column3 AS embedding_i8,
+                        column4 AS embedding_scale
+                    FROM VALUES {values_sql}
+                ) AS source
+                ON target.{cols["id"]} = source.id
+                WHEN MATCHED THEN
+                    UPDATE SET target.{cols["embedding"]} = source.embedding,
+                               target.{column_map["embedding_i8"]} = source.embedding_i8,
+                               target.{column_map["embedding_scale"]} = source.embedding_scale
+                """,
+                params,
+            )
+        else:
+            values_sql = ", ".join(["(%s, %s)"] * len(chunk))
+            for pid, emb in chunk:
+                params.extend([int(pid), _vector_json(emb)])
+            cur.execute(
+                f"""
+                MERGE INTO {silver} AS target
+                USING (
+                    SELECT
+                        column1 AS id,
+                        PARSE_JSON(column2)::VECTOR(FLOAT, {dim}) AS embedding
+                    FROM VALUES {values_sql}
+                ) AS source
+                ON target.{cols["id"]} = source.id
+                WHEN MATCHED THEN
+                    UPDATE SET target.{cols["embedding"]} = source.embedding
+                """,
+                params,
+            )
 
 
-def _compute_topk_in_snowflake(cur, database: str, pid: int, k: int) -> List[int]:
-    # Profiled because: this runs a full cosine-similarity scan over every
-    # embedded paper in Silver for each paper we process — O(n) Snowflake
-    # compute per paper, so it scales badly as the corpus grows.
+def _compute_topk_batch_in_snowflake(cur, database: str, pids: List[int], k: int) -> Dict[int, List[int]]:
+    """
+    Top-k neighbors for several papers in one set-based query (QUALIFY ROW_NUMBER
+    per source paper) instead of one full scan per paper.
+    """
+    if not pids:
+        return {}
 
     silver = _silver_table(database=database)
     cols = _require_columns(
@@ -96,42 +334,329 @@ def _compute_topk_in_snowflake(cur, database: str, pid: int, k: int) -> List[int
         ["id", "embedding"],
         silver,
     )
+    values_sql = ", ".join(["(%s)"] * len(pids))
     cur.execute(
         f"""
         WITH q AS (
-            SELECT {cols["embedding"]} AS qvec
+            SELECT {cols["id"]} AS qid, {cols["embedding"]} AS qvec
             FROM {silver}
-            WHERE {cols["id"]} = %s
+            WHERE {cols["id"]} IN (SELECT column1 FROM VALUES {values_sql})
                 AND {cols["embedding"]} IS NOT NULL
         )
-        SELECT e.{cols["id"]}
-        FROM {silver} e, q
-        WHERE e.{cols["id"]} <> %s
-            AND e.{cols["embedding"]} IS NOT NULL
-        ORDER BY VECTOR_COSINE_SIMILARITY(e.{cols["embedding"]}, q.qvec) DESC
-        LIMIT %s
+        SELECT q.qid, e.{cols["id"]},
+            ROW_NUMBER() OVER (
+                PARTITION BY q.qid
+                ORDER BY VECTOR_COSINE_SIMILARITY(e.{cols["embedding"]}, q.qvec) DESC
+            ) AS rn
+        FROM q
+        JOIN {silver} e
+            ON e.{cols["id"]} <> q.qid
+        WHERE e.{cols["embedding"]} IS NOT NULL
+        QUALIFY rn <= %s
+        ORDER BY q.qid, rn
         """,
-        (pid, pid, int(k)),
+        [int(pid) for pid in pids] + [int(k)],
+    )
+    result: Dict[int, List[int]] = {}
+    for qid, target_id, _ in cur.fetchall():
+        result.setdefault(int(qid), []).append(int(target_id))
+    return result
+
+
+def _compute_topk_in_snowflake(cur, database: str, pid: int, k: int) -> List[int]:
+    return _compute_topk_batch_in_snowflake(cur, database=database, pids=[pid], k=k).get(int(pid), [])
+
+
+def _parse_embedding(value: Any) -> List[float]:
+    # The connector may hand VECTOR columns back as a list or as a JSON string.
+    if isinstance(value, str):
+        return json.loads(value)
+    return list(value)
+
+
+def _fetch_corpus_embeddings(cur, database: str):
+    """
+    Fetch every embedded paper once as (ids, float32 matrix of shape (N, D)).
+    """
+    import numpy as np
+
+    silver = _silver_table(database=database)
+    column_map = _resolve_table_columns(cur, silver)
+    cols = _require_columns(column_map, ["id", "embedding"], silver)
+
+    if _has_quantized_columns(column_map):
+        # Pull the 384-byte int8 copy where present (4x less transfer than FP32);
+        # rows embedded before the migration still come back as FP32.
+        i8, scale = column_map["embedding_i8"], column_map["embedding_scale"]
+        cur.execute(
+            f"""
+            SELECT {cols["id"]}, {i8}, {scale},
+                IFF({i8} IS NULL, {cols["embedding"]}, NULL)
+            FROM {silver}
+            WHERE {cols["embedding"]} IS NOT NULL
+            ORDER BY {cols["id"]}
+            """
+        )
+        rows = cur.fetchall()
+        vectors = [
+            _dequantize_int8(r[1], r[2]) if r[1] is not None else _parse_embedding(r[3])
+            for r in rows
+        ]
+    else:
+        cur.execute(
+            f"""
+            SELECT {cols["id"]}, {cols["embedding"]}
+            FROM {silver}
+            WHERE {cols["embedding"]} IS NOT NULL
+            ORDER BY {cols["id"]}
+            """
+        )
+        rows = cur.fetchall()
+        vectors = [_parse_embedding(r[1]) for r in rows]
+
+    ids = [int(r[0]) for r in rows]
+    if not rows:
+        return ids, np.zeros((0, 0), dtype=np.float32)
+    mat = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    mat /= np.where(norms > 0, norms, 1.0)
+    return ids, np.ascontiguousarray(mat)
+
+
+def _topk_numpy(query_vecs, corpus_vecs, corpus_ids: List[int], k: int) -> List[List[int]]:
+    """
+    Exact top-k by cosine for L2-normalized float32 rows, as one (B, N) SGEMM.
+    """
+    import numpy as np
+
+    query_vecs = np.ascontiguousarray(query_vecs, dtype=np.float32)
+    corpus_vecs = np.ascontiguousarray(corpus_vecs, dtype=np.float32)
+    k = min(int(k), corpus_vecs.shape[0])
+    if k <= 0 or query_vecs.shape[0] == 0:
+        return [[] for _ in range(query_vecs.shape[0])]
+
+    sims = query_vecs @ corpus_vecs.T
+    if k < sims.shape[1]:
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(sims.shape[1]), sims.shape)
+    top_sims = np.take_along_axis(sims, top, axis=1)
+    order = np.argsort(-top_sims, axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+    return [[corpus_ids[int(j)] for j in row] for row in top]
+
+
+def _build_ann_index(mat):
+    """
+    Build an HNSW inner-product index over L2-normalized rows (inner product == cosine).
+
+    Vectors are stored 8-bit scalar-quantized, a quarter of the FP32 footprint.
+    """
+    import importlib
+    faiss = importlib.import_module("faiss")
+
+    index = faiss.IndexHNSWSQ(
+        int(mat.shape[1]), faiss.ScalarQuantizer.QT_8bit, 32, faiss.METRIC_INNER_PRODUCT
     )
-    result = [int(r[0]) for r in cur.fetchall()]
+    index.hnsw.efConstruction = 200
+    index.train(mat)
+    index.add(mat)
+    return index
+
+
+def _load_or_build_ann_index(ids: List[int], mat, database: str = DATABASE):
+    """
+    Return an ANN index over the L2-normalized rows of `mat`.
+
+    The index is persisted to database's files on the ANN volume (when mounted) and
+    reused as long as the corpus ids have not changed since it was built.
+    """
+    import importlib
+    import numpy as np
+    faiss = importlib.import_module("faiss")
 
+    index_path, ids_path = ann_index_paths(database)
+    persist = os.path.isdir(os.path.dirname(index_path))
+
+    if persist and os.path.exists(index_path) and os.path.exists(ids_path):
+        cached_ids = np.load(ids_path)
+        if cached_ids.tolist() == list(ids):
+            return faiss.read_index(index_path)
+
+    index = _build_ann_index(mat)
+    if persist:
+        faiss.write_index(index, index_path)
+        np.save(ids_path, np.asarray(ids, dtype=np.int64))
+        ann_index_volume.commit()
+    return index
+
+
+def _ann_index_persistable() -> bool:
+    """
+    True when this container mounts the ANN volume and can build a FAISS index.
+    """
+    import importlib
+
+    if not os.path.isdir(ANN_INDEX_DIR):
+        return False
+    try:
+        importlib.import_module("faiss")
+    except ImportError:
+        print("faiss is not installed; not refreshing the persisted ANN index.")
+        return False
+    return True
+
+
+def _refresh_ann_index(
+    cur,
+    database: str,
+    new_ids: List[int],
+    new_vecs,
+) -> Optional[Tuple[List[int], Any]]:
+    """
+    Keep database's persisted ANN index in step with freshly embedded papers.
+
+    New vectors are appended to an existing index with index.add. The corpus is only
+    pulled to (re)build the index when there is none yet and the corpus is past the
+    exact top-k threshold, or when a batch re-embeds papers already in the index.
+    Returns the corpus when it had to be fetched, else None.
+    """
+    import importlib
+    import numpy as np
+    faiss = importlib.import_module("faiss")
+
+    index_path, ids_path = ann_index_paths(database)
+    if os.path.exists(index_path) and os.path.exists(ids_path):
+        cached_ids = [int(x) for x in np.load(ids_path).tolist()]
+        if not set(cached_ids) & set(new_ids):
+            index = faiss.read_index(index_path)
+            index.add(np.ascontiguousarray(new_vecs, dtype=np.float32))
+            faiss.write_index(index, index_path)
+            np.save(ids_path, np.asarray(cached_ids + list(new_ids), dtype=np.int64))
+            ann_index_volume.commit()
+            return None
+    elif _count_embedded_papers(cur, database=database) <= _EXACT_TOPK_MAX_CORPUS:
+        return None
+
+    corpus = _fetch_corpus_embeddings(cur, database=database)
+    if corpus[0]:
+        _load_or_build_ann_index(*corpus, database=database)
+    return corpus
+
+
+def _search_ann_topk(index, ids: List[int], mat, query_ids: List[int], k: int) -> Dict[int, List[int]]:
+    """
+    Answer top-k neighbors for every query id in one batched index search.
+    """
+    row_of = {pid: row for row, pid in enumerate(ids)}
+    query_ids = [pid for pid in query_ids if pid in row_of]
+    if not query_ids:
+        return {}
+
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = max(64, int(k) + 1)
+    _, neighbor_rows = index.search(mat[[row_of[pid] for pid in query_ids]], int(k) + 1)
+
+    result: Dict[int, List[int]] = {}
+    for pid, rows in zip(query_ids, neighbor_rows):
+        sim_ids = [ids[int(r)] for r in rows if int(r) >= 0 and ids[int(r)] != pid]
+        result[pid] = sim_ids[: int(k)]
     return result
 
-def _write_similar_ids(cur, database: str, pid: int, sim_ids: List[int]):
+
+def _compute_neighbors(
+    corpus_ids: List[int],
+    corpus,
+    query_ids: List[int],
+    k: int,
+    database: str = DATABASE,
+) -> Dict[int, List[int]]:
+    """
+    Top-k neighbor ids for each query id, excluding the paper itself.
+
+    Uses an exact NumPy matmul for small corpora and the FAISS HNSW index otherwise.
+    """
+    import importlib
+
+    use_ann = len(corpus_ids) > _EXACT_TOPK_MAX_CORPUS
+    if use_ann:
+        try:
+            importlib.import_module("faiss")
+        except ImportError:
+            print("faiss is not installed; falling back to exact NumPy top-k.")
+            use_ann = False
+
+    if use_ann:
+        index = _load_or_build_ann_index(corpus_ids, corpus, database=database)
+        return _search_ann_topk(index, corpus_ids, corpus, query_ids, k=k)
+
+    row_of = {pid: row for row, pid in enumerate(corpus_ids)}
+    query_ids = [pid for pid in query_ids if pid in row_of]
+    if not query_ids:
+        return {}
+    ranked = _topk_numpy(corpus[[row_of[pid] for pid in query_ids]], corpus, corpus_ids, int(k) + 1)
+    return {
+        pid: [sid for sid in sim_ids if sid != pid][: int(k)]
+        for pid, sim_ids in zip(query_ids, ranked)
+    }
+
+
+def _neighbors_for_papers(
+    cur,
+    database: str,
+    pids: List[int],
+    k: int,
+    corpus: Optional[Tuple[List[int], Any]] = None,
+) -> Dict[int, List[int]]:
+    """
+    Small batches are ranked in-warehouse; larger ones pull the corpus once and rank locally.
+    A corpus the caller already fetched is ranked locally regardless of batch size.
+    """
+    if corpus is None:
+        if len(pids) <= _SQL_TOPK_MAX_BATCH:
+            return _compute_topk_batch_in_snowflake(cur, database=database, pids=pids, k=k)
+        corpus = _fetch_corpus_embeddings(cur, database=database)
+    corpus_ids, corpus_vecs = corpus
+    return _compute_neighbors(corpus_ids, corpus_vecs, pids, k=k, database=database)
+
+
+def _write_similar_ids_bulk(cur, database: str, neighbors: Dict[int, List[int]]):
+    """
+    Cache neighbor id lists for many papers with one MERGE per chunk.
+    """
+    if not neighbors:
+        return
+
     silver = _silver_table(database=database)
     cols = _require_columns(
         _resolve_table_columns(cur, silver),
         ["id", "similar_embeddings_ids"],
         silver,
     )
-    cur.execute(
-        f"""
-        UPDATE {silver}
-        SET {cols["similar_embeddings_ids"]} = PARSE_JSON(%s)
-        WHERE {cols["id"]} = %s
-        """,
-        (json.dumps(sim_ids), int(pid)),
-    )
+    items = list(neighbors.items())
+    for start in range(0, len(items), MERGE_CHUNK_SIZE):
+        chunk = items[start:start + MERGE_CHUNK_SIZE]
+        values_sql = ", ".join(["(%s, %s)"] * len(chunk))
+        params: List[Any] = []
+        for pid, sim_ids in chunk:
+            params.extend([int(pid), json.dumps(sim_ids)])
+        cur.execute(
+            f"""
+            MERGE INTO {silver} AS target
+            USING (
+                SELECT column1 AS id, PARSE_JSON(column2) AS similar_embeddings_ids
+                FROM VALUES {values_sql}
+            ) AS source
+            ON target.{cols["id"]} = source.id
+            WHEN MATCHED THEN
+                UPDATE SET target.{cols["similar_embeddings_ids"]} = source.similar_embeddings_ids
+            """,
+            params,
+        )
+
+
+def _write_similar_ids(cur, database: str, pid: int, sim_ids: List[int]):
+    _write_similar_ids_bulk(cur, database=database, neighbors={int(pid): sim_ids})
 
 
 def _count_embedded_papers(cur, database: str) -> int:
@@ -200,25 +725,39 @@ def _fetch_single_paper_by_arxiv_id(cur, database: str, arxiv_id: str) -> Option
     }
 
 
-@app.function(image=ml_image, secrets=[snowflake_secret], timeout=60 * 10)
-def process_single_embedding(
+@contextmanager
+def _snowflake_cursor(conn=None, database: str = DATABASE) -> Iterator[Tuple[Any, Any]]:
+    """
+    Yield (conn, cur). A caller-supplied connection is reused and left open
+    (rolled back on error); otherwise one is opened and closed around the block.
+    """
+    owns_conn = conn is None
+    if owns_conn:
+        conn = connect_to_snowflake(database=database, schema="SILVER")
+    cur = conn.cursor()
+    try:
+        yield conn, cur
+    except Exception:
+        if not owns_conn:
+            conn.rollback()
+        raise
+    finally:
+        cur.close()
+        if owns_conn:
+            conn.close()
+
+
+def _embed_single_paper(
+    load_model: Callable[[], Any],
+    model_name: str,
     arxiv_id: str,
-    model_name: str = "sentence-transformers/all-MiniLM-L12-v2",
     populate_similar: bool = True,
     k: int = 10,
     overwrite_existing: bool = False,
     database: str = DATABASE,
+    conn=None,
 ) -> Dict[str, Any]:
-    """
-    Embed exactly one paper identified by arxiv_id and optionally populate neighbors.
-    """
-    import importlib
-    sentence_transformers = importlib.import_module("sentence_transformers")
-    SentenceTransformer = sentence_transformers.SentenceTransformer
-
-    conn = connect_to_snowflake(database=database, schema="SILVER")
-    cur = conn.cursor()
-    try:
+    with _snowflake_cursor(conn, database=database) as (conn, cur):
         row = _fetch_single_paper_by_arxiv_id(cur, database=database, arxiv_id=arxiv_id)
         if not row:
             return {"status": "failed", "error": f"arxiv_id not found in SILVER_PAPERS: {arxiv_id}"}
@@ -242,7 +781,7 @@ def process_single_embedding(
                 "database": database,
             }
 
-        model = SentenceTransformer(model_name)
+        model = load_model()
         vec = model.encode([text], normalize_embeddings=True)[0].tolist()
         pid = int(row["id"])
 
@@ -264,31 +803,19 @@ def process_single_embedding(
             "neighbors_populated": populated_neighbors,
             "database": database,
         }
-    finally:
-        cur.close()
-        conn.close()
 
 
-@app.function(image=ml_image, secrets=[snowflake_secret], timeout=60 * 20)
-def run_embedding_batch(
+def _embed_paper_batch(
+    load_model: Callable[[], Any],
+    model_name: str,
     limit: int = 200,
-    model_name: str = "sentence-transformers/all-MiniLM-L12-v2",
     populate_similar: bool = True,
     min_corpus_size_for_neighbors: Optional[int] = None,
     k: int = 10,
     database: str = DATABASE,
+    conn=None,
 ) -> Dict[str, Any]:
-    """
-    Pull rows with NULL embedding from SILVER_PAPERS, generate embeddings,
-    and optionally populate similar ids.
-    """
-    import importlib
-    sentence_transformers = importlib.import_module("sentence_transformers")
-    SentenceTransformer = sentence_transformers.SentenceTransformer
-
-    conn = connect_to_snowflake(database=database, schema="SILVER")
-    cur = conn.cursor()
-    try:
+    with _snowflake_cursor(conn, database=database) as (conn, cur):
         to_embed = _fetch_unembedded_from_silver(cur, database=database, limit=limit)
         if not to_embed:
             return {"status": "ok", "embedded": 0, "note": "No new rows with NULL embedding."}
@@ -297,22 +824,12 @@ def run_embedding_batch(
         # and model.encode() over a batch is the dominant CPU/GPU cost — seeing
         # its share of total time tells us whether batching or model choice matters.
 
-        model = SentenceTransformer(model_name)
-
-        ids: List[int] = []
-        texts: List[str] = []
-        skipped_empty_text = 0
+        model = load_model()
 
-        for row in to_embed:
-            pid = int(row["id"])
-            text = _build_embedding_text(row)
-            if not text:
-                skipped_empty_text += 1
-                continue
-            ids.append(pid)
-            texts.append(text)
+        pairs = [(int(row["id"]), text) for row in to_embed if (text := _build_embedding_text(row))]
+        skipped_empty_text = len(to_embed) - len(pairs)
 
-        if not texts:
+        if not pairs:
             return {
                 "status": "ok",
                 "embedded": 0,
@@ -320,30 +837,33 @@ def run_embedding_batch(
                 "skipped_empty_text": skipped_empty_text,
             }
 
-        vectors = model.encode(
-            texts,
-            batch_size=32,
-            show_progress_bar=False,
-            normalize_embeddings=True,
-        )
+        import numpy as np
+
+        ids, texts = map(list, zip(*pairs))
+        vectors = _encode_normalized(model, texts)
 
-        payload: List[Tuple[int, List[float]]] = []
-        for pid, vec in zip(ids, vectors):
-            payload.append((pid, vec.tolist()))
+        # float32 ndarray rows go straight to the bind: int8 quantization reads them
+        # as-is and each row is converted to JSON once
+        payload: List[Tuple[int, Any]] = list(zip(ids, np.asarray(vectors, dtype=np.float32)))
 
         _update_embeddings(cur, database=database, rows=payload)
         conn.commit()
 
-        total = _count_embedded_papers(cur, database=database)
-        should_populate_neighbors = (
-            populate_similar
-            and (min_corpus_size_for_neighbors is None or total >= int(min_corpus_size_for_neighbors))
-        )
+        # Keep the persisted ANN index in step with the embedded corpus, independent of
+        # which path ranks similar_ids; a corpus fetched for a rebuild is reused below
+        corpus = None
+        if _ann_index_persistable():
+            corpus = _refresh_ann_index(cur, database=database, new_ids=ids, new_vecs=vectors)
+
+        # Only count the corpus when a minimum size actually gates neighbor population
+        should_populate_neighbors = bool(populate_similar)
+        if should_populate_neighbors and min_corpus_size_for_neighbors is not None:
+            total = _count_embedded_papers(cur, database=database)
+            should_populate_neighbors = total >= int(min_corpus_size_for_neighbors)
 
         if should_populate_neighbors:
-            for pid in ids:
-                sim_ids = _compute_topk_in_snowflake(cur, database=database, pid=pid, k=k)
-                _write_similar_ids(cur, database=database, pid=pid, sim_ids=sim_ids)
+            neighbors = _neighbors_for_papers(cur, database=database, pids=ids, k=k, corpus=corpus)
+            _write_similar_ids_bulk(cur, database=database, neighbors=neighbors)
             conn.commit()
 
         return {
@@ -355,12 +875,14 @@ def run_embedding_batch(
             "neighbors_populated": bool(should_populate_neighbors),
             "skipped_empty_text": skipped_empty_text,
         }
-    finally:
-        cur.close()
-        conn.close()
 
 
-@app.function(image=ml_image, secrets=[snowflake_secret], timeout=60 * 20)
+@app.function(
+    image=ml_image,
+    secrets=[snowflake_secret],
+    volumes={ANN_INDEX_DIR: ann_index_volume},
+    timeout=60 * 20,
+)
 def backfill_similar_ids(limit: int = 200, k: int = 10, database: str = DATABASE) -> Dict[str, Any]:
     """
     Fill similar_embeddings_ids for older papers that already have embeddings
@@ -389,19 +911,11 @@ def backfill_similar_ids(limit: int = 200, k: int = 10, database: str = DATABASE
         if not ids:
             return {"status": "ok", "backfilled": 0, "note": "No rows missing cache."}
 
-        for pid in ids:
-            sim_ids = _compute_topk_in_snowflake(cur, database=database, pid=pid, k=k)
-            cur.execute(
-                f"""
-                UPDATE {silver}
-                SET {cols["similar_embeddings_ids"]} = PARSE_JSON(%s)
-                WHERE {cols["id"]} = %s
-                """,
-                (json.dumps(sim_ids), int(pid)),
-            )
+        neighbors = _neighbors_for_papers(cur, database=database, pids=ids, k=k)
+        _write_similar_ids_bulk(cur, database=database, neighbors=neighbors)
 
         conn.commit()
-        return {"status": "ok", "backfilled": len(ids), "k": int(k), "database": database}
+        return {"status": "ok", "backfilled": len(neighbors), "k": int(k), "database": database}
     finally:
         cur.close()
         conn.close()
@@ -435,7 +949,7 @@ def _fetch_unembedded_chunks(cur, database: str = DATABASE, limit: int = 500) ->
     return [dict(zip(cols, r)) for r in rows]
 
 
-def _update_chunk_embeddings(cur, database: str, rows: List[Tuple[int, List[float]]], dim: int = 384):
+def _update_chunk_embeddings(cur, database: str, rows: List[Tuple[int, Any]], dim: int = 384):
     """
     Update embeddings for chunks.
     """
@@ -448,37 +962,39 @@ def _update_chunk_embeddings(cur, database: str, rows: List[Tuple[int, List[floa
         ["chunk_id", "embedding"],
         chunks,
     )
-    sql = f"""
-    UPDATE {chunks}
-    SET {cols["embedding"]} = PARSE_JSON(%s)::VECTOR(FLOAT, {dim})
-    WHERE {cols["chunk_id"]} = %s
-    """
-
-    binds = [(json.dumps(emb), int(chunk_id)) for chunk_id, emb in rows]
-    cur.executemany(sql, binds)
+    # executemany() of an UPDATE is one round trip per chunk; MERGE a VALUES
+    # block per MERGE_CHUNK_SIZE rows instead.
+    for start in range(0, len(rows), MERGE_CHUNK_SIZE):
+        chunk = rows[start:start + MERGE_CHUNK_SIZE]
+        values_sql = ", ".join(["(%s, %s)"] * len(chunk))
+        params: List[Any] = []
+        for chunk_id, emb in chunk:
+            params.extend([int(chunk_id), _vector_json(emb)])
+        cur.execute(
+            f"""
+            MERGE INTO {chunks} AS target
+            USING (
+                SELECT
+                    column1 AS chunk_id,
+                    PARSE_JSON(column2)::VECTOR(FLOAT, {dim}) AS embedding
+                FROM VALUES {values_sql}
+            ) AS source
+            ON target.{cols["chunk_id"]} = source.chunk_id
+            WHEN MATCHED THEN
+                UPDATE SET target.{cols["embedding"]} = source.embedding
+            """,
+            params,
+        )
 
 
-@app.function(image=ml_image, secrets=[snowflake_secret], timeout=60 * 30)
-def run_chunk_embedding_batch(
+def _embed_chunk_batch(
+    load_model: Callable[[], Any],
+    model_name: str,
     limit: int = 500,
-    model_name: str = "sentence-transformers/all-MiniLM-L12-v2",
     database: str = DATABASE,
+    conn=None,
 ) -> Dict[str, Any]:
-    """
-    Embed chunks from SILVER_PAPER_CHUNKS.
-
-    - Fetches chunks without embeddings
-    - Encodes chunk_text using the same model as paper embeddings
-    - Stores results in SILVER_PAPER_CHUNKS.embedding column
-    - Independent of paper-level embeddings (both can coexist)
-    """
-    import importlib
-    sentence_transformers = importlib.import_module("sentence_transformers")
-    SentenceTransformer = sentence_transformers.SentenceTransformer
-
-    conn = connect_to_snowflake(database=database, schema="SILVER")
-    cur = conn.cursor()
-    try:
+    with _snowflake_cursor(conn, database=database) as (conn, cur):
         chunks_to_embed = _fetch_unembedded_chunks(cur, database=database, limit=limit)
         if not chunks_to_embed:
             return {"status": "ok", "chunks_embedded": 0, "note": "No new chunks to embed."}
@@ -487,36 +1003,27 @@ def run_chunk_embedding_batch(
         # model.encode() runs over a much larger list — this is likely the
         # single most expensive encode call in the whole pipeline.
 
-        model = SentenceTransformer(model_name)
+        model = load_model()
 
-        chunk_ids: List[int] = []
-        texts: List[str] = []
+        pairs = [
+            (int(chunk["chunk_id"]), text)
+            for chunk in chunks_to_embed
+            if (text := (chunk.get("chunk_text") or "").strip())
+        ]
 
-        for chunk in chunks_to_embed:
-            chunk_id = int(chunk["chunk_id"])
-            text = (chunk.get("chunk_text") or "").strip()
-            if not text:
-                continue
-            chunk_ids.append(chunk_id)
-            texts.append(text)
-
-        if not texts:
+        if not pairs:
             return {
                 "status": "ok",
                 "chunks_embedded": 0,
                 "note": "No chunks contained usable text for embedding.",
             }
 
-        vectors = model.encode(
-            texts,
-            batch_size=32,
-            show_progress_bar=False,
-            normalize_embeddings=True,
-        )
+        import numpy as np
 
-        payload: List[Tuple[int, List[float]]] = []
-        for chunk_id, vec in zip(chunk_ids, vectors):
-            payload.append((chunk_id, vec.tolist()))
+        chunk_ids, texts = map(list, zip(*pairs))
+        vectors = _encode_normalized(model, texts)
+
+        payload: List[Tuple[int, Any]] = list(zip(chunk_ids, np.asarray(vectors, dtype=np.float32)))
 
         _update_chunk_embeddings(cur, database=database, rows=payload)
         conn.commit()
@@ -527,6 +1034,169 @@ def run_chunk_embedding_batch(
             "model": model_name,
             "database": database,
         }
-    finally:
-        cur.close()
-        conn.close()
+
+
+@app.function(image=ml_image, secrets=[snowflake_secret], timeout=60 * 10)
+def process_single_embedding(
+    arxiv_id: str,
+    model_name: str = DEFAULT_MODEL_NAME,
+    populate_similar: bool = True,
+    k: int = 10,
+    overwrite_existing: bool = False,
+    database: str = DATABASE,
+) -> Dict[str, Any]:
+    """
+    Embed exactly one paper identified by arxiv_id and optionally populate neighbors.
+    """
+    return _embed_single_paper(
+        lambda: _load_sentence_transformer(model_name),
+        model_name,
+        arxiv_id=arxiv_id,
+        populate_similar=populate_similar,
+        k=k,
+        overwrite_existing=overwrite_existing,
+        database=database,
+    )
+
+
+@app.function(
+    image=ml_image,
+    cpu=_ENCODE_CPU_WORKERS,
+    secrets=[snowflake_secret],
+    volumes={ANN_INDEX_DIR: ann_index_volume},
+    timeout=60 * 20,
+)
+def run_embedding_batch(
+    limit: int = 200,
+    model_name: str = DEFAULT_MODEL_NAME,
+    populate_similar: bool = True,
+    min_corpus_size_for_neighbors: Optional[int] = None,
+    k: int = 10,
+    database: str = DATABASE,
+) -> Dict[str, Any]:
+    """
+    Pull rows with NULL embedding from SILVER_PAPERS, generate embeddings,
+    and optionally populate similar ids.
+    """
+    return _embed_paper_batch(
+        lambda: _enable_int8_dynamic(_load_sentence_transformer(model_name), model_name),
+        model_name,
+        limit=limit,
+        populate_similar=populate_similar,
+        min_corpus_size_for_neighbors=min_corpus_size_for_neighbors,
+        k=k,
+        database=database,
+    )
+
+
+@app.function(image=ml_image, cpu=_ENCODE_CPU_WORKERS, secrets=[snowflake_secret], timeout=60 * 30)
+def run_chunk_embedding_batch(
+    limit: int = 500,
+    model_name: str = DEFAULT_MODEL_NAME,
+    database: str = DATABASE,
+) -> Dict[str, Any]:
+    """
+    Embed chunks from SILVER_PAPER_CHUNKS.
+
+    - Fetches chunks without embeddings
+    - Encodes chunk_text using the same model as paper embeddings
+    - Stores results in SILVER_PAPER_CHUNKS.embedding column
+    - Independent of paper-level embeddings (both can coexist)
+    """
+    return _embed_chunk_batch(
+        lambda: _enable_int8_dynamic(_load_sentence_transformer(model_name), model_name),
+        model_name,
+        limit=limit,
+        database=database,
+    )
+
+
+@app.cls(
+    image=embedding_image,
+    gpu="T4",
+    secrets=[snowflake_secret],
+    volumes={ANN_INDEX_DIR: ann_index_volume},
+    scaledown_window=600,
+    timeout=60 * 30,
+)
+class Embedder:
+    """
+    Same entrypoints as the module-level functions, but the SentenceTransformer
+    (on GPU in FP16) and the Snowflake connection are opened once per container
+    and reused across warm invocations.
+    """
+
+    model_name: str = modal.parameter(default=DEFAULT_MODEL_NAME)
+
+    @modal.enter()
+    def load_model(self):
+        import importlib
+        torch = importlib.import_module("torch")
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        print(f"Loading {self.model_name} onto {device}...")
+        self.model = _load_sentence_transformer(self.model_name, device=device)
+        if device == "cuda":
+            self.model = _enable_fp16(self.model)
+        else:
+            self.model = _enable_int8_dynamic(self.model, self.model_name)
+
+    @modal.enter()
+    def open_connection(self):
+        self.conn = connect_to_snowflake(database=DATABASE, schema="SILVER")
+
+    @modal.exit()
+    def close_connection(self):
+        self.conn.close()
+
+    def _connection(self):
+        # Reconnect if Snowflake dropped the session while the container sat idle
+        if self.conn.is_closed():
+            self.conn = connect_to_snowflake(database=DATABASE, schema="SILVER")
+        return self.conn
+
+    @modal.method()
+    def process_single_embedding(
+        self,
+        arxiv_id: str,
+        populate_similar: bool = True,
+        k: int = 10,
+        overwrite_existing: bool = False,
+        database: str = DATABASE,
+    ) -> Dict[str, Any]:
+        return _embed_single_paper(
+            lambda: self.model,
+            self.model_name,
+            arxiv_id=arxiv_id,
+            populate_similar=populate_similar,
+            k=k,
+            overwrite_existing=overwrite_existing,
+            database=database,
+            conn=self._connection(),
+        )
+
+    @modal.method()
+    def run_embedding_batch(
+        self,
+        limit: int = 200,
+        populate_similar: bool = True,
+        min_corpus_size_for_neighbors: Optional[int] = None,
+        k: int = 10,
+        database: str = DATABASE,
+    ) -> Dict[str, Any]:
+        return _embed_paper_batch(
+            lambda: self.model,
+            self.model_name,
+            limit=limit,
+            populate_similar=populate_similar,
+            min_corpus_size_for_neighbors=min_corpus_size_for_neighbors,
+            k=k,
+            database=database,
+            conn=self._connection(),
+        )
+
+    @modal.method()
+    def run_chunk_embedding_batch(self, limit: int = 500, database: str = DATABASE) -> Dict[str, Any]:
+        return _embed_chunk_batch(
+            lambda: self.model, self.model_name, limit=limit, database=database, conn=self._connection()
+        )
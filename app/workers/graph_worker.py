@@ -2,7 +2,8 @@
 Build Gold layer relationships (citations + similarity) from Silver layer.
 """
 import json
-from typing import Iterable, List, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 try:
     from app.config import app, image, snowflake_secret, DATABASE, qualify_table
@@ -74,7 +75,11 @@ def _require_columns(column_map: dict[str, str], required: list[str], table_name
 #     # return the result set as a list of tuples for the graph worker to iterate through
 #     return cur.fetchall()
 
-def _fetch_papers(cur, paper_id: Optional[int], database: str = DATABASE) -> List[Tuple]:
+# Rows per fetchmany() when streaming SILVER papers into build_knowledge_graph
+_PAPER_FETCH_BATCH_SIZE = 10000
+
+
+def _execute_papers_query(cur, paper_id: Optional[int], database: str = DATABASE) -> None:
     # Profiled because: DESC TABLE is called to resolve column names on every
     # invocation, then the SELECT pulls conclusion text for every paper —
     # fetching large text columns for the full corpus is the heaviest query
@@ -114,7 +119,21 @@ def _fetch_papers(cur, paper_id: Optional[int], database: str = DATABASE) -> Lis
             f"{query} WHERE {citation_filter_expr} OR {cols['similar_embeddings_ids']} IS NOT NULL"
         )
 
-    return cur.fetchall()
+
+def _iter_paper_batches(
+    cur, paper_id: Optional[int], database: str = DATABASE, batch_size: int = _PAPER_FETCH_BATCH_SIZE
+) -> Iterator[List[Tuple]]:
+    """
+    Stream the papers query in fixed-size batches so the full result set
+    (including conclusion text) never has to sit in memory at once.
+    """
+    _execute_papers_query(cur, paper_id, database=database)
+    cur.arraysize = int(batch_size)
+    while True:
+        batch = cur.fetchmany(int(batch_size))
+        if not batch:
+            return
+        yield batch
 
 def _normalize_json_list(value) -> list:
     if value is None:
@@ -137,109 +156,125 @@ def _normalize_ids(value) -> List[int]:
     return ids
 
 
-def _citation_targets(cur, citations: Iterable[dict], database: str = DATABASE) -> List[int]:
-    ss_ids: List[str] = []
-    arxiv_ids: List[str] = []
-    dois: List[str] = []
-    for citation in citations:
-        if not isinstance(citation, dict):
-            continue
-        ss_id = citation.get("ss_paper_id")
-        if ss_id:
-            ss_ids.append(str(ss_id))
-        arxiv_id = citation.get("arxiv_id")
-        if arxiv_id:
-            arxiv_ids.append(str(arxiv_id))
-        doi = citation.get("doi")
-        if doi:
-            dois.append(str(doi).lower())
-
-    if not ss_ids and not arxiv_ids and not dois:
-        print("[graph][citation_targets] no identifiers found in citation payload")
-        return []
+# Rows per VALUES list when resolving citation identifiers; keeps each statement
+# well below Snowflake's 16,384-row VALUES limit.
+_CITATION_LOOKUP_CHUNK_SIZE = 5000
+
+
+def _citation_identifier_pairs(citations_by_paper: Dict[int, Iterable[dict]]):
+    ss_pairs: set[Tuple[int, str]] = set()
+    arxiv_pairs: set[Tuple[int, str]] = set()
+    doi_pairs: set[Tuple[int, str]] = set()
+    for pid, citations in citations_by_paper.items():
+        for citation in citations:
+            if not isinstance(citation, dict):
+                continue
+            ss_id = citation.get("ss_paper_id")
+            if ss_id:
+                ss_pairs.add((int(pid), str(ss_id)))
+            arxiv_id = citation.get("arxiv_id")
+            if arxiv_id:
+                arxiv_pairs.add((int(pid), str(arxiv_id)))
+            doi = citation.get("doi")
+            if doi:
+                doi_pairs.add((int(pid), str(doi).lower()))
+    return sorted(ss_pairs), sorted(arxiv_pairs), sorted(doi_pairs)
+
+
+def _citation_targets_bulk(
+    cur, citations_by_paper: Dict[int, Iterable[dict]], database: str = DATABASE
+) -> Dict[int, List[int]]:
+    """
+    Resolve cited papers for many source papers at once.
+
+    All (source paper, identifier) pairs are joined against SILVER in one query
+    per identifier type (ss_id, arxiv_id, doi) instead of once per source paper.
+    Returns a mapping of source paper id -> resolved target paper ids.
+    """
+    ss_pairs, arxiv_pairs, doi_pairs = _citation_identifier_pairs(citations_by_paper)
+    if not ss_pairs and not arxiv_pairs and not doi_pairs:
+        print("[graph][citation_targets] no identifiers found in citation payloads")
+        return {}
 
     silver = _silver_table(database=database)
     col_map = _resolve_table_columns(cur, silver)
     cols = _require_columns(col_map, ["id"], silver)
-    targets: set[int] = set()
-    ss_matches = 0
-    arxiv_matches = 0
-    doi_matches = 0
+
+    lookups = []
+    if ss_pairs and "ss_id" in col_map:
+        lookups.append(("ss", ss_pairs, f'sp.{col_map["ss_id"]} = src.ident'))
+    if arxiv_pairs and "arxiv_id" in col_map:
+        lookups.append(("arxiv", arxiv_pairs, f'sp.{col_map["arxiv_id"]} = src.ident'))
+    if doi_pairs and "doi" in col_map:
+        lookups.append(("doi", doi_pairs, f'LOWER(sp.{col_map["doi"]}) = src.ident'))
+
+    targets: Dict[int, List[int]] = {}
+    match_counts = {}
+    for name, pairs, join_condition in lookups:
+        matched = 0
+        for start in range(0, len(pairs), _CITATION_LOOKUP_CHUNK_SIZE):
+            chunk = pairs[start:start + _CITATION_LOOKUP_CHUNK_SIZE]
+            values_sql = ", ".join(["(%s, %s)"] * len(chunk))
+            params = [value for pair in chunk for value in pair]
+            cur.execute(
+                f"""
+                WITH src(source_id, ident) AS (SELECT column1, column2 FROM VALUES {values_sql})
+                SELECT DISTINCT src.source_id, sp.{cols["id"]}
+                FROM src
+                JOIN {silver} sp
+                  ON {join_condition}
+                """,
+                params,
+            )
+            for source_id, target_id in cur.fetchall():
+                resolved = targets.setdefault(int(source_id), [])
+                if int(target_id) not in resolved:
+                    resolved.append(int(target_id))
+                matched += 1
+        match_counts[name] = matched
 
     print(
-        "[graph][citation_targets] identifiers extracted: "
-        f"ss_ids={len(ss_ids)} arxiv_ids={len(arxiv_ids)} dois={len(dois)} "
-        f"sample_ss={ss_ids[:3]} sample_arxiv={arxiv_ids[:3]} sample_doi={dois[:2]}"
+        "[graph][citation_targets] "
+        f"pairs: ss={len(ss_pairs)} arxiv={len(arxiv_pairs)} doi={len(doi_pairs)} "
+        f"matches: {match_counts} papers_with_targets={len(targets)}"
     )
+    return targets
 
-    if ss_ids and "ss_id" in col_map:
-        values_sql = ", ".join(["(%s)"] * len(ss_ids))
-        cur.execute(
-            f"""
-            WITH source_ss_ids(ss_id) AS (SELECT column1 FROM VALUES {values_sql})
-            SELECT DISTINCT sp.{cols["id"]}
-            FROM source_ss_ids src
-            JOIN {silver} sp
-              ON sp.{col_map["ss_id"]} = src.ss_id
-            """,
-            ss_ids,
-        )
-        rows = [int(row[0]) for row in cur.fetchall()]
-        ss_matches = len(rows)
-        targets.update(rows)
 
-    if arxiv_ids and "arxiv_id" in col_map:
-        values_sql = ", ".join(["(%s)"] * len(arxiv_ids))
-        cur.execute(
-            f"""
-            WITH source_arxiv_ids(arxiv_id) AS (SELECT column1 FROM VALUES {values_sql})
-            SELECT DISTINCT sp.{cols["id"]}
-            FROM source_arxiv_ids src
-            JOIN {silver} sp
-              ON sp.{col_map["arxiv_id"]} = src.arxiv_id
-            """,
-            arxiv_ids,
-        )
-        rows = [int(row[0]) for row in cur.fetchall()]
-        arxiv_matches = len(rows)
-        targets.update(rows)
+EdgeMap = Dict[Tuple[int, int, str], Tuple[float, Optional[str]]]
 
-    if dois and "doi" in col_map:
-        values_sql = ", ".join(["(%s)"] * len(dois))
-        cur.execute(
-            f"""
-            WITH source_dois(doi) AS (SELECT column1 FROM VALUES {values_sql})
-            SELECT DISTINCT sp.{cols["id"]}
-            FROM source_dois src
-            JOIN {silver} sp
-              ON LOWER(sp.{col_map["doi"]}) = src.doi
-            """,
-            dois,
-        )
-        rows = [int(row[0]) for row in cur.fetchall()]
-        doi_matches = len(rows)
-        targets.update(rows)
+# Edges per MERGE ... FROM VALUES statement. Classifier reasons make a row a few
+# hundred bytes of SQL text, so this stays well under Snowflake's 1MB statement limit.
+_EDGE_MERGE_CHUNK_SIZE = 1000
+
+
+def _add_edge(
+    edges: EdgeMap, source_id, target_id, rel_type: str, strength: float, reason: Optional[str] = None
+) -> None:
+    """Insert an edge into `edges`, dropping self-loops and keeping the strongest duplicate."""
+    if source_id == target_id:
+        return
+    key = (int(source_id), int(target_id), rel_type)
+    if key not in edges or float(strength) > edges[key][0]:
+        edges[key] = (float(strength), reason)
+
+
+def _edge_list(edges: EdgeMap) -> List[Tuple]:
+    return [(sid, tid, rel, strength, reason) for (sid, tid, rel), (strength, reason) in edges.items()]
 
-    resolved = list(targets)
-    print(
-        "[graph][citation_targets] match results: "
-        f"ss={ss_matches} arxiv={arxiv_matches} doi={doi_matches} "
-        f"resolved_total={len(resolved)} resolved_sample={resolved[:10]}"
-    )
-    return resolved
+
+@lru_cache(maxsize=None)
+def _similar_strengths(n: int) -> Tuple[float, ...]:
+    # Strength decays with rank (first neighbor = 1.0, second = 0.9, ...), floored at 0
+    return tuple(max(0.0, 1.0 - (idx * 0.1)) for idx in range(n))
 
 
 def _dedupe_edges(edges: Iterable[Tuple]) -> List[Tuple]:
-    seen = {}
+    seen: EdgeMap = {}
     for edge in edges:
-        source_id, target_id, rel_type, strength = edge[0], edge[1], edge[2], edge[3]
-        reason = edge[4] if len(edge) > 4 else None
-        if source_id == target_id:
-            continue
-        key = (int(source_id), int(target_id), rel_type)
-        if key not in seen or float(strength) > seen[key][0]:
-            seen[key] = (float(strength), reason)
-    return [(sid, tid, rel, strength, reason) for (sid, tid, rel), (strength, reason) in seen.items()]
+        _add_edge(seen, edge[0], edge[1], edge[2], edge[3], edge[4] if len(edge) > 4 else None)
+    return _edge_list(seen)
+
 
 def _bulk_merge_edges(cur, edges: List[Tuple], database: str = DATABASE) -> int:
     """
@@ -247,8 +282,8 @@ def _bulk_merge_edges(cur, edges: List[Tuple], database: str = DATABASE) -> int:
 
     This function uses a SQL MERGE statement to atomically handle both the insertion 
     of new semantic/citation links and the updating of existing relationship strengths. 
-    By batching all edges into a single database transaction, it minimizes network 
-    overhead and Snowflake compute costs.
+    Edges are sent _EDGE_MERGE_CHUNK_SIZE rows per MERGE within the caller's
+    transaction, which minimizes network overhead while bounding statement size.
 
     Args:
         cur: An active Snowflake cursor object.
@@ -284,66 +319,68 @@ def _bulk_merge_edges(cur, edges: List[Tuple], database: str = DATABASE) -> int:
     )
     has_reason = "reason" in col_map
 
-    if has_reason:
-        values_sql = ", ".join(["(%s, %s, %s, %s, %s)"] * len(edges))
-        params = []
-        for edge in edges:
-            source_id, target_id, rel_type, strength = edge[0], edge[1], edge[2], edge[3]
-            reason = edge[4] if len(edge) > 4 else None
-            params.extend([source_id, target_id, rel_type, strength, reason])
-        cur.execute(
-            f"""
-            MERGE INTO {gold} AS target
-            USING (
-                SELECT
-                    column1 AS source_paper_id,
-                    column2 AS target_paper_id,
-                    column3 AS relationship_type,
-                    column4 AS strength,
-                    column5 AS reason
-                FROM VALUES {values_sql}
-            ) AS source
-            ON target.{cols["source_paper_id"]} = source.source_paper_id
-               AND target.{cols["target_paper_id"]} = source.target_paper_id
-               AND target.{cols["relationship_type"]} = source.relationship_type
-            WHEN MATCHED THEN
-                UPDATE SET target.{cols["strength"]} = source.strength,
-                           target.{col_map["reason"]} = source.reason
-            WHEN NOT MATCHED THEN
-                INSERT ({cols["source_paper_id"]}, {cols["target_paper_id"]}, {cols["relationship_type"]}, {cols["strength"]}, {col_map["reason"]})
-                VALUES (source.source_paper_id, source.target_paper_id, source.relationship_type, source.strength, source.reason)
-            """,
-            params,
-        )
-    else:
-        values_sql = ", ".join(["(%s, %s, %s, %s)"] * len(edges))
-        params = []
-        for edge in edges:
-            source_id, target_id, rel_type, strength = edge[0], edge[1], edge[2], edge[3]
-            params.extend([source_id, target_id, rel_type, strength])
-        cur.execute(
-            f"""
-            MERGE INTO {gold} AS target
-            USING (
-                SELECT
-                    column1 AS source_paper_id,
-                    column2 AS target_paper_id,
-                    column3 AS relationship_type,
-                    column4 AS strength
-                FROM VALUES {values_sql}
-            ) AS source
-            ON target.{cols["source_paper_id"]} = source.source_paper_id
-               AND target.{cols["target_paper_id"]} = source.target_paper_id
-               AND target.{cols["relationship_type"]} = source.relationship_type
-            WHEN MATCHED THEN
-                UPDATE SET target.{cols["strength"]} = source.strength
-            WHEN NOT MATCHED THEN
-                INSERT ({cols["source_paper_id"]}, {cols["target_paper_id"]}, {cols["relationship_type"]}, {cols["strength"]})
-                VALUES (source.source_paper_id, source.target_paper_id, source.relationship_type, source.strength)
-            """,
-            params,
-        )
-    
+    for start in range(0, len(edges), _EDGE_MERGE_CHUNK_SIZE):
+        chunk = edges[start:start + _EDGE_MERGE_CHUNK_SIZE]
+        if has_reason:
+            values_sql = ", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk))
+            params = []
+            for edge in chunk:
+                source_id, target_id, rel_type, strength = edge[0], edge[1], edge[2], edge[3]
+                reason = edge[4] if len(edge) > 4 else None
+                params.extend([source_id, target_id, rel_type, strength, reason])
+            cur.execute(
+                f"""
+                MERGE INTO {gold} AS target
+                USING (
+                    SELECT
+                        column1 AS source_paper_id,
+                        column2 AS target_paper_id,
+                        column3 AS relationship_type,
+                        column4 AS strength,
+                        column5 AS reason
+                    FROM VALUES {values_sql}
+                ) AS source
+                ON target.{cols["source_paper_id"]} = source.source_paper_id
+                   AND target.{cols["target_paper_id"]} = source.target_paper_id
+                   AND target.{cols["relationship_type"]} = source.relationship_type
+                WHEN MATCHED THEN
+                    UPDATE SET target.{cols["strength"]} = source.strength,
+                               target.{col_map["reason"]} = source.reason
+                WHEN NOT MATCHED THEN
+                    INSERT ({cols["source_paper_id"]}, {cols["target_paper_id"]}, {cols["relationship_type"]}, {cols["strength"]}, {col_map["reason"]})
+                    VALUES (source.source_paper_id, source.target_paper_id, source.relationship_type, source.strength, source.reason)
+                """,
+                params,
+            )
+        else:
+            values_sql = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
+            params = []
+            for edge in chunk:
+                source_id, target_id, rel_type, strength = edge[0], edge[1], edge[2], edge[3]
+                params.extend([source_id, target_id, rel_type, strength])
+            cur.execute(
+                f"""
+                MERGE INTO {gold} AS target
+                USING (
+                    SELECT
+                        column1 AS source_paper_id,
+                        column2 AS target_paper_id,
+                        column3 AS relationship_type,
+                        column4 AS strength
+                    FROM VALUES {values_sql}
+                ) AS source
+                ON target.{cols["source_paper_id"]} = source.source_paper_id
+                   AND target.{cols["target_paper_id"]} = source.target_paper_id
+                   AND target.{cols["relationship_type"]} = source.relationship_type
+                WHEN MATCHED THEN
+                    UPDATE SET target.{cols["strength"]} = source.strength
+                WHEN NOT MATCHED THEN
+                    INSERT ({cols["source_paper_id"]}, {cols["target_paper_id"]}, {cols["relationship_type"]}, {cols["strength"]})
+                    VALUES (source.source_paper_id, source.target_paper_id, source.relationship_type, source.strength)
+                """,
+                params,
+            )
+
     # return the count of processed edges for the orchestrator's telemetry report
     return len(edges)
 
@@ -371,61 +408,82 @@ def build_knowledge_graph(paper_id: int = None, database: str = DATABASE):
         existing_edges: set = {(int(r[0]), int(r[1]), r[2]) for r in cur.fetchall()}
         print(f"Found {len(existing_edges)} existing edges in Gold, will skip classifier for those.")
 
-        # Fetch all relevant papers from the SILVER layer (optionally filter by paper_id)
-        print(f"Fetching papers from SILVER to build graph relationships (paper_id={paper_id})...")
-        papers = _fetch_papers(cur, paper_id, database=database)
-        edges: List[Tuple[int, int, str, float]] = []  # List to accumulate all edges to be created
-
-        print(f"Processing {len(papers)} papers from SILVER to build relationships in GOLD...")
+        # Columns for the per-paper conclusion lookups, resolved once for the whole run
+        silver = _silver_table(database)
+        sim_cols = _require_columns(
+            _resolve_table_columns(cur, silver),
+            ["id", "conclusion"],
+            silver,
+        )
 
+        # Stream relevant papers from the SILVER layer (optionally filter by paper_id)
+        # on a dedicated cursor, since per-batch lookups below reuse `cur`.
+        print(f"Fetching papers from SILVER to build graph relationships (paper_id={paper_id})...")
+        # Edges are deduplicated as they are added (keyed on source, target, type)
+        edges: EdgeMap = {}
         classify_queue: List[Tuple[int, int, str, str]] = []
+        papers_processed = 0
 
-        # Iterate over each paper and extract relationships
-        for pid, citations, similar_ids, p_conclusion in papers:
-            print("----------------------------------------")
-            print(f"paper {pid}: {len(_normalize_json_list(citations))} citations, {len(_normalize_json_list(similar_ids))} similar papers")
-
-            # For each citation, add a CITES edge from this paper to the cited paper
-            citation_entries = _normalize_json_list(citations)
-            citation_targets = _citation_targets(cur, citation_entries, database=database)
-            print(
-                f"[graph] paper {pid} citation_entries={len(citation_entries)} "
-                f"resolved_targets={len(citation_targets)} targets={citation_targets[:10]}"
-            )
-            if citation_entries and not citation_targets:
-                print(f"[graph][warn] paper {pid} has citations but no resolvable targets in SILVER")
-            for target_id in citation_targets:
-                edges.append((int(pid), target_id, "CITES", 1.0, None))
-
-            # For each similar paper, add a SIMILAR edge with decreasing strength
-            for idx, sim_id in enumerate(_normalize_ids(similar_ids)):
-                # Strength decays with rank (first neighbor = 1.0, second = 0.9, ...)
-                strength = max(0.0, 1.0 - (idx * 0.1))
-                edges.append((int(pid), sim_id, "SIMILAR", strength, None))
-
-            # SEMANTIC RELATIONSHIP LOGIC
-            # Collect pairs that need classification (skip already-computed edges)
-            sim_ids = _normalize_ids(similar_ids)
-            silver = _silver_table(database)
-            sim_cols = _require_columns(
-                _resolve_table_columns(cur, silver),
-                ["id", "conclusion"],
-                silver,
-            )
-            for idx, target_id in enumerate(sim_ids[:3]):
-                if any((int(pid), target_id, lbl) in existing_edges for lbl in ["SUPPORT", "CONTRADICT", "NEUTRAL"]):
-                    print(f"Skipping classifier for paper {pid} vs {target_id} (edge already exists)")
-                    continue
-                cur.execute(
-                    f'SELECT {sim_cols["conclusion"]} FROM {silver} WHERE {sim_cols["id"]} = %s',
-                    (target_id,),
+        paper_cur = conn.cursor()
+        try:
+            for papers in _iter_paper_batches(paper_cur, paper_id, database=database):
+                papers_processed += len(papers)
+                print(f"Processing {len(papers)} papers from SILVER to build relationships in GOLD...")
+                # Resolve every citation in this batch against SILVER in one pass up front
+                citations_by_paper = {int(pid): _normalize_json_list(citations) for pid, citations, _, _ in papers}
+                targets_by_paper = _citation_targets_bulk(cur, citations_by_paper, database=database)
+
+                # Per-batch tallies, logged once below instead of once per paper
+                cites_added = similars_added = skipped_existing = 0
+                unresolved: List[int] = []
+
+                # Iterate over each paper and extract relationships
+                for pid, _, similar_ids, p_conclusion in papers:
+                    citation_entries = citations_by_paper[int(pid)]
+                    sim_ids = _normalize_ids(similar_ids)
+
+                    # For each citation, add a CITES edge from this paper to the cited paper
+                    citation_targets = targets_by_paper.get(int(pid), [])
+                    if citation_entries and not citation_targets:
+                        unresolved.append(int(pid))
+                    cites_added += len(citation_targets)
+                    similars_added += len(sim_ids)
+                    for target_id in citation_targets:
+                        _add_edge(edges, pid, target_id, "CITES", 1.0)
+
+                    # For each similar paper, add a SIMILAR edge with decreasing strength
+                    for sim_id, strength in zip(sim_ids, _similar_strengths(len(sim_ids))):
+                        _add_edge(edges, pid, sim_id, "SIMILAR", strength)
+
+                    # SEMANTIC RELATIONSHIP LOGIC
+                    # Collect pairs that need classification (skip already-computed edges)
+                    for idx, target_id in enumerate(sim_ids[:3]):
+                        if any((int(pid), target_id, lbl) in existing_edges for lbl in ["SUPPORT", "CONTRADICT", "NEUTRAL"]):
+                            skipped_existing += 1
+                            continue
+                        cur.execute(
+                            f'SELECT {sim_cols["conclusion"]} FROM {silver} WHERE {sim_cols["id"]} = %s',
+                            (target_id,),
+                        )
+                        target_row = cur.fetchone()
+                        if target_row and target_row[0]:
+                            classify_queue.append((int(pid), target_id, p_conclusion, target_row[0]))
+
+                print(
+                    f"[graph] batch of {len(papers)} papers: citation_targets={cites_added} "
+                    f"similar_ids={similars_added} classifier_skipped_existing={skipped_existing} "
+                    f"classify_queue={len(classify_queue)}"
                 )
-                target_row = cur.fetchone()
-                if target_row and target_row[0]:
-                    classify_queue.append((int(pid), target_id, p_conclusion, target_row[0]))
+                if unresolved:
+                    print(
+                        f"[graph][warn] {len(unresolved)} papers have citations but no resolvable "
+                        f"targets in SILVER (e.g. {unresolved[:10]})"
+                    )
+        finally:
+            paper_cur.close()
 
         # Phase 1: Persist deterministic edges first so CITES/SIMILAR never depend on LLM success.
-        base_edges = _dedupe_edges(edges)
+        base_edges = _edge_list(edges)
         base_merged_count = _bulk_merge_edges(cur, base_edges, database=database)
         conn.commit()
         print(
@@ -446,8 +504,11 @@ def build_knowledge_graph(paper_id: int = None, database: str = DATABASE):
                 results = list(classifier.classify.map(inputs))
                 semantic_edges: List[Tuple[int, int, str, float, Optional[str]]] = []
                 for (pid, target_id, _, _), (label, reason) in zip(classify_queue, results):
-                    print(f"Classifier output for paper {pid} vs {target_id}: {label} — {reason}")
                     semantic_edges.append((pid, target_id, label, 1.0, reason))
+                label_counts: Dict[str, int] = {}
+                for _, _, label, _, _ in semantic_edges:
+                    label_counts[label] = label_counts.get(label, 0) + 1
+                print(f"Classifier labels: {label_counts}")
 
                 semantic_merged_count = _bulk_merge_edges(
                     cur, _dedupe_edges(semantic_edges), database=database
@@ -467,7 +528,7 @@ def build_knowledge_graph(paper_id: int = None, database: str = DATABASE):
 
         total_merged = int(base_merged_count) + int(semantic_merged_count)
         return {
-            "papers_processed": len(papers),
+            "papers_processed": papers_processed,
             "edges_merged": total_merged,
             "base_edges_merged": int(base_merged_count),
             "semantic_edges_merged": int(semantic_merged_count),
@@ -1,17 +1,23 @@
 import requests
 import json
 import re
+import textwrap
 import threading
 import time
 import os
 import random
-from typing import Optional
+from typing import List, Optional, Set
 
 from app.config import app, image, snowflake_secret, semantic_scholar_secret, DATABASE, qualify_table
 from app.utils import connect_to_snowflake
 
 
 _SS_MIN_INTERVAL_SECONDS = 1.05
+# Payloads per multi-row Bronze INSERT; abstracts make rows a few KB each, so this
+# keeps a single statement well under Snowflake's statement size limit
+_BRONZE_INSERT_CHUNK_SIZE = 200
+# Largest page the arXiv export API serves in a single request
+_ARXIV_MAX_PAGE_SIZE = 2000
 _ss_lock = threading.Lock()
 _ss_last_request_ts = 0.0
 
@@ -40,6 +46,33 @@ def _resolve_bronze_payload_column(cur, bronze_table: str) -> str:
     )
 
 
+def _existing_entry_ids(cur, bronze_table: str, payload_col: str, entry_ids: List[str]) -> Set[str]:
+    """Return which of entry_ids are already in Bronze, in one IN-list query per chunk."""
+    existing: Set[str] = set()
+    for start in range(0, len(entry_ids), _BRONZE_INSERT_CHUNK_SIZE):
+        chunk = entry_ids[start:start + _BRONZE_INSERT_CHUNK_SIZE]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cur.execute(
+            f"SELECT {payload_col}:entry_id::STRING FROM {bronze_table} "
+            f"WHERE {payload_col}:entry_id::STRING IN ({placeholders})",
+            chunk,
+        )
+        existing.update(str(row[0]) for row in cur.fetchall())
+    return existing
+
+
+def _insert_bronze_payloads(cur, bronze_table: str, payload_col: str, payloads: List[str]) -> int:
+    """Insert JSON payload strings into Bronze with one multi-row INSERT per chunk."""
+    for start in range(0, len(payloads), _BRONZE_INSERT_CHUNK_SIZE):
+        chunk = payloads[start:start + _BRONZE_INSERT_CHUNK_SIZE]
+        values_sql = ", ".join(["(%s)"] * len(chunk))
+        cur.execute(
+            f"INSERT INTO {bronze_table} ({payload_col}) SELECT PARSE_JSON(column1) FROM VALUES {values_sql}",
+            chunk,
+        )
+    return len(payloads)
+
+
 def _extract_arxiv_id(external_ids: dict) -> Optional[str]:
     if not isinstance(external_ids, dict):
         return None
@@ -217,19 +250,19 @@ def ingest_from_arxiv(query: str, max_results: int = 5, database: str = DATABASE
     bronze_table = _bronze_papers_table(database=database)
     payload_col = _resolve_bronze_payload_column(cur, bronze_table)
 
-    ingested_count = 0
-    skipped_count = 0
+    # arXiv asks clients to space requests ~3s apart, so pages can't be fetched in
+    # parallel; instead size one page to cover the whole request.
+    client = arxiv.Client(page_size=max(1, min(int(max_results), _ARXIV_MAX_PAGE_SIZE)))
+    results = list(client.results(search))
+    existing = _existing_entry_ids(cur, bronze_table, payload_col, [r.entry_id for r in results])
 
-    for result in search.results():
-        # 1. Check if this paper already exists (idempotency)
-        cur.execute(
-            f'SELECT 1 FROM {bronze_table} WHERE {payload_col}:entry_id::STRING = %s LIMIT 1',
-            (result.entry_id,)
-        )
-        if cur.fetchone():
-            skipped_count += 1
+    payloads: List[str] = []
+    for result in results:
+        # 1. Skip papers already in Bronze (idempotency), including repeats within this batch
+        if result.entry_id in existing:
             continue
-        
+        existing.add(result.entry_id)
+
         # 2. Convert the ArXiv object to a serializable dictionary
         raw_data = {
             "entry_id": result.entry_id,
@@ -246,17 +279,14 @@ def ingest_from_arxiv(query: str, max_results: int = 5, database: str = DATABASE
             "links": [link.href for link in result.links],
             "pdf_url": result.pdf_url
         }
-        
+
         # 3. Convert dictionary to a valid JSON string
-        json_payload = json.dumps(raw_data)
-        
-        # 4. Insert into the Bronze Table
-        cur.execute(
-            f'INSERT INTO {bronze_table} ({payload_col}) SELECT PARSE_JSON(%s)',
-            (json_payload,)
-        )
-        ingested_count += 1
-    
+        payloads.append(json.dumps(raw_data))
+
+    # 4. Insert into the Bronze Table in bulk
+    ingested_count = _insert_bronze_payloads(cur, bronze_table, payload_col, payloads)
+    skipped_count = len(results) - ingested_count
+
     conn.commit()
     if skipped_count > 0:
         print(f"Ingested {ingested_count} papers (skipped {skipped_count} duplicates) into Bronze layer.")
@@ -395,9 +425,6 @@ def peek_bronze(limit: int = 3, database: str = DATABASE):
     """
     Inspects the raw JSON in Bronze, specifically focusing on the Abstract (summary).
     """
-    import json
-    import textwrap
-
     conn = connect_to_snowflake(database=database, schema="BRONZE")
     cur = conn.cursor()
     bronze_table = _bronze_papers_table(database=database)
@@ -1,12 +1,38 @@
 # Online worker that computes and caches top-k similar paper ids based on embedding similarity.
 # This runs on demand when a request needs similar papers for a given paper id.
 
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 import json
+import os
 import re
-
-from app.utils import connect_to_snowflake
-from app.config import app, image, ml_image, snowflake_secret, DATABASE, qualify_table
+import time
+
+from app.utils import connect_to_snowflake, get_shared_snowflake_connection
+from app.config import (
+    app,
+    ann_image,
+    ml_image,
+    snowflake_secret,
+    DATABASE,
+    qualify_table,
+    ANN_INDEX_DIR,
+    ann_index_paths,
+    ann_index_volume,
+)
+
+# database -> paper ANN index loaded from the volume, kept per container and
+# reloaded when the embedding worker writes a new one.
+_ann_cache: Dict[str, Dict[str, Any]] = {}
+# A mounted volume only shows newly committed files after reload(); throttle it
+_ANN_VOLUME_RELOAD_INTERVAL_SECONDS = 60.0
+_ann_volume_reloaded_at = float("-inf")
+# (database, paper_id, k, score_threshold) -> (cached_at, results), least recently
+# used first, so repeat lookups on a warm container skip Snowflake entirely. Entries
+# expire so re-embedded papers and rewritten similar_ids reach warm containers.
+_RELATED_CACHE_MAX_ENTRIES = 10_000
+_RELATED_CACHE_TTL_SECONDS = 300.0
+_related_cache: "OrderedDict[tuple, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
 
 
 def _silver_table(database: str = DATABASE) -> str:
@@ -53,7 +79,76 @@ def _hybrid_score(query_tokens: set[str], title: str, abstract: str, vector_scor
     return 0.85 * float(vector_score) + 0.15 * float(overlap)
 
 
-@app.function(image=image, secrets=[snowflake_secret], timeout=60 * 5)
+def _load_ann_index(database: str = DATABASE) -> Optional[Dict[str, Any]]:
+    """
+    The HNSW index and row->paper id map the embedding worker persisted for
+    database, or None when the ANN volume has no index for it yet.
+    """
+    global _ann_volume_reloaded_at
+    now = time.time()
+    if now - _ann_volume_reloaded_at >= _ANN_VOLUME_RELOAD_INTERVAL_SECONDS:
+        try:
+            ann_index_volume.reload()
+        except Exception as e:
+            print(f"Warning: could not reload the ANN index volume: {e}")
+        _ann_volume_reloaded_at = now
+
+    index_path, ids_path = ann_index_paths(database)
+    if not (os.path.exists(index_path) and os.path.exists(ids_path)):
+        return None
+
+    mtime = os.path.getmtime(index_path)
+    cached = _ann_cache.get(database)
+    if cached is None or cached["mtime"] != mtime:
+        import importlib
+        import numpy as np
+        faiss = importlib.import_module("faiss")
+
+        ids = [int(x) for x in np.load(ids_path).tolist()]
+        cached = _ann_cache[database] = {
+            "mtime": mtime,
+            "index": faiss.read_index(index_path),
+            "ids": ids,
+            "row_of": {pid: row for row, pid in enumerate(ids)},
+        }
+    return cached
+
+
+def _ann_related(
+    paper_id: int,
+    k: int,
+    score_threshold: float,
+    database: str = DATABASE,
+) -> Optional[List[Tuple[int, float]]]:
+    """
+    Top-k (id, cosine) neighbors of paper_id from database's ANN index, or None
+    when the index is unavailable or does not contain the paper yet.
+    """
+    ann = _load_ann_index(database)
+    if ann is None or int(paper_id) not in ann["row_of"]:
+        return None
+
+    index = ann["index"]
+    qvec = index.reconstruct(ann["row_of"][int(paper_id)]).reshape(1, -1)
+    scores, rows = index.search(qvec, int(k) + 1)
+
+    neighbors: List[Tuple[int, float]] = []
+    for score, row in zip(scores[0], rows[0]):
+        if row < 0:
+            continue
+        pid = ann["ids"][int(row)]
+        if pid == int(paper_id) or float(score) < score_threshold:
+            continue
+        neighbors.append((pid, float(score)))
+    return neighbors[: int(k)]
+
+
+@app.function(
+    image=ann_image,
+    secrets=[snowflake_secret],
+    volumes={ANN_INDEX_DIR: ann_index_volume},
+    timeout=60 * 5,
+)
 def get_related_papers(
     paper_id: int,
     k: int = 10,
@@ -63,12 +158,36 @@ def get_related_papers(
 ) -> List[Dict[str, Any]]:
     """
     ONLINE endpoint:
+    0) Serve repeat lookups from this container's in-memory cache
     1) Try cached similar_embeddings_ids first
-    2) If missing, fallback to vector similarity query
+    2) If missing, search the in-memory ANN index
+    3) If the paper isn't indexed yet, fallback to vector similarity query
     """
+    cache_key = (database, int(paper_id), int(k), float(score_threshold))
+    now = time.time()
+    cached = _related_cache.pop(cache_key, None)
+    if not force_refresh and cached is not None and now - cached[0] < _RELATED_CACHE_TTL_SECONDS:
+        _related_cache[cache_key] = cached
+        return [dict(r) for r in cached[1]]
+
+    results = _fetch_related_papers(paper_id, k, score_threshold, force_refresh, database)
+    if results:
+        if len(_related_cache) >= _RELATED_CACHE_MAX_ENTRIES:
+            _related_cache.popitem(last=False)
+        _related_cache[cache_key] = (now, [dict(r) for r in results])
+    return results
+
+
+def _fetch_related_papers(
+    paper_id: int,
+    k: int,
+    score_threshold: float,
+    force_refresh: bool,
+    database: str,
+) -> List[Dict[str, Any]]:
     silver = _silver_table(database=database)
 
-    conn = connect_to_snowflake(database=database, schema="GOLD")
+    conn = get_shared_snowflake_connection(database=database, schema="GOLD")
     cur = conn.cursor()
     try:
         if not force_refresh:
@@ -83,15 +202,9 @@ def get_related_papers(
             row = cur.fetchone()
             cached_ids = _parse_cached_ids(row[0] if row else None, k)
             if cached_ids:
-                values_sql = ", ".join(["(%s)"] * len(cached_ids))
+                placeholders = ", ".join(["%s"] * len(cached_ids))
                 cur.execute(
-                    f"""
-                    WITH ids(id) AS (SELECT column1 FROM VALUES {values_sql})
-                    SELECT s."id", s."arxiv_id", s."title"
-                    FROM ids
-                    JOIN {silver} s
-                                            ON s."id" = ids.id
-                    """,
+                    f'SELECT "id", "arxiv_id", "title" FROM {silver} WHERE "id" IN ({placeholders})',
                     [int(x) for x in cached_ids],
                 )
                 rows = cur.fetchall()
@@ -113,24 +226,52 @@ def get_related_papers(
                         )
                 return ordered
 
+        neighbors = _ann_related(paper_id, k, score_threshold, database=database)
+        if neighbors:
+            placeholders = ", ".join(["%s"] * len(neighbors))
+            cur.execute(
+                f'SELECT "id", "arxiv_id", "title" FROM {silver} WHERE "id" IN ({placeholders})',
+                [pid for pid, _ in neighbors],
+            )
+            id_to_row = {int(r[0]): r for r in cur.fetchall()}
+            results = [
+                {
+                    "id": pid,
+                    "arxiv_id": id_to_row[pid][1],
+                    "title": id_to_row[pid][2],
+                    "score": score,
+                    "source": "ann",
+                    "database": database,
+                }
+                for pid, score in neighbors
+                if pid in id_to_row
+            ]
+            _cache_related_ids(cur, silver, paper_id, results)
+            conn.commit()
+            return results
+
+        # Score each row once in the inner query; the threshold filter and top-k
+        # ORDER BY/LIMIT both read the computed column.
         cur.execute(
             f"""
             WITH q AS (
-                            SELECT "embedding" AS qvec
-              FROM {silver}
-                            WHERE "id" = %s
-                                AND "embedding" IS NOT NULL
+                SELECT "embedding" AS qvec
+                FROM {silver}
+                WHERE "id" = %s
+                    AND "embedding" IS NOT NULL
             )
-            SELECT
-                            e."id",
-                            e."arxiv_id",
-                            e."title",
-                            e."abstract",
-                            VECTOR_COSINE_SIMILARITY(e."embedding", q.qvec) AS score
-            FROM {silver} e, q
-                        WHERE e."id" <> %s
-                            AND e."embedding" IS NOT NULL
-                            AND VECTOR_COSINE_SIMILARITY(e."embedding", q.qvec) >= %s
+            SELECT "id", "arxiv_id", "title", score
+            FROM (
+                SELECT
+                    e."id",
+                    e."arxiv_id",
+                    e."title",
+                    VECTOR_COSINE_SIMILARITY(e."embedding", q.qvec) AS score
+                FROM {silver} e, q
+                WHERE e."id" <> %s
+                    AND e."embedding" IS NOT NULL
+            )
+            WHERE score >= %s
             ORDER BY score DESC
             LIMIT %s
             """,
@@ -143,7 +284,7 @@ def get_related_papers(
                 "id": int(r[0]),
                 "arxiv_id": r[1],
                 "title": r[2],
-                "score": float(r[4]),
+                "score": float(r[3]),
                 "source": "fallback",
                 "database": database,
             }
@@ -151,21 +292,26 @@ def get_related_papers(
         ]
 
         if results:
-            ids_only = [r["id"] for r in results]
-            cur.execute(
-                f"""
-                UPDATE {silver}
-                SET "similar_embeddings_ids" = PARSE_JSON(%s)
-                WHERE "id" = %s
-                """,
-                (json.dumps(ids_only), int(paper_id)),
-            )
+            _cache_related_ids(cur, silver, paper_id, results)
             conn.commit()
 
         return results
     finally:
         cur.close()
-        conn.close()
+
+
+def _cache_related_ids(cur, silver: str, paper_id: int, results: List[Dict[str, Any]]) -> None:
+    if not results:
+        return
+    ids_only = [r["id"] for r in results]
+    cur.execute(
+        f"""
+        UPDATE {silver}
+        SET "similar_embeddings_ids" = PARSE_JSON(%s)
+        WHERE "id" = %s
+        """,
+        (json.dumps(ids_only), int(paper_id)),
+    )
 
 
 @app.function(image=ml_image, secrets=[snowflake_secret], timeout=60 * 8)
@@ -193,24 +339,25 @@ def semantic_search(
     model = SentenceTransformer(model_name)
     qvec = model.encode([q], normalize_embeddings=True)[0].tolist()
 
-    conn = connect_to_snowflake(database=database, schema="GOLD")
+    conn = get_shared_snowflake_connection(database=database, schema="GOLD")
     cur = conn.cursor()
     try:
         cur.execute(
             f"""
+            WITH q AS (SELECT PARSE_JSON(%s)::VECTOR(FLOAT, 384) AS qvec)
             SELECT
                             s."id",
                             s."arxiv_id",
                             s."title",
                             s."abstract",
-                            VECTOR_COSINE_SIMILARITY(s."embedding", PARSE_JSON(%s)::VECTOR(FLOAT, 384)) AS vec_score
-            FROM {silver} s
+                            VECTOR_COSINE_SIMILARITY(s."embedding", q.qvec) AS vec_score
+            FROM {silver} s, q
                         WHERE s."embedding" IS NOT NULL
-                            AND VECTOR_COSINE_SIMILARITY(s."embedding", PARSE_JSON(%s)::VECTOR(FLOAT, 384)) >= %s
+                            AND VECTOR_COSINE_SIMILARITY(s."embedding", q.qvec) >= %s
             ORDER BY vec_score DESC
             LIMIT %s
             """,
-            (json.dumps(qvec), json.dumps(qvec), float(score_threshold), int(candidate_pool)),
+            (json.dumps(qvec), float(score_threshold), int(candidate_pool)),
         )
         rows = cur.fetchall()
 
@@ -233,7 +380,6 @@ def semantic_search(
         return ranked[: int(k)]
     finally:
         cur.close()
-        conn.close()
 
 
 @app.function(image=ml_image, secrets=[snowflake_secret], timeout=60 * 10)
@@ -266,31 +412,32 @@ def retrieve_similar_chunks(
     model = SentenceTransformer(model_name)
     qvec = model.encode([q], normalize_embeddings=True)[0].tolist()
 
-    conn = connect_to_snowflake(database=database, schema="GOLD")
+    conn = get_shared_snowflake_connection(database=database, schema="GOLD")
     cur = conn.cursor()
     try:
         paper_filter = ""
-        params = [json.dumps(qvec), json.dumps(qvec), float(score_threshold)]
+        params = [json.dumps(qvec)]
 
         if paper_id is not None:
             paper_filter = 'AND c."paper_id" = %s'
             params.append(int(paper_id))
 
-        params.append(int(top_k))
+        params.extend([float(score_threshold), int(top_k)])
 
         cur.execute(
             f"""
+            WITH q AS (SELECT PARSE_JSON(%s)::VECTOR(FLOAT, 384) AS qvec)
             SELECT
                             c.chunk_id,
                             c.paper_id,
                             c.section_id,
                             c.chunk_text,
                             c.chunk_type,
-                            VECTOR_COSINE_SIMILARITY(c.embedding, PARSE_JSON(%s)::VECTOR(FLOAT, 384)) AS score
-            FROM {chunks} c
+                            VECTOR_COSINE_SIMILARITY(c.embedding, q.qvec) AS score
+            FROM {chunks} c, q
                         WHERE c.embedding IS NOT NULL
-                            AND VECTOR_COSINE_SIMILARITY(c.embedding, PARSE_JSON(%s)::VECTOR(FLOAT, 384)) >= %s
               {paper_filter}
+              AND VECTOR_COSINE_SIMILARITY(c.embedding, q.qvec) >= %s
             ORDER BY score DESC
             LIMIT %s
             """,
@@ -315,7 +462,6 @@ def retrieve_similar_chunks(
         return results
     finally:
         cur.close()
-        conn.close()
 
 
 def retrieve_similar_chunks_local(
@@ -345,18 +491,21 @@ def retrieve_similar_chunks_local(
     model = SentenceTransformer(model_name)
     qvec = model.encode([q], normalize_embeddings=True)[0].tolist()
 
+    # Runs outside Modal, so open and close a connection per call rather than leaving
+    # a keep-alive session open for the life of the caller's process
     conn = connect_to_snowflake(database=database, schema=schema)
     cur = conn.cursor()
     try:
         paper_filter = ""
-        params = [json.dumps(qvec), json.dumps(qvec), float(score_threshold)]
+        params = [json.dumps(qvec)]
         if paper_id is not None:
             paper_filter = 'AND c."paper_id" = %s'
             params.append(int(paper_id))
-        params.append(max(int(top_k) * 3, int(top_k)))
+        params.extend([float(score_threshold), max(int(top_k) * 3, int(top_k))])
 
         cur.execute(
             f"""
+            WITH q AS (SELECT PARSE_JSON(%s)::VECTOR(FLOAT, 384) AS qvec)
             SELECT
               c."chunk_id",
               c."paper_id",
@@ -364,11 +513,11 @@ def retrieve_similar_chunks_local(
               c."chunk_text",
               c."chunk_type",
               c."token_estimate",
-              VECTOR_COSINE_SIMILARITY(c."embedding", PARSE_JSON(%s)::VECTOR(FLOAT, 384)) AS score
-            FROM {chunks} c
+              VECTOR_COSINE_SIMILARITY(c."embedding", q.qvec) AS score
+            FROM {chunks} c, q
             WHERE c."embedding" IS NOT NULL
-              AND VECTOR_COSINE_SIMILARITY(c."embedding", PARSE_JSON(%s)::VECTOR(FLOAT, 384)) >= %s
               {paper_filter}
+              AND VECTOR_COSINE_SIMILARITY(c."embedding", q.qvec) >= %s
             ORDER BY score DESC
             LIMIT %s
             """,
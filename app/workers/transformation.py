@@ -1,17 +1,34 @@
+import copy
 import re
 import threading
 import time
 import os
 import random
+import uuid
 from typing import Any, Dict, List, Optional
 
-from app.config import app, image, snowflake_secret, semantic_scholar_secret, DATABASE, qualify_table
+from app.config import (
+    app,
+    image,
+    snowflake_secret,
+    semantic_scholar_secret,
+    DATABASE,
+    qualify_table,
+    ARXIV_PDF_CACHE_DIR,
+    arxiv_pdf_volume,
+    arxiv_pdf_cache_path,
+    looks_like_complete_pdf,
+)
 from app.utils import connect_to_snowflake
 
 
 _SS_MIN_INTERVAL_SECONDS = 1.05
 _ss_lock = threading.Lock()
 _ss_last_request_ts = 0.0
+# (url, params) -> (etag, body) for conditional Semantic Scholar GETs
+_SS_ETAG_CACHE_MAX_ENTRIES = 1024
+_ss_etag_cache: Dict[tuple, tuple] = {}
+_ss_etag_cache_lock = threading.Lock()
 _ARXIV_MIN_INTERVAL_SECONDS = 3.0
 _arxiv_lock = threading.Lock()
 _arxiv_last_request_ts = 0.0
@@ -22,6 +39,21 @@ MAX_FULL_TEXT_CHARS = 350000
 FULL_TEXT_PAGE_LIMIT = 80
 CONCLUSION_MAX_WORDS = 500
 CONCLUSION_MAX_PARAGRAPHS = 6
+# Pages scanned backwards from the end of a PDF when looking for the conclusion
+CONCLUSION_TAIL_PAGES = 8
+_http_client_lock = threading.Lock()
+_http_client = None
+
+
+def _get_http_client():
+    """Process-wide httpx client so arXiv / Semantic Scholar calls reuse keep-alive connections."""
+    import httpx
+
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(timeout=30.0, follow_redirects=True)
+        return _http_client
 
 
 def _retry_delay_from_response(response, attempt: int, base: float = 1.5, cap: float = 20.0) -> float:
@@ -50,8 +82,15 @@ def _ss_get_json(url: str, params: Optional[dict] = None, timeout: float = 20.0)
     api_key = os.getenv("SEMANTIC_SCHOLAR_API_KEY")
     headers = {"x-api-key": api_key} if api_key else None
 
+    # Revalidate with If-None-Match so a repeat lookup is answered with an empty 304
+    cache_key = (url, tuple(sorted((params or {}).items())))
+    with _ss_etag_cache_lock:
+        cached = _ss_etag_cache.get(cache_key)
+
     def _request(req_headers):
-        return httpx.get(url, params=params, timeout=timeout, headers=req_headers)
+        if cached:
+            req_headers = {**(req_headers or {}), "If-None-Match": cached[0]}
+        return _get_http_client().get(url, params=params, timeout=timeout, headers=req_headers)
 
     max_attempts = 4
     response = None
@@ -59,6 +98,10 @@ def _ss_get_json(url: str, params: Optional[dict] = None, timeout: float = 20.0)
     for attempt in range(max_attempts):
         response = _request(headers)
 
+        if cached and response.status_code == 304:
+            # Callers may mutate the body; never hand out the cached object itself
+            return copy.deepcopy(cached[1])
+
         if headers and response.status_code in (401, 403):
             print("Semantic Scholar key rejected; retrying request without API key.")
             headers = None
@@ -72,7 +115,15 @@ def _ss_get_json(url: str, params: Optional[dict] = None, timeout: float = 20.0)
 
         try:
             response.raise_for_status()
-            return response.json()
+            data = response.json()
+            etag = response.headers.get("ETag")
+            if isinstance(etag, str) and etag:
+                entry = (etag, copy.deepcopy(data))
+                with _ss_etag_cache_lock:
+                    if cache_key not in _ss_etag_cache and len(_ss_etag_cache) >= _SS_ETAG_CACHE_MAX_ENTRIES:
+                        _ss_etag_cache.pop(next(iter(_ss_etag_cache)))
+                    _ss_etag_cache[cache_key] = entry
+            return data
         except httpx.HTTPStatusError as exc:
             status = exc.response.status_code if exc.response is not None else "unknown"
             body = ""
@@ -98,7 +149,7 @@ def _ss_post_json(url: str, payload: dict, params: Optional[dict] = None, timeou
     headers = {"x-api-key": api_key} if api_key else None
 
     def _request(req_headers):
-        return httpx.post(url, json=payload, params=params, timeout=timeout, headers=req_headers)
+        return _get_http_client().post(url, json=payload, params=params, timeout=timeout, headers=req_headers)
 
     max_attempts = 4
     response = None
@@ -131,6 +182,40 @@ def _ss_post_json(url: str, payload: dict, params: Optional[dict] = None, timeou
             ) from None
 
 def _arxiv_get_pdf_bytes(arxiv_id: str, timeout: float = 45.0, max_attempts: int = 6) -> bytes:
+    """
+    Return the PDF for arxiv_id, served from the PDF volume when a previous call already
+    downloaded it, otherwise fetched from arXiv and written back to the volume.
+    """
+    cache_path = arxiv_pdf_cache_path(arxiv_id)
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            pdf_bytes = f.read()
+        if looks_like_complete_pdf(pdf_bytes[:8], pdf_bytes[-1024:]):
+            return pdf_bytes
+        print(f"Warning: discarding truncated cached PDF for {arxiv_id}")
+        try:
+            os.remove(cache_path)
+        except OSError:
+            pass
+
+    pdf_bytes = _download_arxiv_pdf(arxiv_id, timeout=timeout, max_attempts=max_attempts)
+    if cache_path and looks_like_complete_pdf(pdf_bytes[:8], pdf_bytes[-1024:]):
+        # Write under a unique temp name and rename, so a killed container or a
+        # concurrent writer never leaves a partial file at the cache path
+        tmp_path = f"{cache_path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(pdf_bytes)
+            os.replace(tmp_path, cache_path)
+            arxiv_pdf_volume.commit()
+        except Exception as e:
+            print(f"Warning: could not cache PDF for {arxiv_id}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return pdf_bytes
+
+
+def _download_arxiv_pdf(arxiv_id: str, timeout: float = 45.0, max_attempts: int = 6) -> bytes:
     import httpx
 
     global _arxiv_last_request_ts
@@ -152,7 +237,7 @@ def _arxiv_get_pdf_bytes(arxiv_id: str, timeout: float = 45.0, max_attempts: int
 
         pdf_url = pdf_urls[attempt % len(pdf_urls)]
         try:
-            response = httpx.get(
+            response = _get_http_client().get(
                 pdf_url,
                 follow_redirects=True,
                 timeout=timeout,
@@ -414,45 +499,46 @@ def _looks_like_reference_paragraph(paragraph: str) -> bool:
     return False
 
 
+_CONCLUSION_HEADING_RES = [
+    re.compile(r"\n(?:[0-9.]*\s*)?Conclusion\b", re.IGNORECASE),
+    re.compile(r"\n(?:[0-9.]*\s*)?Concluding Remarks\b", re.IGNORECASE),
+    re.compile(r"\n(?:[0-9.]*\s*)?Summary and Discussion\b", re.IGNORECASE),
+]
+_STOP_HEADING_RE = re.compile(
+    r"\n(?:[0-9.]*\s*)?"
+    r"(?:References|Bibliography|Appendix|Acknowledg?ments?|Supplementary Material)\b",
+    re.IGNORECASE,
+)
+_INLINE_MATH_RE = re.compile(r"\$.*?\$")
+_REFERENCES_HEADING_RE = re.compile(r"References", re.IGNORECASE)
+_CITATION_MARKER_SPLIT_RE = re.compile(r"(\[\d+\])")
+# arXiv ID pattern for REGEXP_SUBSTR, escaped for a single-quoted Snowflake literal
+_ARXIV_ID_SQL_PATTERN = r"\\d{4}\\.\\d{4,5}"
+# Standalone bibliography heading line, used when scanning a whole-document text buffer
+_REFERENCES_SECTION_HEADING_RE = re.compile(r"\n\s*(?:references|bibliography)\s*\n", re.IGNORECASE)
+
+
 def _extract_conclusion_from_text(full_text: str) -> str:
     if not full_text:
         return ""
 
-    conclusion_patterns = [
-        r"\n(?:[0-9.]*\s*)?Conclusion\b",
-        r"\n(?:[0-9.]*\s*)?Concluding Remarks\b",
-        r"\n(?:[0-9.]*\s*)?Summary and Discussion\b",
-    ]
-    stop_patterns = [
-        r"\n(?:[0-9.]*\s*)?References\b",
-        r"\n(?:[0-9.]*\s*)?Bibliography\b",
-        r"\n(?:[0-9.]*\s*)?Appendix\b",
-        r"\n(?:[0-9.]*\s*)?Acknowledg?ments?\b",
-        r"\n(?:[0-9.]*\s*)?Supplementary Material\b",
-    ]
-
-    start_idx = -1
+    # Headings are tried in priority order, so "Conclusion" wins even if a
+    # "Concluding Remarks" heading appears earlier in the paper.
     heading_end = -1
-    for pattern in conclusion_patterns:
-        match = re.search(pattern, full_text, re.IGNORECASE)
+    for pattern in _CONCLUSION_HEADING_RES:
+        match = pattern.search(full_text)
         if match:
-            start_idx = match.start()
             heading_end = match.end()
             break
 
-    if start_idx == -1:
+    if heading_end == -1:
         return ""
 
-    text_after_start = full_text[heading_end:]
-    end_idx = len(text_after_start)
+    # One scan for the earliest stop heading, ignoring anything within 50 chars of the heading
+    stop = _STOP_HEADING_RE.search(full_text, heading_end + 51)
+    end_idx = stop.start() if stop else len(full_text)
 
-    for pattern in stop_patterns:
-        match = re.search(pattern, text_after_start, re.IGNORECASE)
-        if match and match.start() > 50 and match.start() < end_idx:
-            end_idx = match.start()
-
-    conclusion_raw = text_after_start[:end_idx]
-    conclusion_raw = re.sub(r"\$.*?\$", "", conclusion_raw)
+    conclusion_raw = _INLINE_MATH_RE.sub("", full_text[heading_end:end_idx])
 
     paragraphs = _normalize_paragraph_block(conclusion_raw)
     if not paragraphs:
@@ -486,7 +572,7 @@ def _extract_conclusion_from_text(full_text: str) -> str:
     return "\n\n".join(kept)
 
 
-@app.function(image=image, secrets=[snowflake_secret, semantic_scholar_secret], max_containers=1, timeout=60 * 4)
+@app.function(image=image, secrets=[snowflake_secret, semantic_scholar_secret], volumes={ARXIV_PDF_CACHE_DIR: arxiv_pdf_volume}, max_containers=1, timeout=60 * 4)
 def extract_full_text_pdf(arxiv_id: str) -> Dict[str, Any]:
     import pymupdf
 
@@ -536,11 +622,25 @@ def extract_full_text_pdf(arxiv_id: str) -> Dict[str, Any]:
 
 
 # parse PDF to search for conclusion
-@app.function(image=image, secrets=[snowflake_secret, semantic_scholar_secret], max_containers=1, timeout=60*2)
+@app.function(image=image, secrets=[snowflake_secret, semantic_scholar_secret], volumes={ARXIV_PDF_CACHE_DIR: arxiv_pdf_volume}, max_containers=1, timeout=60*2)
 def extract_conclusion(arxiv_id: str):
+    """
+    Read pages from the back of the PDF until one carries a conclusion heading
+    (at most CONCLUSION_TAIL_PAGES), then extract from that tail only.
+    """
+    import pymupdf
+
     try:
-        full_text_result = extract_full_text_pdf.local(arxiv_id)
-        return _extract_conclusion_from_text(full_text_result.get("full_text") or "")
+        pdf_bytes = _arxiv_get_pdf_bytes(arxiv_id=arxiv_id, timeout=45.0, max_attempts=5)
+        with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+            tail_pages: List[str] = []
+            for page_idx in range(len(doc) - 1, max(-1, len(doc) - 1 - CONCLUSION_TAIL_PAGES), -1):
+                # Leading newline lets a heading at the top of the page match
+                page_text = "\n" + _clean_extracted_text(doc[page_idx].get_text())
+                tail_pages.append(page_text)
+                if any(pattern.search(page_text) for pattern in _CONCLUSION_HEADING_RES):
+                    break
+        return _extract_conclusion_from_text("\n".join(reversed(tail_pages)))
     except Exception as e:
         print(f"Error extracting conclusion for {arxiv_id}: {e}")
         return ""
@@ -601,59 +701,76 @@ def fetch_connections_ss(arxiv_id: str, mode=0):
         return None
     
 # Use PDF parsing to extract references
-@app.function(image=image, secrets=[snowflake_secret, semantic_scholar_secret], max_containers=4, timeout=60*2)
+@app.function(image=image, secrets=[snowflake_secret, semantic_scholar_secret], volumes={ARXIV_PDF_CACHE_DIR: arxiv_pdf_volume}, max_containers=4, timeout=60*2)
 def extract_references_pdf(arxiv_id: str):
     import fitz 
-    import re
     
     try:
         pdf_bytes = _arxiv_get_pdf_bytes(arxiv_id=arxiv_id, timeout=30.0, max_attempts=5)
         
         try:
             with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-                full_text = ""
                 # Only look at the very end (last 5 pages)
                 start_page = max(0, len(doc) - 5)
-                for i in range(start_page, len(doc)):
-                    full_text += doc[i].get_text()
+                full_text = "".join(doc[i].get_text() for i in range(start_page, len(doc)))
         except Exception as pdf_err:
             print(f"Warning: Could not parse PDF for {arxiv_id}: {pdf_err}")
             return []
 
         # 1. Find the actual start of the list
         # We look for the first instance of "[1]" that appears after the word "References"
-        ref_match = re.search(r'References', full_text, re.IGNORECASE)
-        start_search = ref_match.start() if ref_match else 0
-        
-        # 2. Extract and clean the text from that point on
-        content = full_text[start_search:]
-        # Join lines to fix broken citations
-        clean_content = " ".join(content.replace('\n', ' ').split())
-
-        # 3. SPLIT INTO THE LIST
-        # This regex looks for [1], [2], etc. and captures them
-        parts = re.split(r'(\[\d+\])', clean_content)
+        # Plain substring search covers the usual heading casings; the regex only
+        # runs for the odd mixed-case variant
+        start_search = full_text.find("References")
+        if start_search == -1:
+            start_search = full_text.find("REFERENCES")
+        if start_search == -1:
+            ref_match = _REFERENCES_HEADING_RE.search(full_text)
+            start_search = ref_match.start() if ref_match else 0
         
-        # 4. Reconstruct the list (combine the bracket with its following text)
-        citations_list = []
-        for i in range(1, len(parts), 2):
-            if i + 1 < len(parts):
-                citation_entry = f"{parts[i]} {parts[i+1].strip()}"
-                # Filter out short fragments that are usually page numbers or footers
-                if len(citation_entry) > 15:
-                    citations_list.append(citation_entry)
-
-        return citations_list
+        # 2. Extract and split the text from that point on
+        return _split_citation_entries(full_text[start_search:])
 
     except Exception as e:
         print(f"Error extracting references for {arxiv_id}: {e}")
         return []
+
+
+def _split_citation_entries(content: str) -> List[str]:
+    # Join lines to fix broken citations
+    clean_content = " ".join(content.split())
+
+    # This regex looks for [1], [2], etc. and captures them
+    parts = _CITATION_MARKER_SPLIT_RE.split(clean_content)
+
+    # Reconstruct the list (combine the bracket with its following text)
+    citations_list = []
+    for i in range(1, len(parts), 2):
+        if i + 1 < len(parts):
+            citation_entry = f"{parts[i]} {parts[i+1].strip()}"
+            # Filter out short fragments that are usually page numbers or footers
+            if len(citation_entry) > 15:
+                citations_list.append(citation_entry)
+    return citations_list
+
+
+def _extract_references_from_full_text(full_text: str) -> List[str]:
+    """
+    Split the bibliography out of an already-extracted full-text buffer, starting at the
+    last standalone References/Bibliography heading.
+    """
+    heading = None
+    for heading in _REFERENCES_SECTION_HEADING_RE.finditer(full_text):
+        pass
+    if heading is None:
+        return []
+    return _split_citation_entries(full_text[heading.start():])
     
 
 # get citations for a given paper with arxiv_id
 # first attempts via the Semantic Scholar, then tries parsing pdf if that fails
 @app.function(image=image, secrets=[snowflake_secret, semantic_scholar_secret], max_containers=5)
-def get_references(arxiv_id: str):
+def get_references(arxiv_id: str, full_text: str = ""):
 
     # 1. Try Semantic Scholar (The "Clean" Way)
     api_results = fetch_connections_ss.remote(arxiv_id, mode=0)
@@ -664,15 +781,18 @@ def get_references(arxiv_id: str):
     # 2. Fallback to PDF Parsing
     print(f"API returned 0 results. Falling back to PDF parsing for {arxiv_id}...")
 
-    # This now returns a LIST of strings
-    citations_list = extract_references_pdf.remote(arxiv_id)
+    # Reuse the caller's already-parsed PDF text before opening the PDF again
+    citations_list = _extract_references_from_full_text(full_text) if full_text else []
+    if not citations_list:
+        # This now returns a LIST of strings
+        citations_list = extract_references_pdf.remote(arxiv_id)
 
     if citations_list and isinstance(citations_list, list):
         return {"source": "pdf_parsed_list", "data": citations_list}
 
     return {"source": "none", "data": []}
      
-@app.function(image=image, secrets=[snowflake_secret, semantic_scholar_secret], max_containers=1, timeout=60*5)
+@app.function(image=image, secrets=[snowflake_secret, semantic_scholar_secret], volumes={ARXIV_PDF_CACHE_DIR: arxiv_pdf_volume}, max_containers=1, timeout=60*5)
 def transform_to_silver(
     arxiv_id: str,
     ss_prefetched: Optional[Dict[str, Any]] = None,
@@ -692,6 +812,9 @@ def transform_to_silver(
     full_text_source = str(full_text_result.get("source") or "unavailable")
     if full_text:
         conclusion_text = _extract_conclusion_from_text(full_text)
+    # A complete full-text pass also covers the bibliography, so the reference
+    # fallback can parse it from this buffer instead of opening the PDF again
+    refs_pdf_text = "" if full_text_result.get("truncated") else full_text
 
     if ss_prefetched:
         tldr_text = (ss_prefetched.get("tldr") or "").strip()
@@ -701,13 +824,13 @@ def transform_to_silver(
         # Batch metadata occasionally returns sparse/empty connections for a paper.
         # Fall back to direct endpoints so citation edges are not lost.
         if not refs_data:
-            refs_task = get_references.local(arxiv_id)
+            refs_task = get_references.local(arxiv_id, full_text=refs_pdf_text)
             refs_data = refs_task.get("data", []) if refs_task else []
         if not cites_data:
             cites_task = fetch_connections_ss.local(arxiv_id, mode=1)
             cites_data = cites_task if cites_task else []
     else:
-        refs_task = get_references.local(arxiv_id)
+        refs_task = get_references.local(arxiv_id, full_text=refs_pdf_text)
         cites_task = fetch_connections_ss.local(arxiv_id, mode=1)
         refs_data = refs_task.get("data", []) if refs_task else []
         cites_data = cites_task if cites_task else []
@@ -723,7 +846,8 @@ def transform_to_silver(
         except Exception:
             pass
 
-    if not conclusion_text:
+    # Re-reading the PDF only helps if the full-text pass failed or was cut off before the end
+    if not conclusion_text and (not full_text or full_text_result.get("truncated")):
         conclusion_text = extract_conclusion.local(arxiv_id)
 
     # Final fallback for conclusion field uses TLDR only when full-text extraction fails.
@@ -753,15 +877,16 @@ def transform_to_silver(
             f"{payload_col}:title::STRING AS title",
             f"{payload_col}:summary::STRING AS abstract",
             "%s AS conclusion",
-            "PARSE_JSON(%s) AS reference_list",
-            "PARSE_JSON(%s) AS citation_list",
+            # Empty lists bind as NULL and become [] server-side without a JSON parse
+            "COALESCE(PARSE_JSON(%s), ARRAY_CONSTRUCT()) AS reference_list",
+            "COALESCE(PARSE_JSON(%s), ARRAY_CONSTRUCT()) AS citation_list",
         ]
         binds: List[Any] = [
             arxiv_id,
             ss_id,
             final_conclusion,
-            json.dumps(refs_data),
-            json.dumps(cites_data),
+            json.dumps(refs_data, separators=(",", ":")) if refs_data else None,
+            json.dumps(cites_data, separators=(",", ":")) if cites_data else None,
         ]
 
         if has_full_text:
@@ -884,25 +1009,26 @@ def get_bronze_worklist(force_reprocess: bool = False, database: str = DATABASE)
         silver_table,
     )
     
-    # Get all IDs in Bronze
-    cur.execute(f'SELECT {payload_col}:entry_id::STRING FROM {_bronze_papers_table(database=database)}')
-    rows = cur.fetchall()
-    
-    existing_ids = set()
-    if not force_reprocess:
-        # Default mode: skip papers already in Silver.
-        cur.execute(f'SELECT {silver_cols["arxiv_id"]} FROM {silver_table}')
-        existing_ids = {row[0] for row in cur.fetchall()}
+    # Extract arXiv IDs from Bronze and, by default, anti-join away papers already
+    # in Silver, so only the worklist itself comes back from the warehouse
+    skip_existing = "" if force_reprocess else f"""
+            AND NOT EXISTS (
+                SELECT 1 FROM {silver_table} s WHERE s.{silver_cols["arxiv_id"]} = b.arxiv_id
+            )"""
+    cur.execute(
+        f"""
+        WITH b AS (
+            SELECT REGEXP_SUBSTR({payload_col}:entry_id::STRING, '{_ARXIV_ID_SQL_PATTERN}') AS arxiv_id
+            FROM {_bronze_papers_table(database=database)}
+        )
+        SELECT DISTINCT b.arxiv_id
+        FROM b
+        WHERE b.arxiv_id IS NOT NULL{skip_existing}
+        """
+    )
+    arxiv_ids = [row[0] for row in cur.fetchall()]
     cur.close()
     conn.close()
-
-    arxiv_ids = []
-    for row in rows:
-        match = re.search(r"(\d{4}\.\d{4,5})", row[0])
-        if match:
-            aid = match.group(1)
-            if aid not in existing_ids: # Only process new papers
-                arxiv_ids.append(aid)
     return arxiv_ids
 
 @app.function(image=image, secrets=[snowflake_secret, semantic_scholar_secret], max_containers=1, timeout=60*30)
@@ -920,14 +1046,21 @@ def main(parallel=1, force_reprocess: bool = False, database: str = DATABASE):
 
     if(parallel == 1):
         print(f"Parallel processing {len(ids_to_process)} papers...")
-        for entry in ids_to_process:
-            transform_to_silver.remote(
-                entry,
-                ss_prefetched=ss_prefetch.get(entry),
-                database=database,
-            )
-        
-        print("Done!")
+        # Fan out through starmap instead of blocking on one .remote() per paper;
+        # failures come back as results so one bad paper doesn't stop the batch
+        results = transform_to_silver.starmap(
+            [(entry, ss_prefetch.get(entry)) for entry in ids_to_process],
+            kwargs={"database": database},
+            order_outputs=False,
+            return_exceptions=True,
+        )
+        failed = 0
+        for result in results:
+            if isinstance(result, Exception):
+                failed += 1
+                print(f"CRITICAL FAILURE: {result}")
+
+        print(f"Done! ({failed} failed)")
     else:
         for i, entry in enumerate(ids_to_process):
             try:
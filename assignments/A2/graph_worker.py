@@ -1,103 +1,64 @@
 """
 Build Gold layer relationships (citations + similarity) from Silver layer.
 """
-import os
-import snowflake.connector
-from typing import Iterable, List, Optional, Tuple
-#from utils import connect_to_snowflake
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+from utils import connect_to_snowflake
 from config import app, image, snowflake_secret
 import json
 
 
-def connect_to_snowflake():
-    env = "PROD"
-
-    return snowflake.connector.connect(
-        account=os.environ["SNOWFLAKE_ACCOUNT"],
-        user=os.environ["SNOWFLAKE_USER"],
-        password=os.environ["SNOWFLAKE_PASSWORD"],
-        database=f"MINDMAP_{env}",
-        warehouse=f"MINDMAP_{env}_WH",
-    )
-
-
 SILVER = "MINDMAP_PROD.SILVER.SILVER_PAPERS"
 GOLD = "MINDMAP_PROD.GOLD.GOLD_CONNECTIONS"
+# Edges per MERGE ... FROM VALUES statement (Snowflake caps VALUES at 16,384 rows)
+MERGE_CHUNK_SIZE = 5000
+# Papers per fetchmany() when streaming SILVER into build_knowledge_graph
+FETCH_BATCH_SIZE = 10000
 
-def _fetch_papers(cur, paper_id: Optional[int]) -> List[Tuple[int, list, list]]:
+def _fetch_papers(cur, paper_id: Optional[int], batch_size: int = FETCH_BATCH_SIZE) -> Iterator[List[Tuple[int, list]]]:
+    """Yield SILVER papers in batches of batch_size rather than buffering the whole result."""
     print(f"Fetching papers for paper_id={paper_id}...")
+    # citation_list stays in Snowflake; _citation_edges resolves it server-side
     if paper_id:
         cur.execute(
-            f'SELECT "id", "citation_list", "similar_embeddings_ids" FROM {SILVER} WHERE "id" = %s',
+            f'SELECT "id", "similar_embeddings_ids" FROM {SILVER} WHERE "id" = %s',
             (paper_id,),
         )
     else:
         cur.execute(
             f"""
-            SELECT "id", "citation_list", "similar_embeddings_ids"
+            SELECT "id", "similar_embeddings_ids"
             FROM {SILVER}
             WHERE "citation_list" IS NOT NULL OR "similar_embeddings_ids" IS NOT NULL
             """
         )
-    papers = cur.fetchall()
-    print(f"Fetched {len(papers)} papers.")
-    return papers
+    cur.arraysize = batch_size
+    while True:
+        batch = cur.fetchmany(batch_size)
+        if not batch:
+            break
+        yield batch
 
-def _merge_relationship(cur, source_id: int, target_id: int, rel_type: str, strength: float):
+def _citation_edges(cur, paper_id: Optional[int]) -> List[Tuple[int, int, str, float]]:
+    """Flatten every citation_list in SILVER and join its ss_paper_ids back to SILVER in one query."""
+    paper_filter = 'WHERE src."id" = %s' if paper_id else ""
     cur.execute(
         f"""
-        MERGE INTO {GOLD} AS target
-        USING (
-            SELECT %s AS source_paper_id,
-                   %s AS target_paper_id,
-                   %s AS relationship_type,
-                   %s AS strength
-        ) AS source
-        ON target."source_paper_id" = source.source_paper_id
-           AND target."target_paper_id" = source.target_paper_id
-           AND target."relationship_type" = source.relationship_type
-        WHEN NOT MATCHED THEN
-            INSERT ("source_paper_id", "target_paper_id", "relationship_type", "strength")
-            VALUES (source.source_paper_id, source.target_paper_id, source.relationship_type, source.strength)
+        WITH cited AS (
+            SELECT src."id" AS source_id, c.value:"ss_paper_id"::STRING AS ss_id
+            FROM {SILVER} src,
+                 LATERAL FLATTEN(input => src."citation_list") c
+            {paper_filter}
+        )
+        SELECT DISTINCT cited.source_id, sp."id"
+        FROM cited
+        JOIN {SILVER} sp ON sp."ss_id" = cited.ss_id
         """,
-        (source_id, target_id, rel_type, strength),
+        (paper_id,) if paper_id else None,
     )
-
-def _merge_citations(cur, source_id: int, citations: Iterable[dict]):
-    print(f"Merging {len(citations)} citations for paper {source_id}...")
-    for citation in citations:
-        ss_paper_id = citation.get("ss_paper_id")
-        if ss_paper_id:
-            cur.execute(
-                f"""
-                MERGE INTO {GOLD} AS target
-                USING (
-                    SELECT %s AS source_paper_id, sp."id" AS target_paper_id,
-                        'CITES' AS relationship_type, 1.0 AS strength
-                    FROM {SILVER} sp
-                    WHERE sp."ss_id" = %s
-                ) AS source
-                ON target."source_paper_id" = source.source_paper_id
-                AND target."target_paper_id" = source.target_paper_id
-                AND target."relationship_type" = source.relationship_type
-                WHEN NOT MATCHED THEN
-                    INSERT ("source_paper_id", "target_paper_id", "relationship_type", "strength")
-                    VALUES (source.source_paper_id, source.target_paper_id, source.relationship_type, source.strength)
-                """,
-                (source_id, ss_paper_id),
-            )
-            print(f"  Merged citation by ss_paper_id: {ss_paper_id}")
-        else:
-            print(f"  Skipped citation with missing ss_paper_id: {citation}")
-
-def _merge_similars(cur, source_id: int, similar_ids: Iterable[int]):
-    print(f"Merging {len(similar_ids)} similars for paper {source_id}...")
-    for idx, sim_id in enumerate(similar_ids):
-        strength = max(0.0, 1.0 - (idx * 0.1))
-        print(f"  Merged similar: {sim_id} with strength {strength}")
-        _merge_relationship(cur, source_id, sim_id, "SIMILAR", strength)
-        added += cur.rowcount
-    return added
+    edges = [(int(src), int(tgt), "CITES", 1.0) for src, tgt in cur.fetchall()]
+    print(f"Resolved {len(edges)} citation edges.")
+    return edges
 
 def _normalize_ids(value) -> List[int]:
     if value is None:
@@ -125,12 +86,23 @@ def _chunked(iterable, size: int):
             break
         yield chunk
 
+def _unique_edges(edges) -> List[Tuple[int, int, str, float]]:
+    """Keep the strongest edge per key (dropping self-loops) so one MERGE never sees duplicate source rows."""
+    unique = {}
+    for edge in edges:
+        if edge[0] == edge[1]:
+            continue
+        current = unique.get(edge[:3])
+        if current is None or edge[3] > current[3]:
+            unique[edge[:3]] = edge
+    return list(unique.values())
+
 def _bulk_merge_edges(cur, edges: List[Tuple[int, int, str, float]]) -> int:
     if not edges:
         return 0
 
     total = 0
-    for chunk in _chunked(edges, 500):
+    for chunk in _chunked(edges, MERGE_CHUNK_SIZE):
         values_sql = ", ".join(["(%s, %s, %s, %s)"] * len(chunk))
         flat_params = [p for row in chunk for p in row]
         cur.execute(
@@ -141,11 +113,11 @@ def _bulk_merge_edges(cur, edges: List[Tuple[int, int, str, float]]) -> int:
                           column3 AS relationship_type,
                           column4 AS strength
                    FROM VALUES {values_sql}) AS source
-            ON target.source_paper_id = source.source_paper_id
-               AND target.target_paper_id = source.target_paper_id
-               AND target.relationship_type = source.relationship_type
+            ON target."source_paper_id" = source.source_paper_id
+               AND target."target_paper_id" = source.target_paper_id
+               AND target."relationship_type" = source.relationship_type
             WHEN NOT MATCHED THEN
-                INSERT (source_paper_id, target_paper_id, relationship_type, strength)
+                INSERT ("source_paper_id", "target_paper_id", "relationship_type", "strength")
                 VALUES (source.source_paper_id, source.target_paper_id, source.relationship_type, source.strength)
             """,
             flat_params,
@@ -164,17 +136,17 @@ def _insert_hardcoded_test_papers(cur):
         {"ss_id": "8d0835be89802021924c328d9fd3b10fa557c4a7", "title": "Dummy Paper 1"},
         {"ss_id": "462142049c247e69eaf9d903aae2301f81885645", "title": "Dummy Paper 2"},
     ]
-    for paper in test_papers:
-        cur.execute(
-            f"""
-            INSERT INTO {SILVER} ("ss_id", "title")
-            SELECT %s, %s
-            WHERE NOT EXISTS (
-                SELECT 1 FROM {SILVER} WHERE "ss_id" = %s
-            )
-            """,
-            (paper["ss_id"], paper["title"], paper["ss_id"]),
-        )
+    values_sql = ", ".join(["(%s, %s)"] * len(test_papers))
+    cur.execute(
+        f"""
+        MERGE INTO {SILVER} AS target
+        USING (SELECT column1 AS ss_id, column2 AS title FROM VALUES {values_sql}) AS source
+        ON target."ss_id" = source.ss_id
+        WHEN NOT MATCHED THEN
+            INSERT ("ss_id", "title") VALUES (source.ss_id, source.title)
+        """,
+        [p for paper in test_papers for p in (paper["ss_id"], paper["title"])],
+    )
     print("Inserted hardcoded test papers into SILVER")
 
 # -----------------------------
@@ -184,29 +156,30 @@ def build_knowledge_graph(paper_id: int = None):
     Populate Gold layer with citation and semantic similarity relationships.
     If paper_id is None, process all papers.
     """
-    conn = connect_to_snowflake()
+    conn = connect_to_snowflake(database="MINDMAP_PROD", schema=None)
     cur = conn.cursor()
     try:
         # 🔥 Insert test papers so Gold can have connections
         _insert_hardcoded_test_papers(cur)
 
-        papers = _fetch_papers(cur, paper_id)
-        edges = []
-
-        for pid, citations, similar_ids in papers:
-            print(f"Processing paper {pid}...")
-            if citations and isinstance(citations, str):
-                try:
-                    citations = json.loads(citations)
-                except Exception as e:
-                    print(f"Failed to parse citations for paper {pid}: {e}")
-                    citations = []
-            if citations:
-                _merge_citations(cur, pid, citations)
-            if similar_ids:
-                _merge_similars(cur, pid, similar_ids)
+        # Stream papers on their own cursor and merge SIMILAR edges batch by batch,
+        # so peak memory is one batch and MERGEs overlap with the remaining download
+        paper_cur = conn.cursor()
+        paper_count = 0
+        added = 0
+        try:
+            for papers in _fetch_papers(paper_cur, paper_id):
+                paper_count += len(papers)
+                added += _bulk_merge_edges(cur, _unique_edges(
+                    (int(pid), sim_id, "SIMILAR", max(0.0, 1.0 - (idx * 0.1)))
+                    for pid, similar_ids in papers
+                    for idx, sim_id in enumerate(_normalize_ids(similar_ids))
+                ))
+        finally:
+            paper_cur.close()
+
+        added += _bulk_merge_edges(cur, _unique_edges(_citation_edges(cur, paper_id)))
         conn.commit()
-        print(f"Built knowledge graph for {len(papers)} papers, edges added: {added}")
+        print(f"Built knowledge graph for {paper_count} papers, edges added: {added}")
     finally:
-        cur.close()
-        conn.close()
\ No newline at end of file
+        cur.close()
\ No newline at end of file
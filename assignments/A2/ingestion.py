@@ -1,21 +1,11 @@
-import os
-import snowflake.connector
 import arxiv
 import json
+import textwrap
 from config import app, image, snowflake_secret
-#from utils import connect_to_snowflake
+from utils import connect_to_snowflake
 
-def connect_to_snowflake():
-    env = "PROD"
-
-    return snowflake.connector.connect(
-        account=os.environ["SNOWFLAKE_ACCOUNT"],
-        user=os.environ["SNOWFLAKE_USER"],
-        password=os.environ["SNOWFLAKE_PASSWORD"],
-        database=f"MINDMAP_{env}",
-        warehouse=f"MINDMAP_{env}_WH",
-        schema="BRONZE"
-    )
+# Payloads per multi-row Bronze INSERT (keeps each statement well under Snowflake's size limit)
+INSERT_CHUNK_SIZE = 200
 
 # Credentials should be stored in a Modal Secret
 @app.function(image=image, secrets=[snowflake_secret])
@@ -26,10 +16,14 @@ def ingest_from_arxiv(query: str, max_results: int = 5):
     """
     search = arxiv.Search(query=query, max_results=max_results)
     
-    conn = connect_to_snowflake()
+    conn = connect_to_snowflake(database="MINDMAP_PROD", schema="BRONZE")
     cur = conn.cursor()
 
-    for result in search.results():
+    # arXiv asks clients to space requests ~3s apart, so size one page to cover the request
+    client = arxiv.Client(page_size=max(1, min(int(max_results), 2000)))
+
+    payloads = []
+    for result in client.results(search):
         # 1. Convert the ArXiv object to a serializable dictionary
         raw_data = {
             "entry_id": result.entry_id,
@@ -48,16 +42,19 @@ def ingest_from_arxiv(query: str, max_results: int = 5):
         }
         
         # 2. Convert dictionary to a valid JSON string
-        json_payload = json.dumps(raw_data)
-        
-        # 3. Insert into the Bronze Table
+        payloads.append(json.dumps(raw_data))
+    
+    # 3. Insert into the Bronze Table, one multi-row INSERT per chunk
+    for start in range(0, len(payloads), INSERT_CHUNK_SIZE):
+        chunk = payloads[start:start + INSERT_CHUNK_SIZE]
+        values_sql = ", ".join(["(%s)"] * len(chunk))
         cur.execute(
-            'INSERT INTO "MINDMAP_PROD"."BRONZE"."BRONZE_PAPERS" ("raw_payload") SELECT PARSE_JSON(%s)', 
-            (json_payload,)
+            f'INSERT INTO "MINDMAP_PROD"."BRONZE"."BRONZE_PAPERS" ("raw_payload") SELECT PARSE_JSON(column1) FROM VALUES {values_sql}',
+            chunk,
         )
     
     conn.commit()
-    print(f"Ingested {max_results} papers into Bronze layer.")
+    print(f"Ingested {len(payloads)} papers into Bronze layer.")
 
 # testing function to see content of ingested bronze papers
 @app.function(image=image, secrets=[snowflake_secret])
@@ -65,10 +62,7 @@ def peek_bronze(limit: int = 3):
     """
     Inspects the raw JSON in Bronze, specifically focusing on the Abstract (summary).
     """
-    import json
-    import textwrap
-
-    conn = connect_to_snowflake()
+    conn = connect_to_snowflake(database="MINDMAP_PROD", schema="BRONZE")
     cur = conn.cursor()
 
     try:
@@ -100,7 +94,6 @@ def peek_bronze(limit: int = 3):
         print(f"Error: {e}")
     finally:
         cur.close()
-        conn.close()
 
 
 # ADD THIS - Required for CLI to work!
@@ -36,15 +36,9 @@ def get_related_papers(paper_id: int, k: int = 10) -> List[Dict[str, Any]]:
             cached_ids = cached_ids[: int(k)]
             if cached_ids:
                 # Return details for cached ids
-                values_sql = ", ".join(["(%s)"] * len(cached_ids))
+                placeholders = ", ".join(["%s"] * len(cached_ids))
                 cur.execute(
-                    f"""
-                    WITH ids(id) AS (SELECT column1 FROM VALUES {values_sql})
-                    SELECT s.id, s.arxiv_id, s.title
-                    FROM ids
-                    JOIN MINDMAP_DB.PUBLIC.SILVER_PAPERS s
-                      ON s.id = ids.id
-                    """,
+                    f"SELECT id, arxiv_id, title FROM MINDMAP_DB.PUBLIC.SILVER_PAPERS WHERE id IN ({placeholders})",
                     [int(x) for x in cached_ids],
                 )
                 rows = cur.fetchall()
@@ -99,5 +93,4 @@ def get_related_papers(paper_id: int, k: int = 10) -> List[Dict[str, Any]]:
         return results
     finally:
         cur.close()
-        conn.close()
 
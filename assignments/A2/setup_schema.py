@@ -30,12 +30,13 @@ def setup_schema():
         with open("A2/create_schemas.sql", "r") as f:
             sql_script = f.read()
         
-        # Execute each statement
-        for statement in sql_script.split(";"):
-            statement = statement.strip()
-            if statement:
-                print(f"Executing: {statement[:60]}...")
-                cur.execute(statement)
+        # Submit the whole script in one request; num_statements=0 lets Snowflake
+        # accept however many statements it contains (comments included)
+        print("Executing create_schemas.sql as a single multi-statement request...")
+        cur.execute(sql_script, num_statements=0)
+        # Step through each statement's result so a failure surfaces here
+        while cur.nextset():
+            pass
         
         conn.commit()
         print("✓ Schema created successfully!")
@@ -1,24 +1,6 @@
-import os
 import re
-import snowflake.connector
 from config import app, image, snowflake_secret
-#from utils import connect_to_snowflake
-
-
-
-def connect_to_snowflake():
-    env = "PROD"
-
-    return snowflake.connector.connect(
-        account=os.environ["SNOWFLAKE_ACCOUNT"],
-        user=os.environ["SNOWFLAKE_USER"],
-        password=os.environ["SNOWFLAKE_PASSWORD"],
-        database=f"MINDMAP_{env}",
-        warehouse=f"MINDMAP_{env}_WH",
-        schema="SILVER"
-    )
-
-
+from utils import connect_to_snowflake
 
 
 # Helper to download arXiv PDF once
@@ -38,9 +20,7 @@ def extract_conclusion_from_pdf(pdf_bytes):
     import pymupdf # PyMuPDF
     import re
     doc = pymupdf.open(stream=pdf_bytes, filetype="pdf")
-    full_text = ""
-    for page in doc:
-        full_text += page.get_text()
+    full_text = "".join(page.get_text() for page in doc)
 
     # 3. Robust Section Detection
     # We look for Conclusion but also identify common "Stop" sections
@@ -154,11 +134,9 @@ def extract_references_from_pdf(pdf_bytes):
     import re
     try:
         with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-            full_text = ""
             # Only look at the very end (last 5 pages)
             start_page = max(0, len(doc) - 5)
-            for i in range(start_page, len(doc)):
-                full_text += doc[i].get_text()
+            full_text = "".join(doc[i].get_text() for i in range(start_page, len(doc)))
         # 1. Find the actual start of the list
         ref_match = re.search(r'References', full_text, re.IGNORECASE)
         start_search = ref_match.start() if ref_match else 0
@@ -241,7 +219,7 @@ def transform_to_silver(arxiv_id: str):
         pass
 
     # 4. Merge all extracted and fetched data into the Silver table
-    conn = connect_to_snowflake()
+    conn = connect_to_snowflake(database="MINDMAP_PROD", schema="SILVER")
     cur = conn.cursor()
     try:
         cur.execute("""
@@ -285,14 +263,13 @@ def transform_to_silver(arxiv_id: str):
         conn.rollback()
     finally:
         cur.close()
-        conn.close()
 
 
 # Provides a list of arxiv_ids in the bronze layer to be processed into silver
 @app.function(image=image, secrets=[snowflake_secret], max_containers=5)
 def get_bronze_worklist():
     import re
-    conn = connect_to_snowflake()
+    conn = connect_to_snowflake(database="MINDMAP_PROD", schema="SILVER")
     cur = conn.cursor()
     
     # Get all IDs in Bronze
@@ -302,7 +279,7 @@ def get_bronze_worklist():
     # Optional: Filter out papers already in Silver to avoid redundant work
     cur.execute('SELECT "arxiv_id" FROM "MINDMAP_PROD"."SILVER"."SILVER_PAPERS"')
     existing_ids = {row[0] for row in cur.fetchall()}
-    conn.close()
+    cur.close()
 
     arxiv_ids = []
     for row in rows:
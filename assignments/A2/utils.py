@@ -2,11 +2,26 @@ import os
 from pathlib import Path
 import snowflake.connector
 
-def connect_to_snowflake():
-    return snowflake.connector.connect(
-        account=os.environ["SNOWFLAKE_ACCOUNT"],
-        user=os.environ["SNOWFLAKE_USER"],
-        password=os.environ["SNOWFLAKE_PASSWORD"],
-        database='MINDMAP_DB', warehouse='MINDMAP_WH',
-        schema='PUBLIC'
-    )
\ No newline at end of file
+# One connection per (database, warehouse, schema) per Modal container,
+# reused across warm invocations
+_CONNS = {}
+
+def connect_to_snowflake(database="MINDMAP_DB", schema="PUBLIC", warehouse=None):
+    # MINDMAP_DB runs on MINDMAP_WH; the env databases (MINDMAP_PROD, ...) on <database>_WH
+    warehouse = warehouse or ("MINDMAP_WH" if database == "MINDMAP_DB" else f"{database}_WH")
+    key = (database, warehouse, schema)
+    conn = _CONNS.get(key)
+    if conn is None or conn.is_closed():
+        params = dict(
+            account=os.environ["SNOWFLAKE_ACCOUNT"],
+            user=os.environ["SNOWFLAKE_USER"],
+            password=os.environ["SNOWFLAKE_PASSWORD"],
+            database=database,
+            warehouse=warehouse,
+            client_session_keep_alive=True,
+        )
+        if schema:
+            params["schema"] = schema
+        conn = snowflake.connector.connect(**params)
+        _CONNS[key] = conn
+    return conn
@@ -49,7 +49,11 @@ resource "snowflake_table" "silver_papers" {
   database = snowflake_database.mindmap.name
   schema   = snowflake_schema.silver.name
   name     = "SILVER_PAPERS"
-  
+
+  # Citation resolution and ingestion dedupe join on arxiv_id; "id" is an identity
+  # column and is already laid out in insertion order, so it needs no key of its own.
+  cluster_by = ["\"arxiv_id\""]
+
   column {
     name = "id"
     type = "NUMBER"
@@ -114,6 +118,17 @@ resource "snowflake_table" "silver_papers" {
     type = "VECTOR(FLOAT, 384)"
   }
 
+  # int8-quantized copy of "embedding" (384 bytes) plus its dequantization scale
+  column {
+    name = "embedding_i8"
+    type = "BINARY"
+  }
+
+  column {
+    name = "embedding_scale"
+    type = "FLOAT"
+  }
+
   column {
     name = "similar_embeddings_ids"
     type = "VARIANT"
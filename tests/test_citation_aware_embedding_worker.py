@@ -6,10 +6,14 @@ so we inject a mock for `workers.citation_worker` into sys.modules before
 importing the module under test.
 """
 
+import json
 import math
 import sys
 from unittest.mock import MagicMock, patch
 
+import numpy as np
+import pytest
+
 # --- Mock citation_worker before importing citation_aware_embedding_worker ---
 mock_citation_worker = MagicMock()
 mock_get_citations = MagicMock()
@@ -23,31 +27,12 @@ mock_sentence_transformers.SentenceTransformer.return_value = mock_st_model
 sys.modules["sentence_transformers"] = mock_sentence_transformers
 
 from workers.citation_aware_embedding_worker import (  # noqa: E402
-    _l2_normalize,
     _extract_ref_arxiv_id,
     _extract_ref_text,
     run_citation_aware_embedding_batch,
 )
 
 
-# ---------------------------------------------------------------------------
-# _l2_normalize
-# ---------------------------------------------------------------------------
-
-def test_l2_normalize_unit_length():
-    vec = [3.0, 4.0]
-    result = _l2_normalize(vec)
-    norm = math.sqrt(sum(x * x for x in result))
-    assert abs(norm - 1.0) < 1e-6
-
-
-def test_l2_normalize_zero_vector():
-    vec = [0.0, 0.0, 0.0]
-    result = _l2_normalize(vec)
-    # Should not raise; norm defaults to 1.0 so each element stays 0
-    assert len(result) == 3
-
-
 # ---------------------------------------------------------------------------
 # _extract_ref_arxiv_id
 # ---------------------------------------------------------------------------
@@ -118,11 +103,23 @@ def test_ensure_tables_calls_execute():
     assert mock_cursor.execute.call_count == 2
 
 
-def test_upsert_ca_embedding_calls_execute():
-    from workers.citation_aware_embedding_worker import _upsert_ca_embedding
+def test_upsert_ca_embeddings_merges_rows_in_chunks():
+    from workers.citation_aware_embedding_worker import _upsert_ca_embeddings
+    from app.config import MERGE_CHUNK_SIZE
     mock_cursor = MagicMock()
-    _upsert_ca_embedding(mock_cursor, "paper1", "model-v1", 0.8, [0.1] * 384)
-    mock_cursor.execute.assert_called_once()
+    rows = [(f"paper{i}", [0.1] * 384) for i in range(MERGE_CHUNK_SIZE + 1)]
+    _upsert_ca_embeddings(mock_cursor, "model-v1", 0.8, rows)
+    assert mock_cursor.execute.call_count == 2
+    first_params = mock_cursor.execute.call_args_list[0][0][1]
+    assert first_params[:3] == ["model-v1", 0.8, "paper0"]
+    assert len(first_params) == 2 + 2 * MERGE_CHUNK_SIZE
+
+
+def test_upsert_ca_embeddings_skips_empty():
+    from workers.citation_aware_embedding_worker import _upsert_ca_embeddings
+    mock_cursor = MagicMock()
+    _upsert_ca_embeddings(mock_cursor, "model-v1", 0.8, [])
+    mock_cursor.execute.assert_not_called()
 
 
 def test_insert_references_inserts_rows():
@@ -130,38 +127,37 @@ def test_insert_references_inserts_rows():
     mock_cursor = MagicMock()
     refs = [{"ref_text": "Ref 1", "ref_arxiv_id": "2301.00001"}, "plain string ref"]
     _insert_references(mock_cursor, "paper1", "2301.00001", refs)
-    assert mock_cursor.execute.call_count == 2
-
-
-def test_resolve_ref_paper_ids_empty():
-    from workers.citation_aware_embedding_worker import _resolve_ref_paper_ids
-    mock_cursor = MagicMock()
-    result = _resolve_ref_paper_ids(mock_cursor, [])
-    assert result == []
+    mock_cursor.execute.assert_called_once()
+    params = mock_cursor.execute.call_args[0][1]
+    assert params == [
+        "paper1", "2301.00001", 0, "Ref 1", "2301.00001",
+        "paper1", "2301.00001", 1, "plain string ref", None,
+    ]
 
 
-def test_resolve_ref_paper_ids_with_ids():
-    from workers.citation_aware_embedding_worker import _resolve_ref_paper_ids
+def test_insert_references_skips_empty():
+    from workers.citation_aware_embedding_worker import _insert_references
     mock_cursor = MagicMock()
-    mock_cursor.fetchall.return_value = [("uuid-1",), ("uuid-2",)]
-    result = _resolve_ref_paper_ids(mock_cursor, ["2301.00001", "2301.00002"])
-    assert result == ["uuid-1", "uuid-2"]
+    _insert_references(mock_cursor, "paper1", "2301.00001", [])
+    mock_cursor.execute.assert_not_called()
 
 
-def test_fetch_embeddings_empty():
-    from workers.citation_aware_embedding_worker import _fetch_embeddings
+def test_fetch_ref_embeddings_empty():
+    from workers.citation_aware_embedding_worker import _fetch_ref_embeddings
     mock_cursor = MagicMock()
-    result = _fetch_embeddings(mock_cursor, [])
-    assert result == []
+    result = _fetch_ref_embeddings(mock_cursor, ["", None])
+    assert result == {}
+    mock_cursor.execute.assert_not_called()
 
 
-def test_fetch_embeddings_with_ids():
-    from workers.citation_aware_embedding_worker import _fetch_embeddings
+def test_fetch_ref_embeddings_with_ids():
+    from workers.citation_aware_embedding_worker import _fetch_ref_embeddings
     mock_cursor = MagicMock()
-    mock_cursor.fetchall.return_value = [([0.1] * 384,)]
-    result = _fetch_embeddings(mock_cursor, ["uuid-1"])
-    assert len(result) == 1
-    assert len(result[0]) == 384
+    mock_cursor.fetchall.return_value = [("2301.00001", [0.1] * 384)]
+    result = _fetch_ref_embeddings(mock_cursor, ["2301.00002", "2301.00001", "2301.00001"])
+    assert list(result) == ["2301.00001"]
+    assert len(result["2301.00001"]) == 384
+    assert mock_cursor.execute.call_args[0][1] == ["2301.00001", "2301.00002"]
 
 
 # ---------------------------------------------------------------------------
@@ -177,16 +173,14 @@ def test_run_citation_aware_embedding_batch_with_paper_no_refs():
     mock_conn.cursor.return_value = mock_cursor
     mock_conn.commit.return_value = None
 
-    mock_vec = MagicMock()
-    mock_vec.tolist.return_value = [0.1] * 384
     mock_model = MagicMock()
-    mock_model.encode.return_value = [mock_vec]
+    mock_model.encode.return_value = np.full((1, 384), 0.1, dtype=np.float32)
     mock_st_local = MagicMock()
     mock_st_local.SentenceTransformer.return_value = mock_model
     sys.modules["sentence_transformers"] = mock_st_local
 
     # get_citations returns no references
-    mock_get_citations.remote.return_value = {"references": []}
+    mock_get_citations.map.return_value = [{"references": []}]
 
     with patch("workers.citation_aware_embedding_worker.connect_to_snowflake", return_value=mock_conn):
         result = run_citation_aware_embedding_batch(limit=1)
@@ -194,6 +188,10 @@ def test_run_citation_aware_embedding_batch_with_paper_no_refs():
     assert result["status"] == "ok"
     assert result["updated"] == 1
     assert result["skipped_no_refs"] == 1
+    mock_model.encode.assert_called_once_with(["Title\n\nAbstract"], normalize_embeddings=True, batch_size=32)
+    mock_get_citations.map.assert_called_with(
+        ["2301.00001"], kwargs={"max_refs": 80}, return_exceptions=True
+    )
 
 
 def test_run_citation_aware_embedding_batch_with_reference_embeddings():
@@ -202,8 +200,7 @@ def test_run_citation_aware_embedding_batch_with_reference_embeddings():
     mock_cursor = MagicMock()
     mock_cursor.fetchall.side_effect = [
         [("pid1", "2301.00001", "Title", "Abstract")],
-        [("ref-paper",)],
-        [([0.0, 1.0],)],
+        [("2301.00002", [0.0, 1.0])],
     ]
     mock_cursor.execute.return_value = None
 
@@ -211,43 +208,33 @@ def test_run_citation_aware_embedding_batch_with_reference_embeddings():
     mock_conn.cursor.return_value = mock_cursor
     mock_conn.commit.return_value = None
 
-    mock_vec = MagicMock()
-    mock_vec.tolist.return_value = [1.0, 0.0]
     mock_model = MagicMock()
-    mock_model.encode.return_value = [mock_vec]
+    mock_model.encode.return_value = np.array([[1.0, 0.0]], dtype=np.float32)
     sys.modules["sentence_transformers"] = types.SimpleNamespace(
         SentenceTransformer=MagicMock(return_value=mock_model)
     )
-    _real_numpy = sys.modules.get("numpy")
-    sys.modules["numpy"] = types.SimpleNamespace(
-        float32="float32",
-        array=lambda values, dtype=None: values,
-        mean=lambda values, axis=0: MagicMock(tolist=MagicMock(return_value=[0.0, 1.0])),
-    )
 
-    mock_get_citations.remote.return_value = {
-        "references": [{"ref_text": "Ref", "ref_arxiv_id": "2301.00002"}]
-    }
+    mock_get_citations.map.return_value = [
+        {"references": [{"ref_text": "Ref", "ref_arxiv_id": "2301.00002"}]}
+    ]
 
     with patch("workers.citation_aware_embedding_worker.connect_to_snowflake", return_value=mock_conn):
         result = run_citation_aware_embedding_batch(limit=1, alpha=0.75)
 
-    if _real_numpy is not None:
-        sys.modules["numpy"] = _real_numpy
-    else:
-        sys.modules.pop("numpy", None)
-
     assert result["status"] == "ok"
     assert result["updated"] == 1
     assert result["skipped_no_refs"] == 0
     assert result["skipped_no_ref_embs"] == 0
+    upsert_params = mock_cursor.execute.call_args_list[-1][0][1]
+    assert upsert_params[2] == "pid1"
+    e_final = json.loads(upsert_params[3])
+    assert e_final == pytest.approx([0.75 / math.hypot(0.75, 0.25), 0.25 / math.hypot(0.75, 0.25)])
 
 
 def test_run_citation_aware_embedding_batch_with_refs_but_no_ref_embeddings():
     mock_cursor = MagicMock()
     mock_cursor.fetchall.side_effect = [
         [("pid1", "2301.00001", "Title", "Abstract")],
-        [("ref-paper",)],
         [],
     ]
     mock_cursor.execute.return_value = None
@@ -256,17 +243,73 @@ def test_run_citation_aware_embedding_batch_with_refs_but_no_ref_embeddings():
     mock_conn.cursor.return_value = mock_cursor
     mock_conn.commit.return_value = None
 
-    mock_vec = MagicMock()
-    mock_vec.tolist.return_value = [0.1] * 384
     mock_model = MagicMock()
-    mock_model.encode.return_value = [mock_vec]
+    mock_model.encode.return_value = np.full((1, 384), 0.1, dtype=np.float32)
     mock_sentence_transformers.SentenceTransformer.return_value = mock_model
-    mock_get_citations.remote.return_value = {
-        "references": [{"ref_text": "Ref", "ref_arxiv_id": "2301.00002"}]
-    }
+    mock_get_citations.map.return_value = [
+        {"references": [{"ref_text": "Ref", "ref_arxiv_id": "2301.00002"}]}
+    ]
 
     with patch("workers.citation_aware_embedding_worker.connect_to_snowflake", return_value=mock_conn):
         result = run_citation_aware_embedding_batch(limit=1)
 
     assert result["updated"] == 1
     assert result["skipped_no_ref_embs"] == 1
+
+
+def test_run_citation_aware_embedding_batch_looks_up_refs_once_per_batch():
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.side_effect = [
+        [("pid1", "2301.00001", "T1", "A1"), ("pid2", "2301.00003", "T2", "A2")],
+        [("2301.00002", [0.0, 1.0])],
+    ]
+
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+
+    mock_model = MagicMock()
+    mock_model.encode.return_value = np.array([[1.0, 0.0], [1.0, 0.0]], dtype=np.float32)
+    sys.modules["sentence_transformers"] = MagicMock(SentenceTransformer=MagicMock(return_value=mock_model))
+    mock_get_citations.map.return_value = [
+        {"references": [{"ref_text": "Ref", "ref_arxiv_id": "2301.00002"}]},
+        {"references": [{"ref_text": "Ref", "ref_arxiv_id": "2301.00002"}, "see 2301.09999"]},
+    ]
+
+    with patch("workers.citation_aware_embedding_worker.connect_to_snowflake", return_value=mock_conn):
+        result = run_citation_aware_embedding_batch(limit=2)
+
+    assert result["updated"] == 2
+    assert result["skipped_no_ref_embs"] == 0
+    # paper select + one ref embedding lookup
+    assert mock_cursor.fetchall.call_count == 2
+    merges = [c for c in mock_cursor.execute.call_args_list if "MERGE INTO PAPER_EMBEDDINGS_CA" in c[0][0]]
+    assert len(merges) == 1
+
+
+def test_run_citation_aware_embedding_batch_survives_one_failed_citation_lookup():
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.side_effect = [
+        [("pid1", "2301.00001", "T1", "A1"), ("pid2", "2301.00003", "T2", "A2")],
+        [("2301.00002", [0.0, 1.0])],
+    ]
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+
+    mock_model = MagicMock()
+    mock_model.encode.return_value = np.array([[1.0, 0.0], [1.0, 0.0]], dtype=np.float32)
+    sys.modules["sentence_transformers"] = MagicMock(SentenceTransformer=MagicMock(return_value=mock_model))
+    mock_get_citations.map.return_value = [
+        ValueError("No arXiv entry found for arxiv_id=2301.00001"),
+        {"references": [{"ref_text": "Ref", "ref_arxiv_id": "2301.00002"}]},
+    ]
+
+    with patch("workers.citation_aware_embedding_worker.connect_to_snowflake", return_value=mock_conn):
+        result = run_citation_aware_embedding_batch(limit=2)
+
+    assert result["updated"] == 2
+    assert result["skipped_citation_errors"] == 1
+    assert result["skipped_no_refs"] == 1
+    merge_params = [
+        c[0][1] for c in mock_cursor.execute.call_args_list if "MERGE INTO PAPER_EMBEDDINGS_CA" in c[0][0]
+    ][0]
+    assert merge_params[2::2] == ["pid1", "pid2"]
@@ -1,7 +1,7 @@
 """
 Tests for workers/citation_worker.py — get_citations function.
 
-feedparser, requests, and fitz are all imported inside the function body,
+feedparser, requests, and fitz are all imported inside function bodies,
 so we patch sys.modules directly so each `import X` inside the function
 resolves to our mock objects.
 """
@@ -13,7 +13,37 @@ from unittest.mock import MagicMock, patch
 # Remove any previously injected mock for citation_worker so we import the real module
 sys.modules.pop("workers.citation_worker", None)
 
-from workers.citation_worker import get_citations
+import workers.citation_worker as citation_worker
+from workers.citation_worker import get_citations, _split_reference_block
+
+
+@pytest.fixture(autouse=True)
+def _reset_session(monkeypatch):
+    citation_worker._session = None
+    monkeypatch.setattr(citation_worker, "_ARXIV_MIN_INTERVAL_SECONDS", 0.0)
+    yield
+    citation_worker._session = None
+
+
+def test_throttle_arxiv_spaces_requests_by_min_interval(monkeypatch):
+    monkeypatch.setattr(citation_worker, "_ARXIV_MIN_INTERVAL_SECONDS", 6.0)
+    monkeypatch.setattr(citation_worker, "_arxiv_last_request_ts", 0.0)
+    clock = [100.0]
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    with patch("workers.citation_worker.time.time", side_effect=lambda: clock[0]), \
+            patch("workers.citation_worker.time.sleep", side_effect=fake_sleep):
+        citation_worker._throttle_arxiv()
+        clock[0] += 1.0
+        citation_worker._throttle_arxiv()
+        clock[0] += 10.0
+        citation_worker._throttle_arxiv()
+
+    assert sleeps == [5.0]
 
 
 REF_TEXT = (
@@ -56,7 +86,7 @@ def test_get_citations_happy_path():
     mock_response = MagicMock()
     mock_response.content = b"%PDF-1.4 fake pdf content"
     mock_response.raise_for_status.return_value = None
-    mock_requests.get.return_value = mock_response
+    mock_requests.Session.return_value.get.return_value = mock_response
 
     mock_fitz = MagicMock()
     mock_doc = _make_mock_doc(REF_TEXT)
@@ -102,7 +132,7 @@ def test_get_citations_no_references_section():
     mock_response = MagicMock()
     mock_response.content = b"%PDF-1.4 fake pdf content"
     mock_response.raise_for_status.return_value = None
-    mock_requests.get.return_value = mock_response
+    mock_requests.Session.return_value.get.return_value = mock_response
 
     mock_fitz = MagicMock()
     mock_doc = _make_mock_doc("This page has no references section at all.")
@@ -136,7 +166,7 @@ def test_get_citations_falls_back_to_default_pdf_url_and_stops_at_appendix():
     mock_response = MagicMock()
     mock_response.content = b"%PDF-1.4 fake pdf content"
     mock_response.raise_for_status.return_value = None
-    mock_requests.get.return_value = mock_response
+    mock_requests.Session.return_value.get.return_value = mock_response
 
     text = "\nReferences\n[1] " + ("A" * 40) + "\n\nAppendix\n[2] " + ("B" * 40)
     mock_fitz = MagicMock()
@@ -152,3 +182,138 @@ def test_get_citations_falls_back_to_default_pdf_url_and_stops_at_appendix():
 
     assert result["arxiv_metadata"]["pdf_url"] == "https://arxiv.org/pdf/2301.00001.pdf"
     assert len(result["references"]) == 1
+
+
+def test_split_reference_block_collapses_whitespace_and_drops_short_chunks():
+    text = (
+        "Intro text\nREFERENCES\n"
+        "[1] Smith,  J.\n  A reference entry\twrapped over lines.\n"
+        "2. short\n"
+        "3. Jones, K. Another sufficiently long reference entry.\n"
+        "Acknowledgements\n[4] " + ("C" * 40)
+    )
+
+    assert _split_reference_block(text) == [
+        "[1] Smith, J. A reference entry wrapped over lines.",
+        "Jones, K. Another sufficiently long reference entry.",
+    ]
+    assert _split_reference_block("no heading here") == []
+
+
+def test_get_citations_reuses_one_session_for_feed_and_pdf():
+    mock_feedparser = MagicMock()
+    mock_feedparser.parse.return_value = MagicMock(entries=[_make_feed_entry()])
+
+    mock_requests = MagicMock()
+    mock_session = mock_requests.Session.return_value
+    mock_session.get.return_value = MagicMock(content=b"%PDF-1.4 fake pdf content")
+
+    mock_fitz = MagicMock()
+    mock_fitz.open.return_value = _make_mock_doc(REF_TEXT)
+
+    with patch.dict(sys.modules, {
+        "feedparser": mock_feedparser,
+        "requests": mock_requests,
+        "fitz": mock_fitz,
+    }):
+        get_citations("2301.00001")
+        get_citations("2301.00001")
+
+    mock_requests.Session.assert_called_once()
+    urls = sorted(c.args[0] for c in mock_session.get.call_args_list)
+    assert urls == [
+        "http://export.arxiv.org/api/query?id_list=2301.00001",
+        "http://export.arxiv.org/api/query?id_list=2301.00001",
+        "https://arxiv.org/pdf/2301.00001.pdf",
+        "https://arxiv.org/pdf/2301.00001.pdf",
+    ]
+
+
+def test_get_citations_reads_pdf_from_volume_cache(tmp_path):
+    (tmp_path / "2301.00001.pdf").write_bytes(b"%PDF-1.4 cached %%EOF\n")
+
+    mock_feedparser = MagicMock()
+    mock_feedparser.parse.return_value = MagicMock(entries=[_make_feed_entry()])
+
+    mock_requests = MagicMock()
+    mock_session = mock_requests.Session.return_value
+    mock_session.get.return_value = MagicMock(content=b"<feed/>")
+
+    mock_fitz = MagicMock()
+    mock_fitz.open.return_value = _make_mock_doc(REF_TEXT)
+
+    with patch("app.config.ARXIV_PDF_CACHE_DIR", str(tmp_path)):
+        with patch.dict(sys.modules, {
+            "feedparser": mock_feedparser,
+            "requests": mock_requests,
+            "fitz": mock_fitz,
+        }):
+            result = get_citations("2301.00001")
+
+    assert [c.args[0] for c in mock_session.get.call_args_list] == [
+        "http://export.arxiv.org/api/query?id_list=2301.00001"
+    ]
+    mock_fitz.open.assert_called_once_with(str(tmp_path / "2301.00001.pdf"))
+    assert result["references"][0].startswith("[1] Smith et al.")
+
+
+def test_get_citations_replaces_truncated_cached_pdf(tmp_path):
+    (tmp_path / "2301.00001.pdf").write_bytes(b"%PDF-1.4 cut off mid-wri")
+    pdf = b"%PDF-1.4 fresh %%EOF\n"
+
+    mock_feedparser = MagicMock()
+    mock_feedparser.parse.return_value = MagicMock(entries=[_make_feed_entry()])
+
+    mock_requests = MagicMock()
+    mock_session = mock_requests.Session.return_value
+    feed_response = MagicMock(content=b"<feed/>")
+    pdf_response = MagicMock()
+    pdf_response.__enter__.return_value.iter_content.return_value = [pdf[:8], pdf[8:]]
+    mock_session.get.side_effect = lambda url, **kw: pdf_response if url.endswith(".pdf") else feed_response
+
+    mock_fitz = MagicMock()
+    mock_fitz.open.return_value = _make_mock_doc(REF_TEXT)
+
+    with patch("app.config.ARXIV_PDF_CACHE_DIR", str(tmp_path)), \
+            patch("workers.citation_worker.arxiv_pdf_volume") as mock_volume:
+        with patch.dict(sys.modules, {
+            "feedparser": mock_feedparser,
+            "requests": mock_requests,
+            "fitz": mock_fitz,
+        }):
+            get_citations("2301.00001")
+
+    assert [p.name for p in tmp_path.iterdir()] == ["2301.00001.pdf"]
+    assert (tmp_path / "2301.00001.pdf").read_bytes() == pdf
+    mock_volume.commit.assert_called_once()
+    mock_fitz.open.assert_called_once_with(str(tmp_path / "2301.00001.pdf"))
+
+
+def test_get_citations_does_not_cache_incomplete_download(tmp_path):
+    partial = b"%PDF-1.4 no trailer"
+
+    mock_feedparser = MagicMock()
+    mock_feedparser.parse.return_value = MagicMock(entries=[_make_feed_entry()])
+
+    mock_requests = MagicMock()
+    mock_session = mock_requests.Session.return_value
+    feed_response = MagicMock(content=b"<feed/>")
+    pdf_response = MagicMock()
+    pdf_response.__enter__.return_value.iter_content.return_value = [partial]
+    mock_session.get.side_effect = lambda url, **kw: pdf_response if url.endswith(".pdf") else feed_response
+
+    mock_fitz = MagicMock()
+    mock_fitz.open.return_value = _make_mock_doc(REF_TEXT)
+
+    with patch("app.config.ARXIV_PDF_CACHE_DIR", str(tmp_path)), \
+            patch("workers.citation_worker.arxiv_pdf_volume") as mock_volume:
+        with patch.dict(sys.modules, {
+            "feedparser": mock_feedparser,
+            "requests": mock_requests,
+            "fitz": mock_fitz,
+        }):
+            get_citations("2301.00001")
+
+    assert list(tmp_path.iterdir()) == []
+    mock_volume.commit.assert_not_called()
+    mock_fitz.open.assert_called_once_with(stream=partial, filetype="pdf")
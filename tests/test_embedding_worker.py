@@ -4,6 +4,8 @@ Tests for workers/embedding_worker.py
 
 import importlib
 import sys
+import types
+import numpy as np
 import pytest
 from unittest.mock import MagicMock, patch
 
@@ -67,14 +69,11 @@ def test_run_embedding_batch_with_one_paper():
         # DESC TABLE for _fetch_unembedded_from_silver
         [("ID",), ("TITLE",), ("CONCLUSION",), ("ABSTRACT",), ("EMBEDDING",), ("SIMILAR_EMBEDDINGS_IDS",)],
         # data rows
-        [(1, "Test Title", "Test Conclusion", "Test Abstract")],
+        [(1, "Test Title", "Test Abstract")],
         # DESC TABLE for _update_embeddings
         [("ID",), ("EMBEDDING",)],
-        # DESC TABLE for _count_embedded_papers
-        [("EMBEDDING",)],
     ]
-    mock_cursor.fetchone.return_value = (5,)
-    mock_cursor.description = [("id",), ("title",), ("conclusion",), ("abstract",)]
+    mock_cursor.description = [("id",), ("title",), ("abstract",)]
     mock_cursor.execute.return_value = None
     mock_cursor.executemany.return_value = None
 
@@ -82,11 +81,8 @@ def test_run_embedding_batch_with_one_paper():
     mock_conn.cursor.return_value = mock_cursor
     mock_conn.commit.return_value = None
 
-    mock_vec = MagicMock()
-    mock_vec.tolist.return_value = [0.1] * 384
-
     mock_model = MagicMock()
-    mock_model.encode.return_value = [mock_vec]
+    mock_model.encode.return_value = np.full((1, 384), 0.1, dtype=np.float32)
 
     mock_st = MagicMock()
     mock_st.SentenceTransformer.return_value = mock_model
@@ -102,6 +98,11 @@ def test_run_embedding_batch_with_one_paper():
 
     assert result["status"] == "ok"
     assert result["embedded"] == 1
+    select_sql = mock_cursor.execute.call_args_list[1].args[0]
+    assert "AS conclusion" not in select_sql
+    assert "SUBSTR(" in select_sql
+    # populate_similar=False never needs the corpus size
+    assert not any("COUNT(*)" in c.args[0] for c in mock_cursor.execute.call_args_list)
 
 
 # ---------------------------------------------------------------------------
@@ -155,16 +156,24 @@ def test_backfill_similar_ids_no_rows():
     assert result["backfilled"] == 0
 
 
+def _fake_ann_index(neighbor_rows):
+    index = MagicMock(spec=["search"])
+    index.search.return_value = (
+        np.zeros((len(neighbor_rows), len(neighbor_rows[0])), dtype=np.float32),
+        np.asarray(neighbor_rows, dtype=np.int64),
+    )
+    return index
+
+
 def test_backfill_similar_ids_with_rows():
     from workers.embedding_worker import backfill_similar_ids
     mock_cursor = MagicMock()
     mock_cursor.fetchall.side_effect = [
         [("ID",), ("EMBEDDING",), ("SIMILAR_EMBEDDINGS_IDS",)],  # DESC TABLE
         [(1,), (2,)],   # two papers missing cache
-        [("ID",), ("EMBEDDING",)],  # DESC TABLE for _compute_topk (paper 1)
-        [(3,), (4,)],   # top-k results for paper 1
-        [("ID",), ("EMBEDDING",)],  # DESC TABLE for _compute_topk (paper 2)
-        [(5,), (6,)],   # top-k results for paper 2
+        [("ID",), ("EMBEDDING",)],  # DESC TABLE for _fetch_corpus_embeddings
+        [(1, [1.0, 0.0]), (2, [0.0, 1.0]), (3, [0.7, 0.7])],  # corpus embeddings
+        [("ID",), ("SIMILAR_EMBEDDINGS_IDS",)],  # DESC TABLE for _write_similar_ids_bulk
     ]
     mock_cursor.execute.return_value = None
     mock_conn = MagicMock()
@@ -172,10 +181,67 @@ def test_backfill_similar_ids_with_rows():
     mock_conn.commit.return_value = None
 
     with patch("workers.embedding_worker.connect_to_snowflake", return_value=mock_conn):
-        result = backfill_similar_ids(limit=10)
+        with patch("workers.embedding_worker._SQL_TOPK_MAX_BATCH", 0):
+            result = backfill_similar_ids(limit=10, k=2)
 
     assert result["status"] == "ok"
     assert result["backfilled"] == 2
+    merges = [c.args for c in mock_cursor.execute.call_args_list if "MERGE INTO" in c.args[0]]
+    assert len(merges) == 1
+    assert merges[0][1] == [1, "[3, 2]", 2, "[3, 1]"]
+
+
+def test_search_ann_topk_drops_self_and_unknown_ids():
+    from workers.embedding_worker import _search_ann_topk
+
+    mat = np.eye(3, dtype=np.float32)
+    index = _fake_ann_index([[1, 0, 2]])
+    result = _search_ann_topk(index, [10, 20, 30], mat, [20, 99], k=2)
+
+    assert result == {20: [10, 30]}
+    queried = index.search.call_args.args[0]
+    assert queried.shape == (1, 3)
+
+
+def test_compute_topk_batch_in_snowflake_groups_by_source():
+    from workers.embedding_worker import _compute_topk_batch_in_snowflake
+
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.side_effect = [
+        [("ID",), ("EMBEDDING",)],
+        [(1, 5, 1), (1, 6, 2), (2, 7, 1)],
+    ]
+    result = _compute_topk_batch_in_snowflake(mock_cursor, database="DB", pids=[1, 2], k=2)
+
+    assert result == {1: [5, 6], 2: [7]}
+    sql, params = mock_cursor.execute.call_args.args
+    assert "QUALIFY" in sql
+    assert params == [1, 2, 2]
+
+
+def test_topk_numpy_orders_by_cosine():
+    from workers.embedding_worker import _topk_numpy
+
+    corpus = np.asarray([[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]], dtype=np.float32)
+    query = np.asarray([[0.8, 0.6], [0.0, 1.0]], dtype=np.float32)
+
+    assert _topk_numpy(query, corpus, [10, 20, 30], k=2) == [[30, 10], [20, 30]]
+    assert _topk_numpy(query, corpus, [10, 20, 30], k=5) == [[30, 10, 20], [20, 30, 10]]
+
+
+def test_compute_neighbors_uses_ann_index_for_large_corpus():
+    from workers.embedding_worker import _compute_neighbors
+
+    mat = np.eye(3, dtype=np.float32)
+    index = _fake_ann_index([[0, 2, 1]])
+
+    with patch("workers.embedding_worker._EXACT_TOPK_MAX_CORPUS", 1):
+        with patch("workers.embedding_worker._load_or_build_ann_index", return_value=index):
+            with patch("importlib.import_module", return_value=MagicMock()):
+                result = _compute_neighbors([10, 20, 30], mat, [10], k=2)
+
+    assert result == {10: [30, 20]}
+    index.search.assert_called_once()
 
 
 def test_run_embedding_batch_with_populate_similar():
@@ -183,15 +249,15 @@ def test_run_embedding_batch_with_populate_similar():
     mock_cursor = MagicMock()
     mock_cursor.fetchall.side_effect = [
         [("ID",), ("TITLE",), ("CONCLUSION",), ("ABSTRACT",), ("EMBEDDING",), ("SIMILAR_EMBEDDINGS_IDS",)],
-        [(1, "Test Title", "Test Conclusion", "Test Abstract")],
+        [(1, "Test Title", "Test Abstract")],
         [("ID",), ("EMBEDDING",)],   # DESC TABLE for _update_embeddings
         [("EMBEDDING",)],            # DESC TABLE for _count_embedded_papers
-        [("ID",), ("EMBEDDING",)],   # DESC TABLE for _compute_topk
-        [(2,), (3,)],                # top-k results
-        [("ID",), ("SIMILAR_EMBEDDINGS_IDS",)],  # DESC TABLE for _write_similar_ids
+        [("ID",), ("EMBEDDING",)],   # DESC TABLE for _compute_topk_batch_in_snowflake
+        [(1, 2, 1), (1, 3, 2)],      # (source, neighbor, rank) rows
+        [("ID",), ("SIMILAR_EMBEDDINGS_IDS",)],  # DESC TABLE for _write_similar_ids_bulk
     ]
     mock_cursor.fetchone.return_value = (10,)  # count >= min_corpus_size
-    mock_cursor.description = [("id",), ("title",), ("conclusion",), ("abstract",)]
+    mock_cursor.description = [("id",), ("title",), ("abstract",)]
     mock_cursor.execute.return_value = None
     mock_cursor.executemany.return_value = None
 
@@ -199,17 +265,17 @@ def test_run_embedding_batch_with_populate_similar():
     mock_conn.cursor.return_value = mock_cursor
     mock_conn.commit.return_value = None
 
-    mock_vec = MagicMock()
-    mock_vec.tolist.return_value = [0.1] * 384
     mock_model = MagicMock()
-    mock_model.encode.return_value = [mock_vec]
+    mock_model.encode.return_value = np.full((1, 384), 0.1, dtype=np.float32)
     mock_st = MagicMock()
     mock_st.SentenceTransformer.return_value = mock_model
 
-    def fake_import(name):
+    real_import_module = importlib.import_module
+
+    def fake_import(name, *args, **kwargs):
         if name == "sentence_transformers":
             return mock_st
-        return importlib.import_module(name)
+        return real_import_module(name, *args, **kwargs)
 
     with patch("workers.embedding_worker.connect_to_snowflake", return_value=mock_conn):
         with patch("importlib.import_module", side_effect=fake_import):
@@ -217,6 +283,100 @@ def test_run_embedding_batch_with_populate_similar():
 
     assert result["status"] == "ok"
     assert result["neighbors_populated"] is True
+    merges = [c.args for c in mock_cursor.execute.call_args_list if "MERGE INTO" in c.args[0]]
+    assert merges[-1][1] == [1, "[2, 3]"]
+
+
+def test_run_embedding_batch_skips_ann_rebuild_below_exact_threshold(tmp_path):
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.side_effect = [
+        [("ID",), ("TITLE",), ("CONCLUSION",), ("ABSTRACT",), ("EMBEDDING",)],
+        [(1, "Test Title", "Test Abstract")],
+        [("ID",), ("EMBEDDING",)],   # DESC TABLE for _update_embeddings
+        [("EMBEDDING",)],            # DESC TABLE for _count_embedded_papers
+        [("ID",), ("EMBEDDING",)],   # DESC TABLE for _compute_topk_batch_in_snowflake
+        [(1, 2, 1)],                 # (source, neighbor, rank) rows
+    ]
+    mock_cursor.fetchone.return_value = (2,)
+    mock_cursor.description = [("id",), ("title",), ("abstract",)]
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+
+    mock_model = MagicMock()
+    mock_model.encode.return_value = np.full((1, 384), 0.1, dtype=np.float32)
+    mock_st = MagicMock()
+    mock_st.SentenceTransformer.return_value = mock_model
+    real_import_module = importlib.import_module
+
+    def fake_import(name, *args, **kwargs):
+        if name == "sentence_transformers":
+            return mock_st
+        if name == "faiss":
+            return MagicMock()
+        return real_import_module(name, *args, **kwargs)
+
+    with patch("workers.embedding_worker.connect_to_snowflake", return_value=mock_conn), \
+            patch("importlib.import_module", side_effect=fake_import), \
+            patch("app.config.ANN_INDEX_DIR", str(tmp_path)), \
+            patch("workers.embedding_worker._ann_index_persistable", return_value=True), \
+            patch("workers.embedding_worker._fetch_corpus_embeddings") as fetch_corpus, \
+            patch("workers.embedding_worker._load_or_build_ann_index") as build, \
+            patch("workers.embedding_worker._write_similar_ids_bulk") as write_similar:
+        result = run_embedding_batch(limit=1, populate_similar=True)
+
+    # No index yet and a two-paper corpus: nothing to build, and the one-paper
+    # batch still gets its neighbors from the in-warehouse query
+    fetch_corpus.assert_not_called()
+    build.assert_not_called()
+    assert write_similar.call_args.kwargs["neighbors"] == {1: [2]}
+    assert result["neighbors_populated"] is True
+
+
+def test_refresh_ann_index_appends_new_vectors_to_existing_index(tmp_path):
+    from workers.embedding_worker import _refresh_ann_index
+
+    np.save(tmp_path / "MINDMAP_A_silver_papers_hnsw_ids.npy", np.asarray([1, 2], dtype=np.int64))
+    (tmp_path / "MINDMAP_A_silver_papers_hnsw_sq8.faiss").write_bytes(b"index")
+    fake_faiss = MagicMock()
+    new_vecs = np.eye(2, 384, dtype=np.float32)
+
+    with patch("app.config.ANN_INDEX_DIR", str(tmp_path)), \
+            patch("workers.embedding_worker.ann_index_volume") as volume, \
+            patch("workers.embedding_worker._fetch_corpus_embeddings") as fetch_corpus, \
+            patch("importlib.import_module", return_value=fake_faiss):
+        corpus = _refresh_ann_index(MagicMock(), database="MINDMAP_A", new_ids=[3, 4], new_vecs=new_vecs)
+
+    assert corpus is None
+    fetch_corpus.assert_not_called()
+    index = fake_faiss.read_index.return_value
+    np.testing.assert_array_equal(index.add.call_args.args[0], new_vecs)
+    fake_faiss.write_index.assert_called_once_with(
+        index, str(tmp_path / "MINDMAP_A_silver_papers_hnsw_sq8.faiss")
+    )
+    assert np.load(tmp_path / "MINDMAP_A_silver_papers_hnsw_ids.npy").tolist() == [1, 2, 3, 4]
+    volume.commit.assert_called_once()
+
+
+def test_load_or_build_ann_index_keeps_databases_apart(tmp_path):
+    from workers.embedding_worker import _load_or_build_ann_index
+
+    fake_faiss = MagicMock()
+    fake_faiss.write_index.side_effect = lambda index, path: open(path, "wb").write(b"index")
+
+    with patch("app.config.ANN_INDEX_DIR", str(tmp_path)), \
+            patch("workers.embedding_worker.ann_index_volume"), \
+            patch("workers.embedding_worker._build_ann_index", side_effect=["index_a", "index_b"]), \
+            patch("importlib.import_module", return_value=fake_faiss):
+        _load_or_build_ann_index([1, 2], np.eye(2, dtype=np.float32), database="MINDMAP_A")
+        _load_or_build_ann_index([5, 6, 7], np.eye(3, dtype=np.float32), database="MINDMAP_B")
+
+    assert np.load(tmp_path / "MINDMAP_A_silver_papers_hnsw_ids.npy").tolist() == [1, 2]
+    assert np.load(tmp_path / "MINDMAP_B_silver_papers_hnsw_ids.npy").tolist() == [5, 6, 7]
+    written = [c.args for c in fake_faiss.write_index.call_args_list]
+    assert written == [
+        ("index_a", str(tmp_path / "MINDMAP_A_silver_papers_hnsw_sq8.faiss")),
+        ("index_b", str(tmp_path / "MINDMAP_B_silver_papers_hnsw_sq8.faiss")),
+    ]
 
 
 # ---------------------------------------------------------------------------
@@ -248,9 +408,9 @@ def test_run_embedding_batch_all_empty_text():
     mock_cursor = MagicMock()
     mock_cursor.fetchall.side_effect = [
         [("ID",), ("TITLE",), ("CONCLUSION",), ("ABSTRACT",), ("EMBEDDING",)],
-        [(1, "", "", "")],  # row with no usable text
+        [(1, "", "")],  # row with no usable text
     ]
-    mock_cursor.description = [("id",), ("title",), ("conclusion",), ("abstract",)]
+    mock_cursor.description = [("id",), ("title",), ("abstract",)]
     mock_cursor.execute.return_value = None
 
     mock_conn = MagicMock()
@@ -306,10 +466,8 @@ def test_run_chunk_embedding_batch_with_one_chunk():
     mock_conn.cursor.return_value = mock_cursor
     mock_conn.commit.return_value = None
 
-    mock_vec = MagicMock()
-    mock_vec.tolist.return_value = [0.2] * 384
     mock_model = MagicMock()
-    mock_model.encode.return_value = [mock_vec]
+    mock_model.encode.return_value = np.full((1, 384), 0.2, dtype=np.float32)
     mock_st = MagicMock()
     mock_st.SentenceTransformer.return_value = mock_model
 
@@ -328,3 +486,370 @@ def test_update_chunk_embeddings_empty_rows():
     _update_chunk_embeddings(mock_cursor, database="DB", rows=[])
 
     mock_cursor.executemany.assert_not_called()
+    mock_cursor.execute.assert_not_called()
+
+
+def test_update_chunk_embeddings_merges_in_chunks():
+    from workers.embedding_worker import _update_chunk_embeddings
+    from app.config import MERGE_CHUNK_SIZE
+
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = [("CHUNK_ID",), ("EMBEDDING",)]
+    rows = [(i, [0.1] * 384) for i in range(MERGE_CHUNK_SIZE + 1)]
+    _update_chunk_embeddings(mock_cursor, database="DB", rows=rows)
+
+    merges = [c for c in mock_cursor.execute.call_args_list if "MERGE INTO" in c[0][0]]
+    assert len(merges) == 2
+    assert len(merges[0][0][1]) == 2 * MERGE_CHUNK_SIZE
+    assert merges[1][0][1][0] == MERGE_CHUNK_SIZE
+    mock_cursor.executemany.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# int8 quantized embeddings
+# ---------------------------------------------------------------------------
+
+def test_quantize_int8_round_trip():
+    from workers.embedding_worker import _quantize_int8, _dequantize_int8
+
+    vec = np.asarray([0.5, -0.25, 0.0, 0.125], dtype=np.float32)
+    raw, scale = _quantize_int8(vec)
+
+    assert len(raw) == 4
+    assert scale == pytest.approx(0.5 / 127)
+    assert np.allclose(_dequantize_int8(raw, scale), vec, atol=scale)
+
+
+def test_quantize_int8_zero_vector():
+    from workers.embedding_worker import _quantize_int8
+
+    raw, scale = _quantize_int8([0.0, 0.0])
+    assert raw == b"\x00\x00"
+    assert scale == 0.0
+
+
+def test_vector_json_matches_for_lists_and_ndarray_rows():
+    from workers.embedding_worker import _vector_json
+
+    row = np.asarray([0.5, -0.25], dtype=np.float32)
+    assert _vector_json(row) == _vector_json([0.5, -0.25]) == "[0.5, -0.25]"
+
+
+def test_update_embeddings_writes_int8_when_columns_exist():
+    from workers.embedding_worker import _update_embeddings
+
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = [("ID",), ("EMBEDDING",), ("EMBEDDING_I8",), ("EMBEDDING_SCALE",)]
+    _update_embeddings(mock_cursor, database="DB", rows=[(7, [1.0, -1.0])])
+
+    sql, params = mock_cursor.execute.call_args.args
+    assert '"EMBEDDING_I8"' in sql
+    assert params == [7, "[1.0, -1.0]", bytes([127, 129]), pytest.approx(1.0 / 127)]
+    mock_cursor.executemany.assert_not_called()
+
+
+def test_update_embeddings_merges_in_chunks():
+    from workers.embedding_worker import _update_embeddings
+    from app.config import MERGE_CHUNK_SIZE
+
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = [("ID",), ("EMBEDDING",)]
+    rows = [(i, [0.1, 0.2]) for i in range(MERGE_CHUNK_SIZE + 1)]
+    _update_embeddings(mock_cursor, database="DB", rows=rows)
+
+    merges = [c.args for c in mock_cursor.execute.call_args_list if "MERGE INTO" in c.args[0]]
+    assert len(merges) == 2
+    assert len(merges[0][1]) == 2 * MERGE_CHUNK_SIZE
+    assert merges[1][1] == [MERGE_CHUNK_SIZE, "[0.1, 0.2]"]
+
+
+def test_fetch_corpus_embeddings_prefers_int8_copy():
+    from workers.embedding_worker import _fetch_corpus_embeddings
+
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.side_effect = [
+        [("ID",), ("EMBEDDING",), ("EMBEDDING_I8",), ("EMBEDDING_SCALE",)],
+        [
+            (1, bytes([127, 0]), 1.0 / 127, None),  # quantized row
+            (2, None, None, "[0.0, 2.0]"),          # legacy FP32-only row
+        ],
+    ]
+
+    ids, mat = _fetch_corpus_embeddings(mock_cursor, database="DB")
+
+    assert ids == [1, 2]
+    assert mat.dtype == np.float32
+    assert np.allclose(mat, [[1.0, 0.0], [0.0, 1.0]])
+
+
+# ---------------------------------------------------------------------------
+# Embedder — model loaded once per container
+# ---------------------------------------------------------------------------
+
+def test_embedder_reuses_loaded_model_across_calls():
+    import modal
+    import workers.embedding_worker as ew
+
+    old_method = modal.method
+    old_enter = modal.enter
+    old_exit = modal.exit
+    modal.method = lambda *args, **kwargs: (lambda fn: fn)
+    modal.enter = lambda *args, **kwargs: (lambda fn: fn)
+    modal.exit = lambda *args, **kwargs: (lambda fn: fn)
+
+    try:
+        ew = importlib.reload(ew)
+
+        mock_st = MagicMock()
+        mock_st.cuda.is_available.return_value = False  # doubles as the torch module
+        with patch("importlib.import_module", return_value=mock_st):
+            embedder = ew.Embedder()
+            embedder.model_name = "test-model"
+            embedder.load_model()
+
+        mock_conn = MagicMock()
+        mock_conn.is_closed.return_value = False
+        with patch.object(ew, "connect_to_snowflake", return_value=mock_conn) as mock_connect:
+            embedder.open_connection()
+            with patch.object(ew, "_embed_chunk_batch", return_value={"status": "ok"}) as mock_batch:
+                embedder.run_chunk_embedding_batch(limit=5)
+                embedder.run_chunk_embedding_batch(limit=5)
+            embedder.close_connection()
+
+        mock_st.SentenceTransformer.assert_called_once_with("test-model", device="cpu")
+        load_model = mock_batch.call_args.args[0]
+        assert load_model() is mock_st.SentenceTransformer.return_value
+        mock_connect.assert_called_once()
+        assert mock_batch.call_args.kwargs["conn"] is mock_conn
+        mock_conn.close.assert_called_once()
+    finally:
+        modal.method = old_method
+        modal.enter = old_enter
+        modal.exit = old_exit
+        importlib.reload(ew)
+
+
+def test_snowflake_cursor_leaves_shared_connection_open():
+    from workers.embedding_worker import _snowflake_cursor
+
+    shared = MagicMock()
+    with patch("workers.embedding_worker.connect_to_snowflake") as mock_connect:
+        with _snowflake_cursor(shared) as (conn, cur):
+            assert conn is shared
+        with pytest.raises(ValueError):
+            with _snowflake_cursor(shared):
+                raise ValueError("boom")
+
+    mock_connect.assert_not_called()
+    shared.close.assert_not_called()
+    shared.rollback.assert_called_once()
+    assert shared.cursor.return_value.close.call_count == 2
+
+
+def test_enable_fp16_keeps_half_when_outputs_stay_normalized():
+    from workers.embedding_worker import _enable_fp16
+
+    model = MagicMock()
+    model.encode.return_value = np.asarray([[0.6, 0.8]], dtype=np.float16)
+
+    assert _enable_fp16(model) is model
+    model.half.assert_called_once()
+    model.float.assert_not_called()
+
+
+def test_enable_fp16_reverts_when_outputs_are_not_finite():
+    from workers.embedding_worker import _enable_fp16
+
+    model = MagicMock()
+    model.encode.return_value = np.asarray([[np.nan, 0.0]], dtype=np.float16)
+
+    _enable_fp16(model)
+    model.float.assert_called_once()
+
+
+@pytest.fixture
+def int8_probe_cache():
+    from workers import embedding_worker
+
+    embedding_worker._int8_probe_passed.clear()
+    yield embedding_worker._int8_probe_passed
+    embedding_worker._int8_probe_passed.clear()
+
+
+def _int8_model_and_torch(*encode_outputs):
+    model = MagicMock()
+    model.device = "cpu"
+    model.encode.side_effect = list(encode_outputs)
+    transformer = model._first_module.return_value
+    fp32_module = transformer.auto_model
+    fake_torch = MagicMock()
+
+    def fake_import_module(name):
+        if name == "torch":
+            return fake_torch
+        return importlib.import_module(name)
+
+    return model, transformer, fp32_module, fake_torch, fake_import_module
+
+
+def test_enable_int8_dynamic_keeps_quantized_model_within_tolerance(int8_probe_cache, capsys):
+    from workers.embedding_worker import _enable_int8_dynamic
+
+    vecs = np.asarray([[0.6, 0.8], [1.0, 0.0]], dtype=np.float32)
+    model, transformer, fp32_module, fake_torch, fake_import = _int8_model_and_torch(vecs, vecs)
+
+    with patch("importlib.import_module", side_effect=fake_import):
+        assert _enable_int8_dynamic(model, "m") is model
+
+    fake_torch.quantization.quantize_dynamic.assert_called_once()
+    assert transformer.auto_model is fake_torch.quantization.quantize_dynamic.return_value
+    assert "min cosine vs FP32 = 1.000000" in capsys.readouterr().out
+    assert int8_probe_cache == {"m": True}
+
+
+def test_enable_int8_dynamic_reverts_when_drift_exceeds_1e_3(int8_probe_cache, capsys):
+    from workers.embedding_worker import _enable_int8_dynamic
+
+    fp32 = np.asarray([[1.0, 0.0]], dtype=np.float32)
+    # cosine 0.998: within the old 0.99 bar, outside the 1e-3 drift budget
+    drifted = np.asarray([[0.998, np.sqrt(1 - 0.998 ** 2)]], dtype=np.float32)
+    model, transformer, fp32_module, _, fake_import = _int8_model_and_torch(fp32, drifted)
+
+    with patch("importlib.import_module", side_effect=fake_import):
+        _enable_int8_dynamic(model, "m")
+
+    assert transformer.auto_model is fp32_module
+    assert "min cosine vs FP32 = 0.998000" in capsys.readouterr().out
+    assert int8_probe_cache == {"m": False}
+
+
+def test_enable_int8_dynamic_probes_once_per_container(int8_probe_cache):
+    from workers.embedding_worker import _enable_int8_dynamic
+
+    vecs = np.asarray([[1.0, 0.0]], dtype=np.float32)
+    first, _, _, fake_torch, fake_import = _int8_model_and_torch(vecs, vecs)
+    second, second_transformer, _, _, _ = _int8_model_and_torch()
+
+    with patch("importlib.import_module", side_effect=fake_import):
+        _enable_int8_dynamic(first, "m")
+        _enable_int8_dynamic(second, "m")
+
+    second.encode.assert_not_called()
+    assert fake_torch.quantization.quantize_dynamic.call_count == 2
+    assert second_transformer.auto_model is fake_torch.quantization.quantize_dynamic.return_value
+
+    # A failed probe is remembered too: later loads stay FP32 without probing
+    int8_probe_cache["m"] = False
+    third, third_transformer, third_fp32, _, _ = _int8_model_and_torch()
+    with patch("importlib.import_module", side_effect=fake_import):
+        _enable_int8_dynamic(third, "m")
+    third.encode.assert_not_called()
+    assert third_transformer.auto_model is third_fp32
+
+
+class _TinyCpuEncoder:
+    """Picklable stand-in for a SentenceTransformer: one transformer module on CPU."""
+
+    device = "cpu"
+
+    def __init__(self, torch):
+        torch.manual_seed(0)
+        self.module = type("Transformer", (), {})()
+        self.module.auto_model = torch.nn.Sequential(
+            torch.nn.Linear(16, 64), torch.nn.ReLU(), torch.nn.Linear(64, 8)
+        ).eval()
+        self.inputs = torch.randn(3, 16)
+
+    def _first_module(self):
+        return self.module
+
+    def encode(self, texts, normalize_embeddings=True):
+        import torch
+
+        with torch.no_grad():
+            out = self.module.auto_model(self.inputs[: len(texts)])
+        return torch.nn.functional.normalize(out, dim=1).numpy()
+
+
+def test_int8_quantized_model_survives_spawn_pool_pickling(int8_probe_cache):
+    """
+    start_multi_process_pool hands the model to each spawned worker by pickling it;
+    the quantized Linear layers must round-trip and encode identically there.
+    """
+    torch = pytest.importorskip("torch")
+    if not isinstance(torch, types.ModuleType):
+        pytest.skip("torch is mocked in this session")
+    from multiprocessing.reduction import ForkingPickler
+    import pickle
+    from workers.embedding_worker import _enable_int8_dynamic
+
+    model = _TinyCpuEncoder(torch)
+    with patch("workers.embedding_worker._INT8_MIN_PROBE_COSINE", -1.0):
+        _enable_int8_dynamic(model, "tiny")
+    assert int8_probe_cache == {"tiny": True}
+    assert not isinstance(model.module.auto_model[0], torch.nn.Linear)
+
+    restored = pickle.loads(bytes(ForkingPickler.dumps(model)))
+
+    assert not isinstance(restored.module.auto_model[0], torch.nn.Linear)
+    assert np.allclose(restored.encode(["a", "b", "c"]), model.encode(["a", "b", "c"]))
+
+
+def test_encode_normalized_sends_quantized_model_to_process_pool(int8_probe_cache):
+    from workers.embedding_worker import _enable_int8_dynamic, _encode_normalized, _MULTI_PROCESS_MIN_TEXTS
+
+    vecs = np.asarray([[1.0, 0.0]], dtype=np.float32)
+    model, transformer, _, fake_torch, fake_import = _int8_model_and_torch(vecs, vecs)
+    model.encode_multi_process.return_value = np.full((_MULTI_PROCESS_MIN_TEXTS, 2), 1.0)
+
+    with patch("importlib.import_module", side_effect=fake_import):
+        _enable_int8_dynamic(model, "m")
+    with patch("workers.embedding_worker.os.cpu_count", return_value=8):
+        _encode_normalized(model, [f"text {i}" for i in range(_MULTI_PROCESS_MIN_TEXTS)])
+
+    # The pool is started from the model whose transformer now holds the int8 module
+    model.start_multi_process_pool.assert_called_once()
+    assert transformer.auto_model is fake_torch.quantization.quantize_dynamic.return_value
+
+
+def test_encode_normalized_uses_process_pool_for_large_cpu_batches():
+    from workers.embedding_worker import _encode_normalized, _MULTI_PROCESS_MIN_TEXTS
+
+    model = MagicMock()
+    model.device = "cpu"
+    model.encode_multi_process.return_value = np.full((_MULTI_PROCESS_MIN_TEXTS, 4), 2.0)
+    texts = [f"text {i}" for i in range(_MULTI_PROCESS_MIN_TEXTS)]
+
+    with patch("workers.embedding_worker.os.cpu_count", return_value=8):
+        vectors = _encode_normalized(model, texts)
+
+    model.start_multi_process_pool.assert_called_once_with(["cpu"] * 4)
+    model.stop_multi_process_pool.assert_called_once_with(model.start_multi_process_pool.return_value)
+    model.encode.assert_not_called()
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+
+
+def test_encode_normalized_encodes_in_process_on_gpu():
+    from workers.embedding_worker import _encode_normalized, _MULTI_PROCESS_MIN_TEXTS
+
+    model = MagicMock()
+    model.device = "cuda:0"
+
+    with patch("workers.embedding_worker.os.cpu_count", return_value=8):
+        _encode_normalized(model, [f"text {i}" for i in range(_MULTI_PROCESS_MIN_TEXTS)])
+
+    model.start_multi_process_pool.assert_not_called()
+    model.encode.assert_called_once()
+
+
+def test_encode_normalized_encodes_duplicate_texts_once():
+    from workers.embedding_worker import _encode_normalized
+
+    model = MagicMock()
+    model.device = "cuda:0"
+    model.encode.return_value = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+
+    vectors = _encode_normalized(model, ["a", "b", "a"])
+
+    assert model.encode.call_args.args[0] == ["a", "b"]
+    assert vectors.tolist() == [[1.0, 0.0], [0.0, 1.0], [1.0, 0.0]]
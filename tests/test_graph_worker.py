@@ -35,7 +35,8 @@ from workers.graph_worker import (  # noqa: E402
     _normalize_json_list,
     _normalize_ids,
     _dedupe_edges,
-    _fetch_papers,
+    _execute_papers_query,
+    _iter_paper_batches,
     _require_columns,
     build_knowledge_graph,
     run_topic_clustering,
@@ -76,35 +77,51 @@ def test_require_columns_raises():
         _require_columns({"id": '"ID"'}, ["id", "missing"], "SILVER")
 
 
-def test_fetch_papers_with_specific_paper_id():
+def test_iter_paper_batches_with_specific_paper_id():
     mock_cursor = MagicMock()
-    mock_cursor.fetchall.side_effect = [
-        [("ID",), ("CITATION_LIST",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",)],
-        [(1, "[]", "[]", "Conclusion")],
-    ]
+    mock_cursor.fetchall.return_value = [("ID",), ("CITATION_LIST",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",)]
+    mock_cursor.fetchmany.side_effect = [[(1, "[]", "[]", "Conclusion")], []]
 
-    result = _fetch_papers(mock_cursor, paper_id=1)
+    result = list(_iter_paper_batches(mock_cursor, paper_id=1))
 
-    assert result == [(1, "[]", "[]", "Conclusion")]
+    assert result == [[(1, "[]", "[]", "Conclusion")]]
+    assert mock_cursor.execute.call_args.args[1] == (1,)
 
 
-def test_fetch_papers_raises_when_no_citation_columns():
+def test_execute_papers_query_raises_when_no_citation_columns():
     mock_cursor = MagicMock()
     mock_cursor.fetchall.return_value = [
         ("ID",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",),
     ]
     with pytest.raises(RuntimeError, match="Missing required citation source columns"):
-        _fetch_papers(mock_cursor, paper_id=None)
+        _execute_papers_query(mock_cursor, paper_id=None)
 
 
-def test_fetch_papers_prefers_reference_list_when_both_present():
+def test_execute_papers_query_prefers_reference_list_when_both_present():
     mock_cursor = MagicMock()
-    mock_cursor.fetchall.side_effect = [
-        [("ID",), ("REFERENCE_LIST",), ("CITATION_LIST",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",)],
-        [(2, "[]", "[3]", "Conclusion")],
+    mock_cursor.fetchall.return_value = [
+        ("ID",), ("REFERENCE_LIST",), ("CITATION_LIST",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",),
     ]
-    result = _fetch_papers(mock_cursor, paper_id=None)
-    assert result == [(2, "[]", "[3]", "Conclusion")]
+    _execute_papers_query(mock_cursor, paper_id=None)
+    assert 'COALESCE("REFERENCE_LIST", "CITATION_LIST")' in mock_cursor.execute.call_args.args[0]
+
+
+def test_iter_paper_batches_streams_until_exhausted():
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = [
+        ("ID",), ("CITATION_LIST",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",),
+    ]
+    mock_cursor.fetchmany.side_effect = [
+        [(1, "[]", "[]", "a"), (2, "[]", "[]", "b")],
+        [(3, "[]", "[]", "c")],
+        [],
+    ]
+
+    batches = list(_iter_paper_batches(mock_cursor, paper_id=None, batch_size=2))
+
+    assert [len(b) for b in batches] == [2, 1]
+    assert mock_cursor.arraysize == 2
+    mock_cursor.fetchmany.assert_called_with(2)
 
 
 # ---------------------------------------------------------------------------
@@ -138,11 +155,13 @@ def test_build_knowledge_graph_empty():
         [("SOURCE_PAPER_ID",), ("TARGET_PAPER_ID",), ("RELATIONSHIP_TYPE",), ("STRENGTH",), ("REASON",)],
         # existing edges SELECT
         [],
-        # DESC TABLE SILVER_PAPERS for _fetch_papers
+        # DESC TABLE SILVER_PAPERS for the conclusion lookups
+        [("ID",), ("CONCLUSION",)],
+        # DESC TABLE SILVER_PAPERS for the papers query
         [("ID",), ("CITATION_LIST",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",)],
-        # papers SELECT — no papers
-        [],
     ]
+    # papers SELECT — no papers
+    mock_cursor.fetchmany.side_effect = [[]]
     mock_cursor.execute.return_value = None
 
     mock_conn = MagicMock()
@@ -180,54 +199,73 @@ def test_run_topic_clustering_no_embeddings():
 
 
 # ---------------------------------------------------------------------------
-# _citation_targets — with ss_ids
+# _citation_targets_bulk
 # ---------------------------------------------------------------------------
 
-def test_citation_targets_with_ss_ids():
-    from workers.graph_worker import _citation_targets
+def test_citation_targets_bulk_with_ss_ids():
+    from workers.graph_worker import _citation_targets_bulk
     mock_cursor = MagicMock()
     mock_cursor.fetchall.side_effect = [
         [("ID",), ("SS_ID",)],  # DESC TABLE SILVER_PAPERS
-        [(42,), (43,)],         # matching paper ids
+        [(1, 42), (1, 43)],     # (source, matching paper id) pairs
     ]
     citations = [{"ss_paper_id": "abc123"}, {"ss_paper_id": "def456"}]
-    result = _citation_targets(mock_cursor, citations)
-    assert result == [42, 43]
+    result = _citation_targets_bulk(mock_cursor, {1: citations})
+    assert result == {1: [42, 43]}
 
 
-def test_citation_targets_with_arxiv_and_doi():
-    from workers.graph_worker import _citation_targets
+def test_citation_targets_bulk_with_arxiv_and_doi():
+    from workers.graph_worker import _citation_targets_bulk
     mock_cursor = MagicMock()
     mock_cursor.fetchall.side_effect = [
         [("ID",), ("ARXIV_ID",), ("DOI",)],
-        [(11,)],  # arxiv matches
-        [(12,)],  # doi matches
+        [(1, 11)],  # arxiv matches
+        [(1, 12)],  # doi matches
     ]
     citations = [{"arxiv_id": "1706.03762"}, {"doi": "10.1000/xyz"}]
-    result = _citation_targets(mock_cursor, citations)
-    assert sorted(result) == [11, 12]
+    result = _citation_targets_bulk(mock_cursor, {1: citations})
+    assert sorted(result[1]) == [11, 12]
 
 
-def test_citation_targets_empty():
-    from workers.graph_worker import _citation_targets
+def test_citation_targets_bulk_resolves_all_papers_in_one_query():
+    from workers.graph_worker import _citation_targets_bulk
     mock_cursor = MagicMock()
-    result = _citation_targets(mock_cursor, [])
-    assert result == []
+    mock_cursor.fetchall.side_effect = [
+        [("ID",), ("SS_ID",)],
+        [(1, 10), (2, 20), (2, 21)],
+    ]
+    result = _citation_targets_bulk(
+        mock_cursor,
+        {1: [{"ss_paper_id": "a"}], 2: [{"ss_paper_id": "b"}, {"ss_paper_id": "c"}], 3: []},
+    )
 
+    assert result == {1: [10], 2: [20, 21]}
+    lookup_calls = [c for c in mock_cursor.execute.call_args_list if "VALUES" in c.args[0]]
+    assert len(lookup_calls) == 1
+    assert lookup_calls[0].args[1] == [1, "a", 2, "b", 2, "c"]
 
-def test_citation_targets_no_ss_ids():
-    from workers.graph_worker import _citation_targets
+
+def test_citation_targets_bulk_empty():
+    from workers.graph_worker import _citation_targets_bulk
+    mock_cursor = MagicMock()
+    result = _citation_targets_bulk(mock_cursor, {1: []})
+    assert result == {}
+    mock_cursor.execute.assert_not_called()
+
+
+def test_citation_targets_bulk_no_ss_ids():
+    from workers.graph_worker import _citation_targets_bulk
     mock_cursor = MagicMock()
     citations = [{"title": "Some paper"}]  # no ss_paper_id
-    result = _citation_targets(mock_cursor, citations)
-    assert result == []
+    result = _citation_targets_bulk(mock_cursor, {1: citations})
+    assert result == {}
 
 
-def test_citation_targets_skips_non_dict_items():
-    from workers.graph_worker import _citation_targets
+def test_citation_targets_bulk_skips_non_dict_items():
+    from workers.graph_worker import _citation_targets_bulk
     mock_cursor = MagicMock()
-    result = _citation_targets(mock_cursor, [None, "bad"])
-    assert result == []
+    result = _citation_targets_bulk(mock_cursor, {1: [None, "bad"]})
+    assert result == {}
 
 
 # ---------------------------------------------------------------------------
@@ -264,17 +302,38 @@ def test_bulk_merge_edges_without_reason_column():
     assert result == 1
 
 
+def test_bulk_merge_edges_chunks_large_edge_lists():
+    from workers.graph_worker import _bulk_merge_edges
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = [
+        ("SOURCE_PAPER_ID",), ("TARGET_PAPER_ID",), ("RELATIONSHIP_TYPE",), ("STRENGTH",), ("REASON",),
+    ]
+    edges = [(1, 2, "SIMILAR", 0.9, None), (1, 3, "CITES", 1.0, None), (2, 3, "SIMILAR", 0.8, None)]
+
+    with patch("workers.graph_worker._EDGE_MERGE_CHUNK_SIZE", 2):
+        result = _bulk_merge_edges(mock_cursor, edges)
+
+    assert result == 3
+    merges = [c.args for c in mock_cursor.execute.call_args_list if "MERGE INTO" in c.args[0]]
+    assert len(merges) == 2
+    assert merges[0][1] == [1, 2, "SIMILAR", 0.9, None, 1, 3, "CITES", 1.0, None]
+    assert merges[1][1] == [2, 3, "SIMILAR", 0.8, None]
+    desc_calls = [c for c in mock_cursor.execute.call_args_list if c.args[0].startswith("DESC TABLE")]
+    assert len(desc_calls) == 1
+
+
 def test_build_knowledge_graph_semantic_phase_error():
     mock_cursor = MagicMock()
     mock_cursor.fetchall.side_effect = [
         [("SOURCE_PAPER_ID",), ("TARGET_PAPER_ID",), ("RELATIONSHIP_TYPE",), ("STRENGTH",), ("REASON",)],
         [],
+        # DESC TABLE SILVER_PAPERS for the conclusion lookups
+        [("ID",), ("CONCLUSION",)],
         [("ID",), ("CITATION_LIST",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",)],
-        [(1, '[{"ss_paper_id":"abc"}]', "[2]", "Source conclusion")],
         [("ID",), ("SS_ID",)],
         [],  # no citation match => warn path
-        [("ID",), ("CONCLUSION",)],
     ]
+    mock_cursor.fetchmany.side_effect = [[(1, '[{"ss_paper_id":"abc"}]', "[2]", "Source conclusion")], []]
     mock_cursor.fetchone.return_value = ("Target conclusion",)
     mock_conn = MagicMock()
     mock_conn.cursor.return_value = mock_cursor
@@ -303,14 +362,14 @@ def test_build_knowledge_graph_with_paper():
         # DESC TABLE GOLD_PAPER_RELATIONSHIPS
         [("SOURCE_PAPER_ID",), ("TARGET_PAPER_ID",), ("RELATIONSHIP_TYPE",), ("STRENGTH",), ("REASON",)],
         [],  # existing edges
-        # DESC TABLE SILVER_PAPERS for _fetch_papers
-        [("ID",), ("CITATION_LIST",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",)],
-        # one paper row: id=1, citations=None, similar_ids=[2,3], conclusion="Some conclusion"
-        [(1, None, "[2, 3]", "Some conclusion")],
-        # DESC TABLE SILVER_PAPERS for sim_cols in loop
+        # DESC TABLE SILVER_PAPERS for the conclusion lookups
         [("ID",), ("CONCLUSION",)],
+        # DESC TABLE SILVER_PAPERS for the papers query
+        [("ID",), ("CITATION_LIST",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",)],
         # fetchone for target paper 2 conclusion
     ]
+    # one paper row: id=1, citations=None, similar_ids=[2,3], conclusion="Some conclusion"
+    mock_cursor.fetchmany.side_effect = [[(1, None, "[2, 3]", "Some conclusion")], []]
     mock_cursor.fetchone.return_value = None  # no conclusion for target papers
     mock_cursor.execute.return_value = None
 
@@ -326,15 +385,43 @@ def test_build_knowledge_graph_with_paper():
     assert result["papers_processed"] == 1
 
 
-def test_build_knowledge_graph_runs_classifier_for_new_semantic_edges():
+def test_build_knowledge_graph_resolves_columns_once_per_run():
     mock_cursor = MagicMock()
     mock_cursor.fetchall.side_effect = [
         [("SOURCE_PAPER_ID",), ("TARGET_PAPER_ID",), ("RELATIONSHIP_TYPE",), ("STRENGTH",), ("REASON",)],
         [],
+        [("ID",), ("CONCLUSION",)],
         [("ID",), ("CITATION_LIST",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",)],
-        [(1, None, "[2]", "Source conclusion")],
+    ]
+    mock_cursor.fetchmany.side_effect = [
+        [(1, None, "[2]", "First"), (2, None, "[1]", "Second")],
+        [(3, None, "[1]", "Third")],
+        [],
+    ]
+    mock_cursor.fetchone.return_value = None
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+
+    with patch("workers.graph_worker.connect_to_snowflake", return_value=mock_conn):
+        with patch("workers.graph_worker.RelationshipClassifier", MagicMock()):
+            with patch("workers.graph_worker._bulk_merge_edges", return_value=3):
+                result = build_knowledge_graph(paper_id=None)
+
+    assert result["papers_processed"] == 3
+    desc_calls = [c for c in mock_cursor.execute.call_args_list if c.args[0].startswith("DESC TABLE")]
+    assert len(desc_calls) == 3  # GOLD, SILVER conclusions, SILVER papers query
+
+
+def test_build_knowledge_graph_runs_classifier_for_new_semantic_edges():
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.side_effect = [
+        [("SOURCE_PAPER_ID",), ("TARGET_PAPER_ID",), ("RELATIONSHIP_TYPE",), ("STRENGTH",), ("REASON",)],
+        [],
+        # DESC TABLE SILVER_PAPERS for the conclusion lookups
         [("ID",), ("CONCLUSION",)],
+        [("ID",), ("CITATION_LIST",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",)],
     ]
+    mock_cursor.fetchmany.side_effect = [[(1, None, "[2]", "Source conclusion")], []]
     mock_cursor.fetchone.return_value = ("Target conclusion",)
     mock_cursor.execute.return_value = None
 
@@ -360,12 +447,13 @@ def test_build_knowledge_graph_adds_citation_edges():
     mock_cursor.fetchall.side_effect = [
         [("SOURCE_PAPER_ID",), ("TARGET_PAPER_ID",), ("RELATIONSHIP_TYPE",)],
         [],
+        # DESC TABLE SILVER_PAPERS for the conclusion lookups
+        [("ID",), ("CONCLUSION",)],
         [("ID",), ("CITATION_LIST",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",)],
-        [(1, '[{"ss_paper_id": "ss-2"}]', "[]", "Source conclusion")],
         [("ID",), ("SS_ID",)],
-        [(2,)],
-        [("ID",), ("CONCLUSION",)],
+        [(1, 2)],
     ]
+    mock_cursor.fetchmany.side_effect = [[(1, '[{"ss_paper_id": "ss-2"}]', "[]", "Source conclusion")], []]
     mock_cursor.fetchone.return_value = None
     mock_cursor.execute.return_value = None
 
@@ -393,10 +481,11 @@ def test_build_knowledge_graph_skips_classifier_for_existing_semantic_edge():
     mock_cursor.fetchall.side_effect = [
         [("SOURCE_PAPER_ID",), ("TARGET_PAPER_ID",), ("RELATIONSHIP_TYPE",)],
         [(1, 2, "SUPPORT")],
-        [("ID",), ("CITATION_LIST",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",)],
-        [(1, None, "[2]", "Source conclusion")],
+        # DESC TABLE SILVER_PAPERS for the conclusion lookups
         [("ID",), ("CONCLUSION",)],
+        [("ID",), ("CITATION_LIST",), ("SIMILAR_EMBEDDINGS_IDS",), ("CONCLUSION",)],
     ]
+    mock_cursor.fetchmany.side_effect = [[(1, None, "[2]", "Source conclusion")], []]
     mock_cursor.fetchone.return_value = ("Target conclusion",)
     mock_cursor.execute.return_value = None
 
@@ -546,3 +635,13 @@ def test_relationship_classifier_methods_via_reloaded_module():
         modal.method = old_method
         modal.enter = old_enter
         importlib.reload(gw)
+
+
+def test_add_edge_keeps_strongest_and_skips_self_loops():
+    from workers.graph_worker import _add_edge, _edge_list
+    edges = {}
+    _add_edge(edges, 1, 2, "SIMILAR", 0.5)
+    _add_edge(edges, 1, 2, "SIMILAR", 0.9)
+    _add_edge(edges, 1, 2, "SIMILAR", 0.7)
+    _add_edge(edges, 3, 3, "CITES", 1.0)
+    assert _edge_list(edges) == [(1, 2, "SIMILAR", 0.9, None)]
@@ -5,6 +5,7 @@ arxiv and httpx are mocked in sys.modules before the module is imported
 so those heavy deps are never loaded.
 """
 
+import json
 import sys
 import pytest
 from unittest.mock import MagicMock, patch
@@ -88,6 +89,10 @@ def test_ingest_from_semantic_scholar_happy_path():
         with patch.dict(sys.modules, {"httpx": mock_httpx_module}):
             ingest_from_semantic_scholar(query="test", max_results=1)
 
+    inserts = [c.args for c in mock_cursor.execute.call_args_list if "INSERT" in c.args[0]]
+    assert len(inserts) == 1
+    assert "https://arxiv.org/abs/2301.00001" in json.dumps(inserts[0][1])
+
 
 # ---------------------------------------------------------------------------
 # ingest_from_arxiv — happy path
@@ -97,8 +102,8 @@ def test_ingest_from_arxiv_happy_path():
     mock_cursor = MagicMock()
     mock_cursor.fetchall.side_effect = [
         [("RAW_PAYLOAD",)],  # DESC TABLE for _resolve_bronze_payload_column
+        [],  # existing entry_id lookup — no duplicate
     ]
-    mock_cursor.fetchone.return_value = None  # no duplicate
     mock_cursor.execute.return_value = None
 
     mock_conn = MagicMock()
@@ -122,16 +127,18 @@ def test_ingest_from_arxiv_happy_path():
     mock_result.links = [MagicMock(href="https://arxiv.org/abs/2301.00001")]
     mock_result.pdf_url = "https://arxiv.org/pdf/2301.00001.pdf"
 
-    mock_search_instance = MagicMock()
-    mock_search_instance.results.return_value = iter([mock_result])
-
     mock_arxiv_module = MagicMock()
-    mock_arxiv_module.Search.return_value = mock_search_instance
+    mock_arxiv_module.Client.return_value.results.return_value = iter([mock_result])
 
     with patch("workers.ingestion.connect_to_snowflake", return_value=mock_conn):
         with patch.dict(sys.modules, {"arxiv": mock_arxiv_module}):
             ingest_from_arxiv(query="test", max_results=1)
 
+    mock_arxiv_module.Client.assert_called_once_with(page_size=1)
+    insert_sql, insert_params = mock_cursor.execute.call_args.args
+    assert "FROM VALUES (%s)" in insert_sql
+    assert json.loads(insert_params[0])["entry_id"] == "http://arxiv.org/abs/2301.00001v1"
+
 
 # ---------------------------------------------------------------------------
 # ingest_from_openalex — happy path
@@ -288,8 +295,10 @@ def test_ingest_from_openalex_skips_duplicate():
 def test_ingest_from_arxiv_skips_duplicate():
     # Lines 222-223: duplicate arxiv paper is skipped
     mock_cursor = MagicMock()
-    mock_cursor.fetchall.side_effect = [[("RAW_PAYLOAD",)]]
-    mock_cursor.fetchone.return_value = (1,)  # duplicate
+    mock_cursor.fetchall.side_effect = [
+        [("RAW_PAYLOAD",)],
+        [("http://arxiv.org/abs/2301.00001v1",)],  # duplicate
+    ]
     mock_cursor.execute.return_value = None
     mock_conn = MagicMock()
     mock_conn.cursor.return_value = mock_cursor
@@ -310,15 +319,15 @@ def test_ingest_from_arxiv_skips_duplicate():
     mock_result.links = []
     mock_result.pdf_url = None
 
-    mock_search = MagicMock()
-    mock_search.results.return_value = iter([mock_result])
     mock_arxiv = MagicMock()
-    mock_arxiv.Search.return_value = mock_search
+    mock_arxiv.Client.return_value.results.return_value = iter([mock_result])
 
     with patch("workers.ingestion.connect_to_snowflake", return_value=mock_conn):
         with patch.dict(sys.modules, {"arxiv": mock_arxiv}):
             ingest_from_arxiv(query="test", max_results=1)
 
+    assert not any("INSERT" in c.args[0] for c in mock_cursor.execute.call_args_list)
+
 
 def test_ingest_from_semantic_scholar_skips_no_arxiv():
     # Lines 254, 276: paper without ArXiv ID is skipped
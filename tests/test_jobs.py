@@ -9,6 +9,11 @@ def _make_remote_mock(return_value):
     return m
 
 
+def _make_embedder_mock(return_value):
+    embedder = MagicMock(process_single_embedding=_make_remote_mock(return_value))
+    return MagicMock(return_value=embedder)
+
+
 def test_run_single_ingestion_job_returns_done():
     mock_bronze = {"status": "ok", "inserted": 1}
     mock_silver = {"status": "ok"}
@@ -18,7 +23,7 @@ def test_run_single_ingestion_job_returns_done():
     with patch.dict("sys.modules", {
         "app.workers.ingestion": MagicMock(ingest_single_paper=_make_remote_mock(mock_bronze)),
         "app.workers.transformation": MagicMock(process_single_silver=_make_remote_mock(mock_silver)),
-        "app.workers.embedding_worker": MagicMock(process_single_embedding=_make_remote_mock(mock_embedding)),
+        "app.workers.embedding_worker": MagicMock(Embedder=_make_embedder_mock(mock_embedding)),
         "app.workers.graph_worker": MagicMock(build_knowledge_graph=_make_remote_mock(mock_graph)),
     }):
         from app.jobs import run_single_ingestion_job
@@ -39,7 +44,7 @@ def test_run_post_bronze_job_returns_done():
 
     with patch.dict("sys.modules", {
         "app.workers.transformation": MagicMock(process_single_silver=_make_remote_mock(mock_silver)),
-        "app.workers.embedding_worker": MagicMock(process_single_embedding=_make_remote_mock(mock_embedding)),
+        "app.workers.embedding_worker": MagicMock(Embedder=_make_embedder_mock(mock_embedding)),
         "app.workers.graph_worker": MagicMock(build_knowledge_graph=_make_remote_mock(mock_graph)),
     }):
         from app.jobs import run_post_bronze_job
@@ -54,7 +59,7 @@ def test_run_post_bronze_job_returns_done():
 def test_run_post_bronze_job_handles_missing_paper_id():
     with patch.dict("sys.modules", {
         "app.workers.transformation": MagicMock(process_single_silver=_make_remote_mock({"status": "ok"})),
-        "app.workers.embedding_worker": MagicMock(process_single_embedding=_make_remote_mock({"status": "ok"})),
+        "app.workers.embedding_worker": MagicMock(Embedder=_make_embedder_mock({"status": "ok"})),
         "app.workers.graph_worker": MagicMock(build_knowledge_graph=_make_remote_mock({"status": "ok"})),
     }):
         from app.jobs import run_post_bronze_job
@@ -66,7 +71,7 @@ def test_run_post_bronze_job_handles_missing_paper_id():
 def test_run_post_bronze_job_handles_invalid_paper_id():
     with patch.dict("sys.modules", {
         "app.workers.transformation": MagicMock(process_single_silver=_make_remote_mock({"status": "ok"})),
-        "app.workers.embedding_worker": MagicMock(process_single_embedding=_make_remote_mock({"status": "ok", "paper_id": "not-a-number"})),
+        "app.workers.embedding_worker": MagicMock(Embedder=_make_embedder_mock({"status": "ok", "paper_id": "not-a-number"})),
         "app.workers.graph_worker": MagicMock(build_knowledge_graph=_make_remote_mock({"status": "ok"})),
     }):
         from app.jobs import run_post_bronze_job
@@ -7,7 +7,9 @@ in retrieve_similar_chunks_local.
 """
 
 import json
+import os
 import sys
+import pytest
 from unittest.mock import MagicMock, patch
 
 # ---------------------------------------------------------------------------
@@ -30,15 +32,24 @@ config.SCHEMA = "SILVER"
 # Remove any previously injected mock so we import the real module
 sys.modules.pop("workers.semantic_search_worker", None)
 
+import workers.semantic_search_worker as semantic_search_worker  # noqa: E402
 from workers.semantic_search_worker import (  # noqa: E402
     _parse_cached_ids,
     _keyword_tokens,
     _hybrid_score,
     semantic_search,
     get_related_papers,
+    _ann_related,
 )
 
 
+@pytest.fixture(autouse=True)
+def _clear_related_cache():
+    semantic_search_worker._related_cache.clear()
+    yield
+    semantic_search_worker._related_cache.clear()
+
+
 # ---------------------------------------------------------------------------
 # _parse_cached_ids
 # ---------------------------------------------------------------------------
@@ -112,7 +123,7 @@ def test_get_related_papers_with_cached_ids():
     mock_cursor = MagicMock()
     # fetchone returns the cached similar_embeddings_ids row
     mock_cursor.fetchone.return_value = (json.dumps([101, 102]),)
-    # fetchall returns the JOIN result for the cached ids
+    # fetchall returns the IN-list lookup for the cached ids
     mock_cursor.fetchall.return_value = [
         (101, "2301.00001", "Paper One"),
         (102, "2301.00002", "Paper Two"),
@@ -122,7 +133,7 @@ def test_get_related_papers_with_cached_ids():
     mock_conn = MagicMock()
     mock_conn.cursor.return_value = mock_cursor
 
-    with patch("workers.semantic_search_worker.connect_to_snowflake", return_value=mock_conn):
+    with patch("workers.semantic_search_worker.get_shared_snowflake_connection", return_value=mock_conn):
         result = get_related_papers(paper_id=1, k=2)
 
     assert isinstance(result, list)
@@ -156,7 +167,7 @@ def test_semantic_search_with_results():
             return mock_st_local
         return _il.import_module(name)
 
-    with patch("workers.semantic_search_worker.connect_to_snowflake", return_value=mock_conn):
+    with patch("workers.semantic_search_worker.get_shared_snowflake_connection", return_value=mock_conn):
         with patch("importlib.import_module", side_effect=fake_import):
             result = semantic_search(query="transformers", k=5)
 
@@ -172,18 +183,208 @@ def test_semantic_search_with_results():
 def test_get_related_papers_force_refresh():
     mock_cursor = MagicMock()
     mock_cursor.fetchall.return_value = [
-        (101, "2301.00001", "Paper One", "Abstract", 0.9),
+        (101, "2301.00001", "Paper One", 0.9),
     ]
     mock_cursor.execute.return_value = None
     mock_conn = MagicMock()
     mock_conn.cursor.return_value = mock_cursor
     mock_conn.commit.return_value = None
 
-    with patch("workers.semantic_search_worker.connect_to_snowflake", return_value=mock_conn):
+    with patch("workers.semantic_search_worker.get_shared_snowflake_connection", return_value=mock_conn):
         result = get_related_papers(paper_id=1, k=5, force_refresh=True)
 
     assert isinstance(result, list)
     assert result[0]["source"] == "fallback"
+    assert result[0]["score"] == 0.9
+    assert '"abstract"' not in mock_cursor.execute.call_args_list[0].args[0]
+    assert mock_cursor.execute.call_args_list[0].args[0].count("VECTOR_COSINE_SIMILARITY") == 1
+
+
+# ---------------------------------------------------------------------------
+# get_related_papers — in-memory result cache
+# ---------------------------------------------------------------------------
+
+def test_get_related_papers_repeat_lookup_skips_snowflake():
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.return_value = (json.dumps([101]),)
+    mock_cursor.fetchall.side_effect = [
+        [(101, "2301.00001", "Paper One")],
+        [(101, "2301.00001", "Paper One", 0.9)],
+    ]
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+
+    with patch("workers.semantic_search_worker.get_shared_snowflake_connection", return_value=mock_conn) as connect:
+        first = get_related_papers(paper_id=1, k=2)
+        first[0]["title"] = "mutated by caller"
+        second = get_related_papers(paper_id=1, k=2)
+        get_related_papers(paper_id=1, k=2, force_refresh=True)
+
+    assert second[0]["title"] == "Paper One"
+    assert connect.call_count == 2
+
+
+def _related_lookup_conn():
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.return_value = (json.dumps([101]),)
+    mock_cursor.fetchall.return_value = [(101, "2301.00001", "Paper One")]
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    return mock_conn
+
+
+def test_get_related_papers_cache_entries_expire():
+    with patch("workers.semantic_search_worker.get_shared_snowflake_connection",
+               return_value=_related_lookup_conn()) as connect, \
+            patch("workers.semantic_search_worker.time.time") as clock:
+        clock.return_value = 0.0
+        get_related_papers(paper_id=1, k=2)
+        clock.return_value = semantic_search_worker._RELATED_CACHE_TTL_SECONDS - 1
+        get_related_papers(paper_id=1, k=2)
+        assert connect.call_count == 1
+
+        clock.return_value = semantic_search_worker._RELATED_CACHE_TTL_SECONDS + 1
+        get_related_papers(paper_id=1, k=2)
+
+    assert connect.call_count == 2
+
+
+def test_get_related_papers_cache_evicts_least_recently_used():
+    with patch("workers.semantic_search_worker.get_shared_snowflake_connection",
+               return_value=_related_lookup_conn()) as connect, \
+            patch("workers.semantic_search_worker._RELATED_CACHE_MAX_ENTRIES", 2):
+        get_related_papers(paper_id=1, k=2)
+        get_related_papers(paper_id=2, k=2)
+        get_related_papers(paper_id=1, k=2)  # hit: paper 2 is now least recently used
+        get_related_papers(paper_id=3, k=2)
+        assert connect.call_count == 3
+
+        get_related_papers(paper_id=1, k=2)
+        assert connect.call_count == 3
+        get_related_papers(paper_id=2, k=2)
+
+    assert connect.call_count == 4
+
+
+# ---------------------------------------------------------------------------
+# get_related_papers — ANN index path
+# ---------------------------------------------------------------------------
+
+def test_get_related_papers_uses_ann_index():
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = [(101, "2301.00001", "Paper One")]
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+
+    with patch("workers.semantic_search_worker.get_shared_snowflake_connection", return_value=mock_conn):
+        with patch("workers.semantic_search_worker._ann_related", return_value=[(101, 0.95)]):
+            result = get_related_papers(paper_id=1, k=5, force_refresh=True)
+
+    assert result == [
+        {
+            "id": 101,
+            "arxiv_id": "2301.00001",
+            "title": "Paper One",
+            "score": 0.95,
+            "source": "ann",
+            "database": result[0]["database"],
+        }
+    ]
+    sqls = [c.args[0] for c in mock_cursor.execute.call_args_list]
+    assert not any("VECTOR_COSINE_SIMILARITY" in s for s in sqls)
+    assert any("similar_embeddings_ids" in s for s in sqls)
+
+
+def test_ann_related_skips_self_and_below_threshold():
+    import numpy as np
+
+    index = MagicMock()
+    index.reconstruct.return_value = np.zeros(384, dtype="float32")
+    index.search.return_value = (
+        np.array([[1.0, 0.8, 0.1, -1.0]]),
+        np.array([[0, 1, 2, -1]]),
+    )
+    ann = {"index": index, "ids": [7, 8, 9], "row_of": {7: 0, 8: 1, 9: 2}}
+
+    with patch("workers.semantic_search_worker._load_ann_index", return_value=ann):
+        assert _ann_related(7, k=3, score_threshold=0.5) == [(8, 0.8)]
+        assert _ann_related(42, k=3, score_threshold=0.5) is None
+
+
+def test_get_related_papers_searches_the_requested_databases_index():
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.return_value = [(101, "2301.00001", "Paper One")]
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+
+    with patch("workers.semantic_search_worker.get_shared_snowflake_connection", return_value=mock_conn), \
+            patch("workers.semantic_search_worker._ann_related", return_value=[(101, 0.95)]) as ann:
+        get_related_papers(paper_id=1, k=5, force_refresh=True, database="MINDMAP_B")
+
+    ann.assert_called_once_with(1, 5, 0.0, database="MINDMAP_B")
+
+
+def test_load_ann_index_picks_up_rebuilt_index_after_volume_reload(tmp_path):
+    import numpy as np
+
+    index_file = tmp_path / "MINDMAP_A_silver_papers_hnsw_sq8.faiss"
+    ids_file = tmp_path / "MINDMAP_A_silver_papers_hnsw_ids.npy"
+    fake_faiss = MagicMock()
+    fake_faiss.read_index.side_effect = lambda path: open(path).read()
+
+    def write_index(name, ids, mtime):
+        index_file.write_text(name)
+        np.save(ids_file, np.asarray(ids, dtype=np.int64))
+        os.utime(index_file, (mtime, mtime))
+
+    write_index("v1", [7, 8], 1_000)
+    semantic_search_worker._ann_cache.clear()
+    with patch("app.config.ANN_INDEX_DIR", str(tmp_path)), \
+            patch("workers.semantic_search_worker._ann_volume_reloaded_at", float("-inf")), \
+            patch("workers.semantic_search_worker.ann_index_volume") as volume, \
+            patch("workers.semantic_search_worker.time.time") as clock, \
+            patch("importlib.import_module", return_value=fake_faiss):
+        clock.return_value = 0.0
+        first = semantic_search_worker._load_ann_index("MINDMAP_A")
+        assert first["index"] == "v1"
+
+        # The embedding worker commits a rebuilt index with a new paper; this
+        # container's mount only shows it after reload()
+        volume.reload.side_effect = lambda: write_index("v2", [7, 8, 9], 2_000)
+        clock.return_value = 1.0
+        assert semantic_search_worker._load_ann_index("MINDMAP_A")["index"] == "v1"
+
+        clock.return_value = 1.0 + semantic_search_worker._ANN_VOLUME_RELOAD_INTERVAL_SECONDS
+        reloaded = semantic_search_worker._load_ann_index("MINDMAP_A")
+
+    assert reloaded["index"] == "v2"
+    assert reloaded["row_of"] == {7: 0, 8: 1, 9: 2}
+    assert volume.reload.call_count == 2
+    semantic_search_worker._ann_cache.clear()
+
+
+def test_load_ann_index_keeps_one_index_per_database(tmp_path):
+    import numpy as np
+
+    for database, ids in (("MINDMAP_A", [7, 8]), ("MINDMAP_B", [7, 30, 31])):
+        (tmp_path / f"{database}_silver_papers_hnsw_sq8.faiss").write_text(database)
+        np.save(tmp_path / f"{database}_silver_papers_hnsw_ids.npy", np.asarray(ids, dtype=np.int64))
+    fake_faiss = MagicMock()
+    fake_faiss.read_index.side_effect = lambda path: open(path).read()
+
+    semantic_search_worker._ann_cache.clear()
+    with patch("app.config.ANN_INDEX_DIR", str(tmp_path)), \
+            patch("workers.semantic_search_worker.ann_index_volume"), \
+            patch("importlib.import_module", return_value=fake_faiss):
+        ann_a = semantic_search_worker._load_ann_index("MINDMAP_A")
+        ann_b = semantic_search_worker._load_ann_index("MINDMAP_B")
+        assert semantic_search_worker._load_ann_index("MINDMAP_C") is None
+        assert semantic_search_worker._load_ann_index("MINDMAP_A") is ann_a
+
+    assert (ann_a["index"], ann_a["ids"]) == ("MINDMAP_A", [7, 8])
+    assert (ann_b["index"], ann_b["ids"]) == ("MINDMAP_B", [7, 30, 31])
+    assert fake_faiss.read_index.call_count == 2
+    semantic_search_worker._ann_cache.clear()
 
 
 # ---------------------------------------------------------------------------
@@ -231,7 +432,7 @@ def test_retrieve_similar_chunks_with_results():
             return mock_st_local
         return _il.import_module(name)
 
-    with patch("workers.semantic_search_worker.connect_to_snowflake", return_value=mock_conn):
+    with patch("workers.semantic_search_worker.get_shared_snowflake_connection", return_value=mock_conn):
         with patch("importlib.import_module", side_effect=fake_import):
             result = retrieve_similar_chunks(query_text="transformers", top_k=1, paper_id=10)
 
@@ -276,6 +477,7 @@ def test_retrieve_similar_chunks_local_respects_context_limit_and_fallback_token
 
     assert len(result) == 1
     assert result[0]["token_estimate"] >= 1
+    mock_conn.close.assert_called_once()
 
 
 def test_retrieve_similar_chunks_local_skips_blank_and_breaks_at_top_k():
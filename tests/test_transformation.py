@@ -18,6 +18,16 @@ sys.modules.setdefault("httpx", _httpx_mock)
 
 import workers.transformation  # noqa: E402
 
+
+@pytest.fixture(autouse=True)
+def _reset_http_client():
+    # The shared client is cached per process; rebuild it from each test's httpx mock
+    workers.transformation._http_client = None
+    workers.transformation._ss_etag_cache.clear()
+    yield
+    workers.transformation._http_client = None
+    workers.transformation._ss_etag_cache.clear()
+
 from workers.transformation import (  # noqa: E402
     _retry_delay_from_response,
     _clean_extracted_text,
@@ -257,7 +267,7 @@ def test_fetch_ss_batch_rows_resilient_success():
     mock_resp.status_code = 200
     mock_resp.raise_for_status.return_value = None
     mock_resp.json.return_value = [{"paperId": "abc"}, {"paperId": "def"}]
-    mock_httpx.post.return_value = mock_resp
+    mock_httpx.Client.return_value.post.return_value = mock_resp
     mock_httpx.HTTPStatusError = Exception
 
     with patch.dict(sys.modules, {"httpx": mock_httpx}):
@@ -391,6 +401,28 @@ def test_extract_references_pdf_happy_path():
     assert isinstance(result, list)
 
 
+def test_extract_references_pdf_starts_at_uppercase_heading():
+    from workers.transformation import extract_references_pdf
+    page_text = (
+        "As shown in [9] the body text also has markers. "
+        "REFERENCES [1] Smith et al. A long enough reference entry here."
+    )
+    mock_page = MagicMock()
+    mock_page.get_text.return_value = page_text
+    mock_doc = MagicMock()
+    mock_doc.__len__.return_value = 1
+    mock_doc.__enter__.return_value = mock_doc
+    mock_doc.__getitem__.return_value = mock_page
+    mock_fitz = MagicMock()
+    mock_fitz.open.return_value = mock_doc
+
+    with patch("workers.transformation._arxiv_get_pdf_bytes", return_value=b"%PDF fake"):
+        with patch.dict(sys.modules, {"fitz": mock_fitz}):
+            result = extract_references_pdf("2301.00001")
+
+    assert result == ["[1] Smith et al. A long enough reference entry here."]
+
+
 def test_extract_references_pdf_download_error():
     from workers.transformation import extract_references_pdf
     mock_fitz = MagicMock()
@@ -428,6 +460,29 @@ def test_get_references_fallback_pdf():
     assert result["source"] == "pdf_parsed_list"
 
 
+def test_get_references_fallback_reuses_full_text_buffer():
+    from workers.transformation import get_references
+    mock_fetch = MagicMock()
+    mock_fetch.remote.return_value = []
+    mock_pdf = MagicMock()
+    full_text = (
+        "Introduction\nWe cite [1] in the body.\n"
+        "References\n[1] A. Author. A referenced paper title. 2020.\n"
+        "[2] B. Author. Another referenced paper. 2021.\n"
+    )
+
+    with patch.object(workers.transformation, "fetch_connections_ss", mock_fetch):
+        with patch.object(workers.transformation, "extract_references_pdf", mock_pdf):
+            result = get_references("2301.00001", full_text=full_text)
+
+    assert result["source"] == "pdf_parsed_list"
+    assert result["data"] == [
+        "[1] A. Author. A referenced paper title. 2020.",
+        "[2] B. Author. Another referenced paper. 2021.",
+    ]
+    mock_pdf.remote.assert_not_called()
+
+
 # ---------------------------------------------------------------------------
 # get_bronze_worklist
 # ---------------------------------------------------------------------------
@@ -438,8 +493,7 @@ def test_get_bronze_worklist_returns_new_ids():
     mock_cursor.fetchall.side_effect = [
         [("RAW_PAYLOAD",)],                          # DESC TABLE BRONZE
         [("ARXIV_ID",)],                             # DESC TABLE SILVER
-        [("https://arxiv.org/abs/2301.00001v1",)],   # bronze entry_ids
-        [("9999.99999",)],                           # existing silver arxiv_ids
+        [("2301.00001",)],                           # unprocessed arxiv_ids
     ]
     mock_cursor.execute.return_value = None
     mock_conn = MagicMock()
@@ -448,7 +502,29 @@ def test_get_bronze_worklist_returns_new_ids():
     with patch("workers.transformation.connect_to_snowflake", return_value=mock_conn):
         result = get_bronze_worklist()
 
-    assert "2301.00001" in result
+    assert result == ["2301.00001"]
+    worklist_sql = mock_cursor.execute.call_args[0][0]
+    assert "REGEXP_SUBSTR" in worklist_sql
+    assert r"'\\d{4}\\.\\d{4,5}'" in worklist_sql
+    assert "NOT EXISTS" in worklist_sql
+
+
+def test_get_bronze_worklist_force_reprocess_skips_anti_join():
+    from workers.transformation import get_bronze_worklist
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.side_effect = [
+        [("RAW_PAYLOAD",)],
+        [("ARXIV_ID",)],
+        [("2301.00001",), ("2301.00002",)],
+    ]
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+
+    with patch("workers.transformation.connect_to_snowflake", return_value=mock_conn):
+        result = get_bronze_worklist(force_reprocess=True)
+
+    assert result == ["2301.00001", "2301.00002"]
+    assert "NOT EXISTS" not in mock_cursor.execute.call_args[0][0]
 
 
 # ---------------------------------------------------------------------------
@@ -506,7 +582,7 @@ def test_ss_get_json_success():
     mock_resp.status_code = 200
     mock_resp.raise_for_status.return_value = None
     mock_resp.json.return_value = {"data": []}
-    mock_httpx.get.return_value = mock_resp
+    mock_httpx.Client.return_value.get.return_value = mock_resp
     mock_httpx.HTTPStatusError = Exception
 
     with patch.dict(sys.modules, {"httpx": mock_httpx}):
@@ -514,6 +590,77 @@ def test_ss_get_json_success():
     assert result == {"data": []}
 
 
+def test_ss_get_json_reuses_shared_http_client():
+    from workers.transformation import _ss_get_json
+    mock_httpx = MagicMock()
+    mock_resp = MagicMock()
+    mock_resp.status_code = 200
+    mock_resp.json.return_value = {"data": []}
+    mock_httpx.Client.return_value.get.return_value = mock_resp
+    mock_httpx.HTTPStatusError = Exception
+
+    with patch.dict(sys.modules, {"httpx": mock_httpx}), patch("workers.transformation.time.sleep"):
+        _ss_get_json("https://example.com", params={})
+        _ss_get_json("https://example.com", params={})
+
+    mock_httpx.Client.assert_called_once()
+    assert mock_httpx.Client.return_value.get.call_count == 2
+
+
+def test_ss_get_json_returns_cached_body_on_304():
+    from workers.transformation import _ss_get_json
+    first = MagicMock(status_code=200, headers={"ETag": '"abc"'})
+    first.json.return_value = {"data": [{"paperId": "p1"}]}
+    not_modified = MagicMock(status_code=304, headers={})
+    mock_httpx = MagicMock()
+    mock_httpx.Client.return_value.get.side_effect = [first, not_modified]
+    mock_httpx.HTTPStatusError = Exception
+
+    with patch.dict(sys.modules, {"httpx": mock_httpx}), patch("workers.transformation.time.sleep"):
+        assert _ss_get_json("https://example.com", params={"limit": 1}) == {"data": [{"paperId": "p1"}]}
+        assert _ss_get_json("https://example.com", params={"limit": 1}) == {"data": [{"paperId": "p1"}]}
+
+    second_headers = mock_httpx.Client.return_value.get.call_args_list[1].kwargs["headers"]
+    assert second_headers["If-None-Match"] == '"abc"'
+    not_modified.json.assert_not_called()
+
+
+def test_ss_get_json_cached_body_is_isolated_from_caller_mutation():
+    from workers.transformation import _ss_get_json
+    first = MagicMock(status_code=200, headers={"ETag": '"abc"'})
+    first.json.return_value = {"data": [{"paperId": "p1"}]}
+    not_modified = MagicMock(status_code=304, headers={})
+    mock_httpx = MagicMock()
+    mock_httpx.Client.return_value.get.side_effect = [first, not_modified, not_modified]
+    mock_httpx.HTTPStatusError = Exception
+
+    with patch.dict(sys.modules, {"httpx": mock_httpx}), patch("workers.transformation.time.sleep"):
+        _ss_get_json("https://example.com")["data"].pop()
+        _ss_get_json("https://example.com")["data"][0]["paperId"] = "mutated"
+        third = _ss_get_json("https://example.com")
+
+    assert third == {"data": [{"paperId": "p1"}]}
+
+
+def test_ss_get_json_etag_cache_evicts_safely_under_concurrent_callers():
+    from concurrent.futures import ThreadPoolExecutor
+    from workers.transformation import _ss_get_json
+    ok = MagicMock(status_code=200, headers={"ETag": '"abc"'})
+    ok.json.return_value = {"data": []}
+    mock_httpx = MagicMock()
+    mock_httpx.Client.return_value.get.return_value = ok
+    mock_httpx.HTTPStatusError = Exception
+
+    with patch.dict(sys.modules, {"httpx": mock_httpx}), \
+            patch("workers.transformation.time.sleep"), \
+            patch("workers.transformation._SS_ETAG_CACHE_MAX_ENTRIES", 4):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda i: _ss_get_json(f"https://example.com/{i}"), range(200)))
+
+    assert results == [{"data": []}] * 200
+    assert len(workers.transformation._ss_etag_cache) == 4
+
+
 # ---------------------------------------------------------------------------
 # _ss_post_json — success path
 # ---------------------------------------------------------------------------
@@ -525,7 +672,7 @@ def test_ss_post_json_success():
     mock_resp.status_code = 200
     mock_resp.raise_for_status.return_value = None
     mock_resp.json.return_value = [{"paperId": "abc"}]
-    mock_httpx.post.return_value = mock_resp
+    mock_httpx.Client.return_value.post.return_value = mock_resp
     mock_httpx.HTTPStatusError = Exception
 
     with patch.dict(sys.modules, {"httpx": mock_httpx}):
@@ -549,7 +696,7 @@ def test_ss_get_json_retries_transient_error_then_succeeds():
     second.raise_for_status.return_value = None
     second.json.return_value = {"ok": True}
     mock_httpx = MagicMock()
-    mock_httpx.get.side_effect = [first, second]
+    mock_httpx.Client.return_value.get.side_effect = [first, second]
     mock_httpx.HTTPStatusError = Exception
 
     with patch.dict(sys.modules, {"httpx": mock_httpx}):
@@ -568,7 +715,7 @@ def test_ss_post_json_retries_transient_error_then_succeeds():
     second.raise_for_status.return_value = None
     second.json.return_value = [{"paperId": "abc"}]
     mock_httpx = MagicMock()
-    mock_httpx.post.side_effect = [first, second]
+    mock_httpx.Client.return_value.post.side_effect = [first, second]
     mock_httpx.HTTPStatusError = Exception
 
     with patch.dict(sys.modules, {"httpx": mock_httpx}):
@@ -587,7 +734,7 @@ def test_arxiv_get_pdf_bytes_retries_http_error_then_succeeds():
     success = MagicMock(status_code=200, content=b"pdf-bytes", text="")
     success.raise_for_status.return_value = None
     mock_httpx = MagicMock()
-    mock_httpx.get.side_effect = [FakeHTTPError("boom"), success]
+    mock_httpx.Client.return_value.get.side_effect = [FakeHTTPError("boom"), success]
     mock_httpx.HTTPError = FakeHTTPError
     mock_httpx.HTTPStatusError = Exception
 
@@ -598,6 +745,37 @@ def test_arxiv_get_pdf_bytes_retries_http_error_then_succeeds():
     assert result == b"pdf-bytes"
 
 
+def test_arxiv_get_pdf_bytes_downloads_once_into_pdf_cache(tmp_path):
+    from workers.transformation import _arxiv_get_pdf_bytes
+
+    pdf = b"%PDF-1.4 body %%EOF\n"
+    with patch("app.config.ARXIV_PDF_CACHE_DIR", str(tmp_path)), \
+            patch("workers.transformation.arxiv_pdf_volume") as mock_volume, \
+            patch("workers.transformation._download_arxiv_pdf", return_value=pdf) as mock_download:
+        first = _arxiv_get_pdf_bytes("2301.00001")
+        second = _arxiv_get_pdf_bytes("2301.00001")
+
+    assert first == second == pdf
+    mock_download.assert_called_once()
+    mock_volume.commit.assert_called_once()
+    assert [p.name for p in tmp_path.iterdir()] == ["2301.00001.pdf"]
+    assert (tmp_path / "2301.00001.pdf").read_bytes() == pdf
+
+
+def test_arxiv_get_pdf_bytes_redownloads_truncated_cached_pdf(tmp_path):
+    from workers.transformation import _arxiv_get_pdf_bytes
+
+    (tmp_path / "2301.00001.pdf").write_bytes(b"%PDF-1.4 cut off mid-wri")
+    pdf = b"%PDF-1.4 body %%EOF\n"
+    with patch("app.config.ARXIV_PDF_CACHE_DIR", str(tmp_path)), \
+            patch("workers.transformation.arxiv_pdf_volume"), \
+            patch("workers.transformation._download_arxiv_pdf", return_value=pdf) as mock_download:
+        assert _arxiv_get_pdf_bytes("2301.00001") == pdf
+
+    mock_download.assert_called_once()
+    assert (tmp_path / "2301.00001.pdf").read_bytes() == pdf
+
+
 def test_fetch_ss_batch_rows_resilient_non_list_response_returns_nones():
     from workers.transformation import _fetch_ss_batch_rows_resilient
 
@@ -731,7 +909,7 @@ def test_ss_get_json_401_then_success_without_key():
     success.raise_for_status.return_value = None
     success.json.return_value = {"ok": True}
     mock_httpx = MagicMock()
-    mock_httpx.get.side_effect = [unauthorized, success]
+    mock_httpx.Client.return_value.get.side_effect = [unauthorized, success]
     mock_httpx.HTTPStatusError = Exception
 
     with patch.dict(sys.modules, {"httpx": mock_httpx}):
@@ -751,7 +929,7 @@ def test_ss_get_json_raises_runtime_error_on_non_retryable_http_error():
     response.text = "missing"
     response.raise_for_status.side_effect = FakeHTTPStatusError(response)
     mock_httpx = MagicMock()
-    mock_httpx.get.return_value = response
+    mock_httpx.Client.return_value.get.return_value = response
     mock_httpx.HTTPStatusError = FakeHTTPStatusError
 
     with patch.dict(sys.modules, {"httpx": mock_httpx}):
@@ -768,7 +946,7 @@ def test_ss_post_json_401_then_success_without_key():
     success.raise_for_status.return_value = None
     success.json.return_value = {"ok": True}
     mock_httpx = MagicMock()
-    mock_httpx.post.side_effect = [unauthorized, success]
+    mock_httpx.Client.return_value.post.side_effect = [unauthorized, success]
     mock_httpx.HTTPStatusError = Exception
 
     with patch.dict(sys.modules, {"httpx": mock_httpx}):
@@ -788,7 +966,7 @@ def test_ss_post_json_raises_runtime_error_on_non_retryable_http_error():
     response.text = "missing"
     response.raise_for_status.side_effect = FakeHTTPStatusError(response)
     mock_httpx = MagicMock()
-    mock_httpx.post.return_value = response
+    mock_httpx.Client.return_value.post.return_value = response
     mock_httpx.HTTPStatusError = FakeHTTPStatusError
 
     with patch.dict(sys.modules, {"httpx": mock_httpx}):
@@ -803,7 +981,7 @@ def test_arxiv_get_pdf_bytes_raises_after_http_error():
         pass
 
     mock_httpx = MagicMock()
-    mock_httpx.get.side_effect = FakeHTTPError("boom")
+    mock_httpx.Client.return_value.get.side_effect = FakeHTTPError("boom")
     mock_httpx.HTTPError = FakeHTTPError
     mock_httpx.HTTPStatusError = Exception
 
@@ -819,7 +997,7 @@ def test_arxiv_get_pdf_bytes_raises_after_http_status_error():
     response = MagicMock(status_code=404, text="missing")
     response.raise_for_status.side_effect = Exception("status")
     mock_httpx = MagicMock()
-    mock_httpx.get.return_value = response
+    mock_httpx.Client.return_value.get.return_value = response
     mock_httpx.HTTPError = Exception
     mock_httpx.HTTPStatusError = Exception
 
@@ -837,7 +1015,7 @@ def test_arxiv_get_pdf_bytes_retries_transient_status_then_succeeds():
     success = MagicMock(status_code=200, content=b"pdf", text="")
     success.raise_for_status.return_value = None
     mock_httpx = MagicMock()
-    mock_httpx.get.side_effect = [transient, success]
+    mock_httpx.Client.return_value.get.side_effect = [transient, success]
     mock_httpx.HTTPError = Exception
     mock_httpx.HTTPStatusError = Exception
 
@@ -903,6 +1081,18 @@ def test_extract_conclusion_stops_at_bibliography():
     assert "Bibliography" not in result
 
 
+def test_extract_conclusion_stops_at_earliest_stop_heading():
+    text = (
+        "\nConclusion\n" + ("Useful finding " * 10)
+        + "\nAcknowledgments\nthanks to funders"
+        + "\nReferences\n[1] ref"
+    )
+    result = _extract_conclusion_from_text(text)
+    assert "Useful finding" in result
+    assert "funders" not in result
+    assert "[1] ref" not in result
+
+
 def test_extract_full_text_pdf_parse_failed():
     mock_pymupdf = MagicMock()
     mock_pymupdf.open.side_effect = RuntimeError("bad pdf")
@@ -959,23 +1149,40 @@ def test_extract_full_text_pdf_download_error_returns_unavailable():
     assert result["source"] == "unavailable"
 
 
+def _mock_pdf(page_texts):
+    pages = [MagicMock(get_text=MagicMock(return_value=text)) for text in page_texts]
+    mock_doc = MagicMock()
+    mock_doc.__len__.return_value = len(pages)
+    mock_doc.__getitem__.side_effect = lambda idx: pages[idx]
+    mock_doc.__enter__.return_value = mock_doc
+    mock_pymupdf = MagicMock()
+    mock_pymupdf.open.return_value = mock_doc
+    return mock_pymupdf, pages
+
+
 def test_extract_conclusion_success_path():
     from workers.transformation import extract_conclusion
 
-    with patch(
-        "workers.transformation.extract_full_text_pdf",
-        MagicMock(local=MagicMock(return_value={"full_text": "\nConclusion\nKey finding about the proposed method and its results."})),
-    ):
-        result = extract_conclusion("2301.00001")
+    mock_pymupdf, pages = _mock_pdf([
+        "Introduction\nBody text.",
+        "Conclusion\nKey finding about the proposed method and its results.",
+        "References\n[1] Some reference.",
+    ])
+    with patch("workers.transformation._arxiv_get_pdf_bytes", return_value=b"pdf"):
+        with patch.dict(sys.modules, {"pymupdf": mock_pymupdf}):
+            result = extract_conclusion("2301.00001")
 
     assert "Key finding" in result
+    # Stops walking backwards once the conclusion page is found
+    pages[0].get_text.assert_not_called()
 
 
 def test_extract_conclusion_handles_exception():
     from workers.transformation import extract_conclusion
 
-    with patch("workers.transformation.extract_full_text_pdf", MagicMock(local=MagicMock(side_effect=RuntimeError("boom")))):
-        result = extract_conclusion("2301.00001")
+    with patch("workers.transformation._arxiv_get_pdf_bytes", side_effect=RuntimeError("boom")):
+        with patch.dict(sys.modules, {"pymupdf": MagicMock()}):
+            result = extract_conclusion("2301.00001")
 
     assert result == ""
 
@@ -1027,6 +1234,34 @@ def test_transform_to_silver_prefetched_without_tldr_uses_conclusion_fallback():
 
     args = mock_cursor.execute.call_args[0][1]
     assert args[5] == "Conclusion\nUseful text"
+    # Empty reference/citation lists bind as NULL rather than serialized "[]"
+    assert args[3] is None
+    assert args[4] is None
+
+
+def test_transform_to_silver_serializes_connections_compactly():
+    mock_cursor = MagicMock()
+    mock_cursor.fetchall.side_effect = [
+        [("RAW_PAYLOAD",)],
+        [("ARXIV_ID",), ("SS_ID",), ("CONCLUSION",), ("REFERENCE_LIST",), ("CITATION_LIST",), ("TITLE",), ("ABSTRACT",)],
+    ]
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    prefetched = {
+        "references": [{"title": "Ref", "arxiv_id": "2301.00002"}],
+        "citations": [{"title": "Cite", "arxiv_id": None}],
+        "ss_id": "ss1",
+        "tldr": "",
+    }
+
+    with patch("workers.transformation.extract_full_text_pdf", MagicMock(local=MagicMock(return_value={"full_text": "", "source": "unavailable"}))):
+        with patch("workers.transformation.extract_conclusion", MagicMock(local=MagicMock(return_value=""))):
+            with patch("workers.transformation.connect_to_snowflake", return_value=mock_conn):
+                transform_to_silver("2301.00001", ss_prefetched=prefetched)
+
+    args = mock_cursor.execute.call_args[0][1]
+    assert args[3] == '[{"title":"Ref","arxiv_id":"2301.00002"}]'
+    assert args[4] == '[{"title":"Cite","arxiv_id":null}]'
 
 
 def test_transform_to_silver_database_error_rolls_back():
@@ -1089,16 +1324,20 @@ def test_main_parallel_prefetch_and_sequential_error_continue():
                 assert main(parallel=0) is None
 
 
-def test_main_parallel_branch_dispatches_remote_calls():
+def test_main_parallel_branch_fans_out_with_starmap():
     from workers.transformation import main
 
+    starmap = MagicMock(return_value=iter([None, RuntimeError("bad")]))
     remote = MagicMock()
     with patch("workers.transformation.get_bronze_worklist", MagicMock(remote=MagicMock(return_value=["a1", "a2"]))):
         with patch("workers.transformation._fetch_ss_batch_metadata", return_value={"a1": {"ss_id": "x"}, "a2": {"ss_id": "y"}}):
-            with patch("workers.transformation.transform_to_silver", MagicMock(remote=remote)):
+            with patch("workers.transformation.transform_to_silver", MagicMock(remote=remote, starmap=starmap)):
                 assert main(parallel=1) is None
 
-    assert remote.call_count == 2
+    remote.assert_not_called()
+    starmap.assert_called_once()
+    assert starmap.call_args[0][0] == [("a1", {"ss_id": "x"}), ("a2", {"ss_id": "y"})]
+    assert starmap.call_args.kwargs["return_exceptions"] is True
 
 
 def test_process_single_silver_orchestrates_prefetch_and_transform():
@@ -31,3 +31,66 @@ def test_connect_to_snowflake_uses_env_vars(monkeypatch):
     assert call_kwargs["account"] == "myaccount"
     assert call_kwargs["user"] == "myuser"
     assert call_kwargs["password"] == "mypassword"
+
+
+def test_connect_to_snowflake_retries_transient_errors():
+    class FakeOperationalError(Exception):
+        pass
+
+    mock_conn = MagicMock()
+    with patch("app.utils.snowflake.connector.errors.OperationalError", FakeOperationalError), \
+            patch("app.utils.time.sleep") as mock_sleep, \
+            patch(
+                "app.utils.snowflake.connector.connect",
+                side_effect=[FakeOperationalError("reset"), mock_conn],
+            ) as mock_connect:
+        from app.utils import connect_to_snowflake
+        conn = connect_to_snowflake(schema="SILVER")
+
+    assert conn is mock_conn
+    assert mock_connect.call_count == 2
+    mock_sleep.assert_called_once()
+
+
+def test_connect_to_snowflake_raises_after_max_attempts():
+    class FakeOperationalError(Exception):
+        pass
+
+    with patch("app.utils.snowflake.connector.errors.OperationalError", FakeOperationalError), \
+            patch("app.utils.time.sleep"), \
+            patch(
+                "app.utils.snowflake.connector.connect",
+                side_effect=FakeOperationalError("down"),
+            ) as mock_connect:
+        from app.utils import connect_to_snowflake, _CONNECT_MAX_ATTEMPTS
+        with pytest.raises(FakeOperationalError):
+            connect_to_snowflake(schema="SILVER")
+
+    assert mock_connect.call_count == _CONNECT_MAX_ATTEMPTS
+
+
+def test_get_shared_snowflake_connection_reuses_open_connection():
+    import app.utils as utils
+
+    first = MagicMock()
+    first.is_closed.return_value = False
+    utils._shared_connections.clear()
+    with patch("app.utils.snowflake.connector.connect", return_value=first) as mock_connect:
+        assert utils.get_shared_snowflake_connection(schema="GOLD") is first
+        assert utils.get_shared_snowflake_connection(schema="GOLD") is first
+
+    mock_connect.assert_called_once()
+    assert mock_connect.call_args[1]["client_session_keep_alive"] is True
+    utils._shared_connections.clear()
+
+
+def test_get_shared_snowflake_connection_reconnects_when_closed():
+    import app.utils as utils
+
+    stale, fresh = MagicMock(), MagicMock()
+    stale.is_closed.return_value = True
+    utils._shared_connections.clear()
+    with patch("app.utils.snowflake.connector.connect", side_effect=[stale, fresh]):
+        utils.get_shared_snowflake_connection(schema="GOLD")
+        assert utils.get_shared_snowflake_connection(schema="GOLD") is fresh
+    utils._shared_connections.clear()